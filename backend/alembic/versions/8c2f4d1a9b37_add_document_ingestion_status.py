@@ -0,0 +1,31 @@
+"""add document ingestion status
+
+Revision ID: 8c2f4d1a9b37
+Revises: 5165f368fc2e
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4d1a9b37'
+down_revision: Union[str, None] = '5165f368fc2e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "documents",
+        sa.Column("status", sa.String(), nullable=False, server_default="ready"),
+    )
+    op.add_column("documents", sa.Column("error", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "error")
+    op.drop_column("documents", "status")
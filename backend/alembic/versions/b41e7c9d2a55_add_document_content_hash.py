@@ -0,0 +1,36 @@
+"""add document content hash
+
+Revision ID: b41e7c9d2a55
+Revises: 8c2f4d1a9b37
+Create Date: 2026-10-17 11:02:17.604381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e7c9d2a55'
+down_revision: Union[str, None] = '8c2f4d1a9b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "documents",
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+    )
+    op.create_index(
+        op.f("ix_documents_content_hash"),
+        "documents",
+        ["content_hash"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_documents_content_hash"), table_name="documents")
+    op.drop_column("documents", "content_hash")
@@ -36,6 +36,83 @@ class Settings(BaseSettings):
     GROQ_MODEL: str = "llama-3.3-70b-versatile"
     HF_EBD_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     OPENAI_EBD_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_BATCH_MAX_TOKENS: int = 50000
+    EMBEDDING_BATCH_MAX_INPUTS: int = 512
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+
+    # LLM HTTP clients
+    LLM_MAX_CONNECTIONS: int = 200
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_MAX_RETRIES: int = 2
+    GROQ_MAX_CONCURRENCY: int = 100
+    OPENAI_MAX_CONCURRENCY: int = 100
+
+    # Vector store
+    FAISS_MAX_DELTA_SEGMENTS: int = 8
+    FAISS_TOMBSTONE_COMPACT_RATIO: float = 0.2
+    FAISS_FLAT_MAX_VECTORS: int = 10000
+    FAISS_HNSW_MAX_VECTORS: int = 250000
+    FAISS_IVFPQ_MIN_VECTORS: int = 1000000
+    FAISS_IVF_NPROBE: int = 16
+    FAISS_REFINE_FACTOR: int = 4
+    FAISS_TARGET_RECALL: float = 0.95
+    FAISS_PREMIUM_TARGET_RECALL: float = 0.99
+    FAISS_PREMIUM_PLANS: str = "scale"  # comma-separated
+    FAISS_TUNE_K: int = 10
+    FAISS_TUNE_QUERIES: int = 200
+    FAISS_WRITE_LOCK_TIMEOUT_SECONDS: int = 900
+    FAISS_WRITE_LOCK_WAIT_SECONDS: int = 900
+    FAISS_CACHE_MAX_TENANTS: int = 256
+    FAISS_CACHE_MAX_MB: int = 2048
+    FAISS_USE_MMAP: bool = True
+    FAISS_SHARED_DIR: str = ""  # tmpfs shared by all workers, e.g. /dev/shm/faiss
+    FAISS_FILTER_EXACT_MAX_ROWS: int = 20000
+    SEARCH_BATCH_WINDOW_MS: int = 3
+    SEARCH_BATCH_MAX_SIZE: int = 32
+
+    # Hybrid (BM25 + vector) retrieval
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    RRF_K: int = 60
+
+    # Cross-encoder reranking
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_MAX_LENGTH: int = 256
+    RERANK_QUANTIZE: bool = True
+
+    # Context diversification (MMR) and de-duplication
+    MMR_ENABLED: bool = True
+    MMR_CANDIDATES: int = 20
+    MMR_LAMBDA: float = 0.7
+
+    # Prompt token budget (plans may override via PLAN_LIMITS)
+    PROMPT_MAX_INPUT_TOKENS: int = 3000
+    ANSWER_MAX_TOKENS: int = 500
+
+    # Query embedding cache
+    EMBEDDING_CACHE_TTL_SECONDS: int = 86400
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_MAX_MB: int = 64
+
+    # Semantic answer cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 256
+    SEMANTIC_CACHE_MAX_TENANTS: int = 1024
+    SEMANTIC_CACHE_MAX_MB: int = 256
+
+    # Ingestion
+    INGEST_WORKER_CONCURRENCY: int = 4
+    INGEST_EXTRACT_PROCESSES: int = 2
+    INGEST_INDEX_BATCH_CHUNKS: int = 256
+    CHUNK_EMBEDDING_TTL_SECONDS: int = 30 * 86400
 
     # Storage
     DO_SPACES_KEY: str
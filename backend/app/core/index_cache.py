@@ -0,0 +1,120 @@
+"""Bounded LRU cache for loaded tenant indexes."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class IndexCache:
+    """Thread-safe LRU cache bounded by entry count and total byte size.
+
+    Each entry is stored with its size in bytes, as reported by the
+    ``sizeof`` callable. The least recently used entries are evicted until
+    both bounds hold again. The most recently inserted entry is never
+    evicted, so a single tenant larger than ``max_bytes`` still works.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        sizeof: Callable[[Any], int],
+    ) -> None:
+        """Create an empty cache with the given bounds."""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        """Membership test that does not touch recency or counters."""
+        return key in self._entries
+
+    def __len__(self) -> int:
+        """Number of cached entries."""
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value and mark it most recently used."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Return the cached value without touching recency or counters."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def _over_budget(self) -> bool:
+        """Whether either bound is exceeded. Caller holds the lock."""
+        too_many = len(self._entries) > self.max_entries
+        return too_many or self._total_bytes > self.max_bytes
+
+    def put(self, key: str, value: Any) -> None:
+        """Insert or replace a value, evicting cold entries as needed."""
+        size = int(self._sizeof(value))
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total_bytes += size
+
+            while len(self._entries) > 1 and self._over_budget():
+                evicted, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Remove an entry without counting it as an eviction."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+
+            self._total_bytes -= self._sizes.pop(key)
+            return self._entries.pop(key)
+
+    def drop_all(self) -> None:
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        self.drop_all()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict:
+        """Counters and occupancy for sizing workers."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,234 @@
+"""Cross-process coordination for tenant FAISS indexes via Redis.
+
+Every published index change stores the tenant's manifest version under
+``faiss:version:{client_id}`` and announces it on the ``faiss:invalidate``
+channel, so each API worker can refresh its cached copy. Writers take a
+per-tenant Redis lock, so ingests from different processes serialize;
+readers never lock. A held lock's TTL is extended in the background for
+as long as the write runs, and ``check_write_lock`` lets a writer confirm
+it still owns the lock before it publishes.
+
+Without Redis, everything degrades to the previous per-process
+behaviour: locks are process-local and no invalidations are sent.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from backend.app.core.config import settings
+from backend.app.utils.logger import logger
+from backend.app.utils.redis_client import redis_client
+
+INVALIDATION_CHANNEL = "faiss:invalidate"
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+# Redis locks currently held by this process, by tenant.
+_held_locks: Dict[str, Any] = {}
+
+_listener: Optional[threading.Thread] = None
+_listener_stop = threading.Event()
+
+
+def _version_key(client_id: str) -> str:
+    """Redis key holding a tenant's latest manifest version."""
+    return f"faiss:version:{client_id}"
+
+
+def _lock_key(client_id: str) -> str:
+    """Redis key of a tenant's distributed write lock."""
+    return f"faiss:lock:{client_id}"
+
+
+def _get_local_lock(client_id: str) -> threading.Lock:
+    """Return the in-process write lock for a tenant."""
+    with _local_locks_guard:
+        if client_id not in _local_locks:
+            _local_locks[client_id] = threading.Lock()
+        return _local_locks[client_id]
+
+
+def _keep_alive(client_id: str, lock: Any, stop: threading.Event) -> None:
+    """Reset a held lock's TTL every third of it until ``stop`` is set."""
+    ttl = settings.FAISS_WRITE_LOCK_TIMEOUT_SECONDS
+
+    while not stop.wait(ttl / 3):
+        try:
+            lock.extend(ttl, replace_ttl=True)
+        except Exception as e:
+            logger.error(f"Index lock for {client_id} could not be extended: {e}")
+            return
+
+
+@contextmanager
+def tenant_write_lock(client_id: str) -> Iterator[None]:
+    """Hold a tenant's write lock across threads and processes.
+
+    The in-process lock is taken first so threads of one worker queue
+    locally instead of polling Redis. If Redis is unreachable the write
+    proceeds under the local lock only. While held, the Redis lock's TTL
+    is extended by a background thread, so long compactions keep it.
+    """
+    with _get_local_lock(client_id):
+        lock = None
+        if redis_client is not None:
+            lock = redis_client.lock(
+                _lock_key(client_id),
+                timeout=settings.FAISS_WRITE_LOCK_TIMEOUT_SECONDS,
+                blocking_timeout=settings.FAISS_WRITE_LOCK_WAIT_SECONDS,
+            )
+            try:
+                acquired = lock.acquire()
+            except Exception as e:
+                logger.warning(f"Index lock unavailable, using local lock: {e}")
+                lock, acquired = None, True
+
+            if not acquired:
+                raise TimeoutError(f"Timed out waiting for index lock: {client_id}")
+
+        heartbeat = None
+        stop = threading.Event()
+        if lock is not None:
+            _held_locks[client_id] = lock
+            heartbeat = threading.Thread(
+                target=_keep_alive,
+                args=(client_id, lock, stop),
+                name=f"faiss-lock-{client_id}",
+                daemon=True,
+            )
+            heartbeat.start()
+
+        try:
+            yield
+        finally:
+            if heartbeat is not None:
+                stop.set()
+                heartbeat.join()
+                _held_locks.pop(client_id, None)
+            if lock is not None:
+                try:
+                    lock.release()
+                except Exception as e:
+                    logger.warning(f"Index lock release failed for {client_id}: {e}")
+
+
+def check_write_lock(client_id: str, version: int) -> None:
+    """Raise ``RuntimeError`` if ``version`` of a tenant must not be published.
+
+    That is the case when this process's Redis write lock has expired or
+    passed to another writer, or when a version at least as new has
+    already been published. If Redis cannot be asked, the write proceeds.
+    """
+    lock = _held_locks.get(client_id)
+    if lock is not None:
+        try:
+            owned = lock.owned()
+        except Exception as e:
+            logger.warning(f"Index lock ownership check failed: {e}")
+            owned = True
+        if not owned:
+            raise RuntimeError(f"Index write lock for {client_id} was lost")
+
+    remote = get_version(client_id)
+    if remote is not None and remote >= version:
+        raise RuntimeError(
+            f"Index for {client_id} is already at version {remote}, "
+            f"not publishing version {version}"
+        )
+
+
+def get_version(client_id: str) -> Optional[int]:
+    """Latest published manifest version of a tenant, if known."""
+    if redis_client is None:
+        return None
+
+    try:
+        value = redis_client.get(_version_key(client_id))
+    except Exception as e:
+        logger.warning(f"Index version lookup failed: {e}")
+        return None
+
+    return int(value) if value is not None else None
+
+
+def publish_version(client_id: str, version: int) -> None:
+    """Record a tenant's new manifest version and notify other workers."""
+    if redis_client is None:
+        return
+
+    try:
+        pipe = redis_client.pipeline()
+        pipe.set(_version_key(client_id), version)
+        pipe.publish(
+            INVALIDATION_CHANNEL,
+            json.dumps({"client_id": client_id, "version": version}),
+        )
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Index version publish failed for {client_id}: {e}")
+
+
+def _listen(
+    on_version: Callable[[str, int], None],
+    on_reconnect: Callable[[], None],
+) -> None:
+    """Subscribe to invalidations until stopped, reconnecting on errors."""
+    backoff = 1.0
+
+    while not _listener_stop.is_set():
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Changes made while disconnected were missed.
+            on_reconnect()
+            backoff = 1.0
+
+            while not _listener_stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                payload = json.loads(message["data"])
+                on_version(payload["client_id"], int(payload["version"]))
+
+            pubsub.close()
+        except Exception as e:
+            logger.warning(f"Index invalidation listener error: {e}")
+            _listener_stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+
+def start_listener(
+    on_version: Callable[[str, int], None],
+    on_reconnect: Callable[[], None],
+) -> None:
+    """Start the background invalidation subscriber once per process.
+
+    ``on_version(client_id, version)`` runs for every published change;
+    ``on_reconnect()`` runs after each (re)subscription.
+    """
+    global _listener
+    if redis_client is None or _listener is not None:
+        return
+
+    _listener_stop.clear()
+    _listener = threading.Thread(
+        target=_listen,
+        args=(on_version, on_reconnect),
+        name="faiss-invalidation",
+        daemon=True,
+    )
+    _listener.start()
+
+
+def stop_listener() -> None:
+    """Stop the invalidation subscriber if it is running."""
+    global _listener
+    if _listener is None:
+        return
+
+    _listener_stop.set()
+    _listener.join(timeout=5)
+    _listener = None
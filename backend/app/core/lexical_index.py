@@ -0,0 +1,264 @@
+"""Memory-mapped BM25 inverted index for FAISS segments.
+
+Each segment's chunk texts are indexed once into a single binary file:
+
+    MAGIC | header length (uint32) | JSON header | sections
+
+The JSON header holds the document count, total token count and the byte
+offset of each section. Sections are 8-byte aligned:
+
+    doc_len       uint32[n_docs]         tokens per row
+    term_hash     uint64[n_terms]        sorted 64-bit term hashes
+    term_offsets  int64[n_terms + 1]     offsets into the postings
+    post_doc      uint32[n_postings]     row of each posting
+    post_tf       uint16[n_postings]     term frequency, saturated
+
+Rows are the segment's vector rows, so results share the FAISS segment's
+metadata and tombstones. Terms are stored as hashes, so the file needs no
+vocabulary table; a lookup is a binary search over ``term_hash``.
+"""
+
+import hashlib
+import json
+import mmap
+import re
+import struct
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+MAGIC = b"CLBM2501"
+_ALIGN = 8
+
+_COLUMNS = [
+    ("doc_len", np.uint32, "n_docs", 0),
+    ("term_hash", np.uint64, "n_terms", 0),
+    ("term_offsets", np.int64, "n_terms", 1),
+    ("post_doc", np.uint32, "n_postings", 0),
+    ("post_tf", np.uint16, "n_postings", 0),
+]
+
+# Words, keeping identifiers such as "ORD-1042" or "err_conn_reset" whole.
+_TOKEN = re.compile(r"\w+(?:[-./#:]\w+)*")
+_TOKEN_PARTS = re.compile(r"[-./#:_]")
+
+_MAX_TF = np.iinfo(np.uint16).max
+
+
+@dataclass
+class Postings:
+    """Unsorted ``(term, row, tf)`` triples plus per-row lengths."""
+
+    doc_len: np.ndarray
+    hashes: np.ndarray
+    docs: np.ndarray
+    tfs: np.ndarray
+
+
+def _pad(size: int) -> int:
+    """Bytes needed to align ``size`` to the section alignment."""
+    return (-size) % _ALIGN
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of a text.
+
+    A compound token like ``sku-ab-1234`` yields itself followed by its
+    parts, so both the exact identifier and its pieces match.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = [part for part in _TOKEN_PARTS.split(token) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+@lru_cache(maxsize=1 << 16)
+def _hash_term(term: str) -> int:
+    """Stable 64-bit hash of a term."""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def term_hashes(terms: Iterable[str]) -> np.ndarray:
+    """Hashes of terms, as stored in the index."""
+    return np.fromiter((_hash_term(term) for term in terms), dtype=np.uint64)
+
+
+def build_postings(texts: List[str]) -> Postings:
+    """Tokenize texts into postings, one row per text."""
+    doc_len = np.zeros(len(texts), dtype=np.uint32)
+    hashes: List[int] = []
+    docs: List[int] = []
+    tfs: List[int] = []
+
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text or ""))
+        doc_len[row] = sum(counts.values())
+        for term, tf in counts.items():
+            hashes.append(_hash_term(term))
+            docs.append(row)
+            tfs.append(tf)
+
+    return Postings(
+        doc_len=doc_len,
+        hashes=np.asarray(hashes, dtype=np.uint64),
+        docs=np.asarray(docs, dtype=np.uint32),
+        tfs=np.minimum(np.asarray(tfs, dtype=np.int64), _MAX_TF).astype(np.uint16),
+    )
+
+
+def merge_postings(parts: List[Tuple[Postings, np.ndarray]]) -> Postings:
+    """Concatenate segments' postings, keeping only rows where ``keep``.
+
+    Rows are renumbered in order, matching how compaction concatenates
+    the segments' vectors and metadata.
+    """
+    doc_len, hashes, docs, tfs = [], [], [], []
+    offset = 0
+
+    for postings, keep in parts:
+        new_row = np.cumsum(keep, dtype=np.int64) - 1 + offset
+        kept = keep[postings.docs]
+
+        doc_len.append(postings.doc_len[keep])
+        hashes.append(postings.hashes[kept])
+        docs.append(new_row[postings.docs[kept]].astype(np.uint32))
+        tfs.append(postings.tfs[kept])
+        offset += int(keep.sum())
+
+    return Postings(
+        doc_len=np.concatenate(doc_len).astype(np.uint32),
+        hashes=np.concatenate(hashes).astype(np.uint64),
+        docs=np.concatenate(docs).astype(np.uint32),
+        tfs=np.concatenate(tfs).astype(np.uint16),
+    )
+
+
+def write_lexical_index(path: str, postings: Postings) -> None:
+    """Serialise postings to the inverted index file format."""
+    order = np.lexsort((postings.docs, postings.hashes))
+    hashes = postings.hashes[order]
+    terms, starts = np.unique(hashes, return_index=True)
+
+    columns = {
+        "doc_len": postings.doc_len.astype(np.uint32),
+        "term_hash": terms.astype(np.uint64),
+        "term_offsets": np.append(starts, len(hashes)).astype(np.int64),
+        "post_doc": postings.docs[order].astype(np.uint32),
+        "post_tf": postings.tfs[order].astype(np.uint16),
+    }
+    sections = [columns[name].tobytes() for name, _, _, _ in _COLUMNS]
+
+    offsets = {}
+    cursor = 0
+    for (name, _, _, _), data in zip(_COLUMNS, sections):
+        offsets[name] = cursor
+        cursor += len(data) + _pad(len(data))
+
+    header = json.dumps(
+        {
+            "n_docs": len(postings.doc_len),
+            "n_terms": len(terms),
+            "n_postings": len(hashes),
+            "total_len": int(postings.doc_len.sum()),
+            "offsets": offsets,
+        }
+    ).encode("utf-8")
+    header += b" " * _pad(len(MAGIC) + 4 + len(header))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for data in sections:
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+
+
+class LexicalIndex:
+    """Read-only, memory-mapped view over an inverted index file."""
+
+    def __init__(self, path: str) -> None:
+        """Map the file and create zero-copy views over its sections."""
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a lexical index file: {path}")
+
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(self._mm[start : start + header_len]))
+        base = start + header_len
+
+        self.n_docs: int = header["n_docs"]
+        self.total_len: int = header["total_len"]
+
+        for name, dtype, count_key, extra in _COLUMNS:
+            view = np.frombuffer(
+                self._mm,
+                dtype=dtype,
+                count=header[count_key] + extra,
+                offset=base + header["offsets"][name],
+            )
+            setattr(self, f"_{name}", view)
+
+    def _term_range(self, term: int) -> Tuple[int, int]:
+        """Postings range of a term hash; empty if absent."""
+        pos = int(np.searchsorted(self._term_hash, term))
+        if pos == len(self._term_hash) or self._term_hash[pos] != term:
+            return 0, 0
+        return int(self._term_offsets[pos]), int(self._term_offsets[pos + 1])
+
+    def doc_freqs(self, terms: np.ndarray) -> np.ndarray:
+        """Number of rows containing each term hash."""
+        ranges = [self._term_range(term) for term in terms]
+        return np.asarray([end - start for start, end in ranges], dtype=np.int64)
+
+    def postings(self) -> Postings:
+        """Every posting, for merging into a new index."""
+        counts = np.diff(self._term_offsets)
+        return Postings(
+            doc_len=self._doc_len,
+            hashes=np.repeat(self._term_hash, counts),
+            docs=self._post_doc,
+            tfs=self._post_tf,
+        )
+
+    def score(
+        self,
+        terms: np.ndarray,
+        idf: np.ndarray,
+        avgdl: float,
+        k1: float,
+        b: float,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """BM25 scores of every row matching at least one term.
+
+        ``idf`` is per term and computed over all segments by the caller.
+        Returns ``(rows, scores, matched)`` where ``matched`` is the summed
+        idf of the query terms each row contains.
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = np.zeros(self.n_docs, dtype=np.float32)
+
+        for term, weight in zip(terms, idf):
+            start, end = self._term_range(term)
+            if start == end:
+                continue
+
+            rows = self._post_doc[start:end]
+            tf = self._post_tf[start:end].astype(np.float32)
+            norm = k1 * (1 - b + b * self._doc_len[rows] / avgdl)
+            scores[rows] += weight * tf * (k1 + 1) / (tf + norm)
+            matched[rows] += weight
+
+        rows = np.flatnonzero(matched)
+        return rows, scores[rows], matched[rows]
@@ -0,0 +1,255 @@
+"""Columnar, memory-mapped metadata for FAISS segments.
+
+A segment's metadata is written once as a single binary file:
+
+    MAGIC | header length (uint32) | JSON header | column sections
+
+The JSON header holds the row count, the document id and filename string
+tables, and the byte offset of each section. Sections are 8-byte aligned:
+
+    text_offsets   int64[n + 1]   offsets into the UTF-8 text blob
+    extra_offsets  int64[n + 1]   offsets into the JSON extras blob
+    document_idx   int32[n]       index into the document id table, -1 if absent
+    chunk_index    int32[n]       chunk index, -1 if absent
+    filename_idx   int32[n]       index into the filename table, -1 if absent
+    has_text       uint8[n]       1 if the row carried a "text" value
+    text blob      bytes
+    extras blob    bytes          per-row JSON of every remaining key
+
+Reading maps the file and views the columns with ``np.frombuffer`` so
+loading is zero-copy and a row is materialised in O(1) by vector id.
+"""
+
+import json
+import mmap
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+MAGIC = b"CLMETA01"
+_ALIGN = 8
+
+_COLUMNS = [
+    ("text_offsets", np.int64, 1),
+    ("extra_offsets", np.int64, 1),
+    ("document_idx", np.int32, 0),
+    ("chunk_index", np.int32, 0),
+    ("filename_idx", np.int32, 0),
+    ("has_text", np.uint8, 0),
+]
+
+
+def _pad(size: int) -> int:
+    """Bytes needed to align ``size`` to the section alignment."""
+    return (-size) % _ALIGN
+
+
+def _split_row(
+    row: Dict,
+    documents: Dict[str, int],
+    filenames: Dict[str, int],
+) -> tuple:
+    """Split a metadata dict into typed column values and a JSON remainder."""
+    rest = dict(row)
+
+    text = rest.pop("text", None)
+    if text is not None and not isinstance(text, str):
+        rest["text"] = text
+        text = None
+
+    document_id = rest.get("document_id")
+    doc_idx = -1
+    if isinstance(document_id, str):
+        doc_idx = documents.setdefault(document_id, len(documents))
+        del rest["document_id"]
+
+    chunk_index = rest.get("chunk_index")
+    chunk_value = -1
+    if isinstance(chunk_index, int) and not isinstance(chunk_index, bool):
+        if 0 <= chunk_index < 2**31:
+            chunk_value = chunk_index
+            del rest["chunk_index"]
+
+    filename_idx = -1
+    nested = rest.get("metadata")
+    if isinstance(nested, dict) and isinstance(nested.get("filename"), str):
+        nested = dict(nested)
+        filename_idx = filenames.setdefault(
+            nested.pop("filename"),
+            len(filenames),
+        )
+        rest["metadata"] = nested
+
+    extra = json.dumps(rest, separators=(",", ":")).encode("utf-8") if rest else b""
+    text_bytes = text.encode("utf-8") if text is not None else b""
+
+    return text_bytes, text is not None, doc_idx, chunk_value, filename_idx, extra
+
+
+def write_metadata(path: str, rows: List[Dict]) -> None:
+    """Serialise metadata rows to the columnar file format."""
+    documents: Dict[str, int] = {}
+    filenames: Dict[str, int] = {}
+
+    n = len(rows)
+    columns = {
+        "text_offsets": np.zeros(n + 1, dtype=np.int64),
+        "extra_offsets": np.zeros(n + 1, dtype=np.int64),
+        "document_idx": np.full(n, -1, dtype=np.int32),
+        "chunk_index": np.full(n, -1, dtype=np.int32),
+        "filename_idx": np.full(n, -1, dtype=np.int32),
+        "has_text": np.zeros(n, dtype=np.uint8),
+    }
+    texts: List[bytes] = []
+    extras: List[bytes] = []
+
+    for i, row in enumerate(rows):
+        text, has_text, doc_idx, chunk, fname_idx, extra = _split_row(
+            row,
+            documents,
+            filenames,
+        )
+        texts.append(text)
+        extras.append(extra)
+        columns["text_offsets"][i + 1] = columns["text_offsets"][i] + len(text)
+        columns["extra_offsets"][i + 1] = columns["extra_offsets"][i] + len(extra)
+        columns["document_idx"][i] = doc_idx
+        columns["chunk_index"][i] = chunk
+        columns["filename_idx"][i] = fname_idx
+        columns["has_text"][i] = int(has_text)
+
+    sections = [columns[name].tobytes() for name, _, _ in _COLUMNS]
+    sections.append(b"".join(texts))
+    sections.append(b"".join(extras))
+    names = [name for name, _, _ in _COLUMNS] + ["text", "extras"]
+
+    # Offsets are relative to the end of the header, so the header can be
+    # sized before they are known.
+    offsets = {}
+    cursor = 0
+    for name, data in zip(names, sections):
+        offsets[name] = cursor
+        cursor += len(data) + _pad(len(data))
+
+    header = json.dumps(
+        {
+            "rows": n,
+            "documents": list(documents),
+            "filenames": list(filenames),
+            "offsets": offsets,
+        }
+    ).encode("utf-8")
+    header += b" " * _pad(len(MAGIC) + 4 + len(header))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for data in sections:
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+
+
+class MetadataStore:
+    """Read-only, memory-mapped view over a columnar metadata file."""
+
+    def __init__(self, path: str) -> None:
+        """Map the file and create zero-copy views over its columns."""
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a metadata store file: {path}")
+
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(self._mm[start : start + header_len]))
+        base = start + header_len
+
+        self._rows = header["rows"]
+        self._documents: List[str] = header["documents"]
+        self._filenames: List[str] = header["filenames"]
+        offsets = header["offsets"]
+
+        for name, dtype, extra in _COLUMNS:
+            view = np.frombuffer(
+                self._mm,
+                dtype=dtype,
+                count=self._rows + extra,
+                offset=base + offsets[name],
+            )
+            setattr(self, f"_{name}", view)
+
+        self._text_base = base + offsets["text"]
+        self._extras_base = base + offsets["extras"]
+
+    def __len__(self) -> int:
+        """Number of rows."""
+        return self._rows
+
+    def __getitem__(self, idx: int) -> Dict:
+        """Materialise row ``idx`` as a fresh metadata dict."""
+        if not 0 <= idx < self._rows:
+            raise IndexError(idx)
+
+        start, end = self._extra_offsets[idx], self._extra_offsets[idx + 1]
+        row: Dict = {}
+        if end > start:
+            base = self._extras_base
+            row = json.loads(bytes(self._mm[base + start : base + end]))
+
+        if self._has_text[idx]:
+            start, end = self._text_offsets[idx], self._text_offsets[idx + 1]
+            base = self._text_base
+            row["text"] = bytes(self._mm[base + start : base + end]).decode("utf-8")
+
+        if self._document_idx[idx] >= 0:
+            row["document_id"] = self._documents[self._document_idx[idx]]
+
+        if self._chunk_index[idx] >= 0:
+            row["chunk_index"] = int(self._chunk_index[idx])
+
+        if self._filename_idx[idx] >= 0:
+            nested = row.setdefault("metadata", {})
+            nested["filename"] = self._filenames[self._filename_idx[idx]]
+
+        return row
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Iterate rows in vector-id order."""
+        for idx in range(self._rows):
+            yield self[idx]
+
+    def document_id(self, idx: int) -> Optional[str]:
+        """Document id of a row without materialising the whole row."""
+        doc_idx = self._document_idx[idx]
+        return self._documents[doc_idx] if doc_idx >= 0 else None
+
+    def rows_for_document(self, document_id: str) -> np.ndarray:
+        """Positions of every row belonging to a document."""
+        try:
+            doc_idx = self._documents.index(document_id)
+        except ValueError:
+            return np.empty(0, dtype=np.int64)
+
+        return np.flatnonzero(self._document_idx == doc_idx)
+
+    def chunk_indices(self, rows: np.ndarray) -> np.ndarray:
+        """Chunk index of each given row, -1 where absent."""
+        return self._chunk_index[rows]
+
+    def document_mask(self, document_ids: Iterable[str]) -> np.ndarray:
+        """Boolean mask of the rows belonging to any of the documents."""
+        wanted = set(document_ids)
+        indices = [i for i, doc in enumerate(self._documents) if doc in wanted]
+        return np.isin(self._document_idx, indices)
+
+    def filename_mask(self, filename: str) -> np.ndarray:
+        """Boolean mask of the rows whose source file is ``filename``."""
+        try:
+            fname_idx = self._filenames.index(filename)
+        except ValueError:
+            return np.zeros(self._rows, dtype=bool)
+
+        return self._filename_idx == fname_idx
@@ -1,70 +1,823 @@
-"""FAISS vector store: create, add, save, load, search."""
+"""FAISS vector store: create, add, save, load, search.
 
+Each tenant's index is stored as an immutable base segment plus small
+append-only delta segments, tracked by a JSON manifest. An upload writes and
+ships only its own delta segment; ``compact_index`` merges the segments back
+into a single base segment in the background.
+
+Loaded tenants are kept in a bounded LRU cache; segment files are
+memory-mapped where FAISS supports it, so cold tenants are paged in from
+local disk on demand instead of being deserialized fully. Segment
+metadata uses the columnar format in ``metadata_store``.
+
+Every segment also keeps its raw embeddings as a float16 ``.vec.npy`` file,
+row-aligned with its metadata (and so keyed by ``document_id`` and
+``chunk_index``). Compaction and ``rebuild_index`` build new indexes from
+these instead of re-embedding or reconstructing vectors from FAISS.
+
+The base segment's index type is chosen by ``select_index_type`` from the
+tenant's vector count and plan, recorded in the manifest as
+``index_type``, and migrated by compaction when a threshold is crossed.
+Results from quantized indexes are re-ranked on the raw vectors. Each new
+base is tuned for the smallest ``efSearch``/``nprobe`` meeting the plan's
+target recall, stored as ``search_params`` and applied at query time.
+
+Each vector also has a stable 64-bit id (``.ids.npy``), assigned from the
+manifest's ``next_id`` counter and kept across compactions. Deleting a
+document records its ids as tombstone ranges in the manifest; search
+excludes them with a FAISS ID selector and compaction drops them.
+
+Segments also carry a BM25 inverted index of their chunk texts
+(``.bm25``, see ``lexical_index``) for ``search_lexical``. It shares the
+segment's rows, so tombstones apply to it too, and compaction merges the
+segments' postings without re-tokenizing.
+
+Searches take optional metadata ``filters`` (``document_ids``,
+``source_type``, ``filename``, ``created_after``, ``created_before``).
+Document-level attributes are kept in the manifest's ``documents`` map;
+a filter compiles to one row bitmap per segment, cached per tenant
+version, which FAISS applies as an ``IDSelectorBitmap``. Small subsets
+are searched exactly on the raw vectors instead.
+
+With ``FAISS_SHARED_DIR`` set to a tmpfs, every worker on a host maps the
+same immutable segment files, so N workers hold one copy of each index.
+FAISS 1.7.4 only memory-maps IVF inverted lists, so in that mode flat and
+HNSW types are replaced by IVF equivalents. A new version is swapped in
+atomically: its manifest replaces the old one in a single rename and
+readers keep their mapping of superseded segments until they let go.
+"""
+
+import json
+import math
 import os
 import pickle
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 import faiss
 import numpy as np
+from botocore.exceptions import ClientError
 
+from backend.app.core.config import settings
+from backend.app.core.index_cache import IndexCache
+from backend.app.core.index_sync import (
+    check_write_lock,
+    get_version,
+    publish_version,
+    start_listener,
+    stop_listener,
+    tenant_write_lock,
+)
+from backend.app.core.lexical_index import (
+    LexicalIndex,
+    Postings,
+    build_postings,
+    merge_postings,
+    term_hashes,
+    tokenize,
+    write_lexical_index,
+)
+from backend.app.core.metadata_store import MetadataStore, write_metadata
 from backend.app.utils.logger import logger
-from backend.app.utils.s3 import download_file, upload_file
+from backend.app.utils.s3 import delete_file, download_file, upload_file
+
+MANIFEST_FILENAME = "manifest.json"
+
+INDEX_FLAT = "Flat"
+INDEX_HNSW = "HNSW32"
+INDEX_HNSW_SQ8 = "HNSW32_SQ8"
+# Exact search over a single inverted list, which FAISS can memory-map.
+INDEX_SHARED_FLAT = "IVF1,Flat"
+
+# Quantizers are trained on at most this many vectors.
+_MAX_TRAIN_VECTORS = 100_000
+
+# Compiled filter bitmaps kept per loaded tenant version.
+_FILTER_CACHE_SIZE = 64
+
+# Values tried by the search tuner, cheapest first.
+_EF_SEARCH_CANDIDATES = (16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512)
+_NPROBE_CANDIDATES = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+@dataclass
+class Segment:
+    """One immutable FAISS segment with its positional metadata."""
 
-_index_cache: Dict[str, Tuple[faiss.Index, List[Dict]]] = {}
+    name: str
+    index: faiss.Index
+    metadata: MetadataStore
+    nbytes: int = 0
+    vectors: Optional[np.ndarray] = None  # float16, memory-mapped
+    ids: Optional[np.ndarray] = None  # stable int64 vector ids
+    deleted_count: int = 0
+    # Keeps the FAISS selector objects alive alongside the search params.
+    excluded: Optional[Tuple[faiss.IDSelector, faiss.IDSelector]] = None
+    params: Optional[faiss.SearchParameters] = None
+    deleted_mask: Optional[np.ndarray] = None  # rows to filter from results
+    lexical: Optional[LexicalIndex] = None  # BM25 postings of the rows
+
+
+@dataclass
+class TenantIndex:
+    """All segments of a tenant's index, base segment first."""
+
+    manifest: Dict
+    segments: List[Segment] = field(default_factory=list)
+    # Per-segment row bitmaps of recent filters, keyed by the filter.
+    filter_masks: Dict[str, List[np.ndarray]] = field(default_factory=dict)
+
+    @property
+    def d(self) -> Optional[int]:
+        """Vector dimension shared by every segment."""
+        return self.manifest.get("dimension")
+
+    @property
+    def ntotal(self) -> int:
+        """Total number of vectors across all segments."""
+        return sum(segment.index.ntotal for segment in self.segments)
+
+    @property
+    def deleted_count(self) -> int:
+        """Number of tombstoned vectors awaiting compaction."""
+        return sum(segment.deleted_count for segment in self.segments)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory footprint used for cache accounting."""
+        return sum(segment.nbytes for segment in self.segments)
+
+
+_index_cache = IndexCache(
+    max_entries=settings.FAISS_CACHE_MAX_TENANTS,
+    max_bytes=settings.FAISS_CACHE_MAX_MB * 1024 * 1024,
+    sizeof=lambda tenant: tenant.nbytes,
+)
+
+_compaction_guard = threading.Lock()
+_cache_guard = threading.Lock()
+
+_compaction_executor = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix="faiss-compaction",
+)
+_compaction_pending: Set[str] = set()
+
+
+def _shared_serving() -> bool:
+    """Whether indexes are served from files shared by all workers."""
+    return bool(settings.FAISS_SHARED_DIR) and settings.FAISS_USE_MMAP
 
 
 def _get_base_tmp_dir() -> Path:
     """Return an OS-safe temporary directory and ensure it exists.
 
-    Works on Windows, Linux, Docker, CI.
+    Works on Windows, Linux, Docker, CI. ``FAISS_SHARED_DIR`` overrides it.
     """
-    base = Path(tempfile.gettempdir()) / "faiss_indexes"
+    if settings.FAISS_SHARED_DIR:
+        base = Path(settings.FAISS_SHARED_DIR)
+    else:
+        base = Path(tempfile.gettempdir()) / "faiss_indexes"
     base.mkdir(parents=True, exist_ok=True)
     return base
 
 
+def _get_tenant_dir(client_id: str) -> Path:
+    """Local directory holding a tenant's manifest and segments."""
+    path = _get_base_tmp_dir() / f"faiss_{client_id}"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _get_manifest_path(client_id: str) -> str:
+    """Local file path for the tenant manifest."""
+    return str(_get_tenant_dir(client_id) / MANIFEST_FILENAME)
+
+
+def _get_segment_paths(client_id: str, name: str) -> Tuple[str, str]:
+    """Local file paths for a segment's index and metadata."""
+    tenant_dir = _get_tenant_dir(client_id)
+    return (
+        str(tenant_dir / f"{name}.index"),
+        str(tenant_dir / f"{name}.meta"),
+    )
+
+
+def _get_vector_path(client_id: str, name: str) -> str:
+    """Local file path for a segment's raw float16 vectors."""
+    return str(_get_tenant_dir(client_id) / f"{name}.vec.npy")
+
+
+def _get_ids_path(client_id: str, name: str) -> str:
+    """Local file path for a segment's stable vector ids."""
+    return str(_get_tenant_dir(client_id) / f"{name}.ids.npy")
+
+
+def _get_lexical_path(client_id: str, name: str) -> str:
+    """Local file path for a segment's BM25 inverted index."""
+    return str(_get_tenant_dir(client_id) / f"{name}.bm25")
+
+
+def _segment_files(client_id: str, entry: Dict) -> List[str]:
+    """Every local file belonging to a manifest segment entry."""
+    paths = list(_get_segment_paths(client_id, entry["name"]))
+    if entry.get("vectors"):
+        paths.append(_get_vector_path(client_id, entry["name"]))
+    if entry.get("ids"):
+        paths.append(_get_ids_path(client_id, entry["name"]))
+    if entry.get("lexical"):
+        paths.append(_get_lexical_path(client_id, entry["name"]))
+    return paths
+
+
+def _segment_entry(name: str, count: int) -> Dict:
+    """Manifest entry for a segment written with every per-row file."""
+    return {
+        "name": name,
+        "count": count,
+        "vectors": True,
+        "ids": True,
+        "lexical": True,
+    }
+
+
 def _get_index_path(client_id: str) -> str:
-    """Local file path for FAISS index."""
+    """Local file path for a legacy single-file FAISS index."""
     return str(_get_base_tmp_dir() / f"faiss_{client_id}.index")
 
 
 def _get_metadata_path(client_id: str) -> str:
-    """Local file path for FAISS metadata."""
+    """Local file path for legacy single-file FAISS metadata."""
     return str(_get_base_tmp_dir() / f"faiss_{client_id}_meta.pkl")
 
 
-def create_index(dimension: int = 1536) -> faiss.Index:
-    """Create a new FAISS index."""
-    return faiss.IndexHNSWFlat(dimension, 32)
+def _s3_key(client_id: str, filename: str) -> str:
+    """S3 object key for a file in the tenant's index directory."""
+    return f"indexes/{client_id}/{filename}"
 
 
-def add_to_index(
+def _tmp_path(path: str) -> str:
+    """Temp file name for ``path``, unique to this process and thread.
+
+    Workers sharing a directory may fetch the same file at once.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Write bytes to path via a temp file so readers never see partials."""
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _new_manifest(dimension: int) -> Dict:
+    """Manifest for a tenant without any segments yet."""
+    return {
+        "version": 0,
+        "dimension": dimension,
+        "next_segment": 0,
+        "next_id": 0,
+        "segments": [],
+        "tombstones": [],
+    }
+
+
+def _write_manifest(client_id: str, manifest: Dict) -> str:
+    """Persist the manifest locally and return its path."""
+    path = _get_manifest_path(client_id)
+    _atomic_write(path, json.dumps(manifest).encode("utf-8"))
+    return path
+
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    """Write a ``.npy`` file atomically."""
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_segment(
+    client_id: str,
+    name: str,
+    index: faiss.Index,
+    metadata: List[Dict],
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    postings: Optional[Postings] = None,
+) -> Tuple[Segment, List[str]]:
+    """Persist a segment locally and return it with the written file paths.
+
+    The BM25 index is built from the metadata texts unless ``postings``
+    are given.
+    """
+    index_path, meta_path = _get_segment_paths(client_id, name)
+    vector_path = _get_vector_path(client_id, name)
+    ids_path = _get_ids_path(client_id, name)
+    lexical_path = _get_lexical_path(client_id, name)
+
+    tmp_path = _tmp_path(index_path)
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+
+    tmp_path = _tmp_path(meta_path)
+    write_metadata(tmp_path, metadata)
+    os.replace(tmp_path, meta_path)
+
+    _save_npy(vector_path, np.asarray(vectors, dtype=np.float16))
+    _save_npy(ids_path, np.asarray(ids, dtype=np.int64))
+
+    if postings is None:
+        postings = build_postings([row.get("text") or "" for row in metadata])
+    tmp_path = _tmp_path(lexical_path)
+    write_lexical_index(tmp_path, postings)
+    os.replace(tmp_path, lexical_path)
+
+    paths = [index_path, meta_path, vector_path, ids_path, lexical_path]
+    segment = Segment(
+        name=name,
+        index=index,
+        metadata=MetadataStore(meta_path),
+        nbytes=sum(os.path.getsize(path) for path in paths),
+        vectors=np.load(vector_path, mmap_mode="r"),
+        ids=np.load(ids_path, mmap_mode="r"),
+        lexical=LexicalIndex(lexical_path),
+    )
+    return segment, paths
+
+
+def _upload_files(client_id: str, paths: List[str]) -> None:
+    """Ship local index files to S3, tolerating S3 outages."""
+    try:
+        for path in paths:
+            with open(path, "rb") as f:
+                upload_file(f.read(), _s3_key(client_id, Path(path).name))
+    except Exception as exc:
+        logger.warning(
+            "S3 upload failed, continuing with local cache: %s",
+            exc,
+        )
+
+
+def _is_missing(exc: Exception) -> bool:
+    """Whether a local or S3 read failed because the object does not exist."""
+    if isinstance(exc, FileNotFoundError):
+        return True
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in ("NoSuchKey", "404")
+    return False
+
+
+def _ensure_local(client_id: str, path: str) -> None:
+    """Download a tenant file from S3 if it is missing locally."""
+    if os.path.exists(path):
+        return
+
+    data = download_file(_s3_key(client_id, Path(path).name))
+    _atomic_write(path, data)
+
+
+def _read_faiss_index(path: str) -> faiss.Index:
+    """Read a FAISS index, memory-mapping it when the index type allows."""
+    if settings.FAISS_USE_MMAP:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+        except RuntimeError as exc:
+            logger.debug("mmap read unsupported for %s: %s", path, exc)
+
+    return faiss.read_index(path)
+
+
+def _read_segment(client_id: str, entry: Dict) -> Segment:
+    """Load one segment from local disk, fetching it from S3 if needed."""
+    name = entry["name"]
+    index_path, meta_path = _get_segment_paths(client_id, name)
+
+    paths = _segment_files(client_id, entry)
+    for path in paths:
+        _ensure_local(client_id, path)
+
+    vectors = None
+    if entry.get("vectors"):
+        vectors = np.load(_get_vector_path(client_id, name), mmap_mode="r")
+
+    ids = None
+    if entry.get("ids"):
+        ids = np.load(_get_ids_path(client_id, name), mmap_mode="r")
+
+    lexical = None
+    if entry.get("lexical"):
+        lexical = LexicalIndex(_get_lexical_path(client_id, name))
+
+    return Segment(
+        name=name,
+        index=_read_faiss_index(index_path),
+        metadata=MetadataStore(meta_path),
+        nbytes=sum(os.path.getsize(path) for path in paths),
+        vectors=vectors,
+        ids=ids,
+        lexical=lexical,
+    )
+
+
+def _ids_to_ranges(ids: np.ndarray) -> List[List[int]]:
+    """Compress vector ids into sorted ``[start, end)`` ranges."""
+    ids = np.unique(ids)
+    if not len(ids):
+        return []
+
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = ids[np.concatenate(([0], breaks))]
+    ends = ids[np.concatenate((breaks - 1, [len(ids) - 1]))] + 1
+    return [[int(start), int(end)] for start, end in zip(starts, ends)]
+
+
+def _merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+    """Sort ``[start, end)`` ranges and merge overlapping or adjacent ones."""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _tombstone_mask(ids: np.ndarray, ranges: List[List[int]]) -> np.ndarray:
+    """Boolean mask of the ids that fall in any tombstone range."""
+    if not ranges:
+        return np.zeros(len(ids), dtype=bool)
+
+    bounds = np.asarray(ranges, dtype=np.int64)
+    pos = np.searchsorted(bounds[:, 0], ids, side="right") - 1
+    return (pos >= 0) & (ids < bounds[np.maximum(pos, 0), 1])
+
+
+def _prepare_segments(segments: List[Segment], manifest: Dict) -> List[Segment]:
+    """Return segments set up with the manifest's search-time state.
+
+    The tenant's tuned ``search_params`` are applied to its graph and IVF
+    indexes, and tombstoned rows are marked for exclusion.
+    """
+    ranges = manifest.get("tombstones", [])
+    tuned = manifest.get("search_params", {})
+
+    result = []
+    for segment in segments:
+        _apply_tuned(segment.index, tuned)
+
+        mask = None
+        if segment.ids is not None:
+            mask = _tombstone_mask(segment.ids, ranges)
+        deleted_count = int(mask.sum()) if mask is not None else 0
+
+        excluded = None
+        params = None
+        if deleted_count and not isinstance(segment.index, faiss.IndexHNSW):
+            batch = faiss.IDSelectorBatch(np.flatnonzero(mask).astype(np.int64))
+            excluded = (batch, faiss.IDSelectorNot(batch))
+            params = _selector_params(segment.index, excluded[1])
+
+        result.append(
+            replace(
+                segment,
+                deleted_count=deleted_count,
+                deleted_mask=mask if deleted_count and excluded is None else None,
+                excluded=excluded,
+                params=params,
+            )
+        )
+    return result
+
+
+def _apply_tuned(index: faiss.Index, tuned: Dict) -> None:
+    """Set tuned ``efSearch`` (HNSW) or ``nprobe`` (IVF) on an index."""
+    if "efSearch" in tuned and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = int(tuned["efSearch"])
+    elif "nprobe" in tuned and isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(int(tuned["nprobe"]), index.nlist)
+
+
+def _selector_params(
+    index: faiss.Index,
+    selector: faiss.IDSelector,
+) -> faiss.SearchParameters:
+    """Search parameters that exclude rows via ``selector``.
+
+    Not used for HNSW: FAISS 1.7.4 searches HNSW at the default
+    ``efSearch`` whenever parameters are passed, so deleted rows are
+    filtered out of its results instead.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = index.nprobe
+    else:
+        params = faiss.SearchParameters()
+
+    params.sel = selector
+    return params
+
+
+def _segment_vectors(segment: Segment) -> np.ndarray:
+    """Raw float32 vectors of a segment, in metadata order.
+
+    Segments written before raw vectors were stored fall back to
+    reconstructing from the FAISS index.
+    """
+    if segment.vectors is not None:
+        return np.asarray(segment.vectors, dtype=np.float32)
+
+    if segment.index.ntotal == 0:
+        return np.empty((0, segment.index.d), dtype=np.float32)
+
+    return segment.index.reconstruct_n(0, segment.index.ntotal)
+
+
+def _load_legacy_index(client_id: str) -> TenantIndex:
+    """Adopt a pre-segmentation single-file index as the base segment."""
+    index_path = _get_index_path(client_id)
+    meta_path = _get_metadata_path(client_id)
+
+    if not os.path.exists(index_path) or not os.path.exists(meta_path):
+        index_bytes = download_file(f"indexes/{client_id}.index")
+        meta_bytes = download_file(f"indexes/{client_id}_meta.pkl")
+        _atomic_write(index_path, index_bytes)
+        _atomic_write(meta_path, meta_bytes)
+
+    index = faiss.read_index(index_path)
+
+    with open(meta_path, "rb") as f:
+        metadata = pickle.load(f)
+
+    vectors = index.reconstruct_n(0, index.ntotal)
+
+    logger.info("Migrating legacy FAISS index for client %s", client_id)
+    return _write_base_segment(
+        client_id,
+        _new_manifest(index.d),
+        index,
+        metadata,
+        vectors,
+    )
+
+
+def _ivf_nlist(count: int) -> int:
+    """Inverted list count for ``count`` vectors; 0 if too few to train.
+
+    About 4 * sqrt(n) lists, with enough points per list to train.
+    """
+    nlist = 1 << int(math.log2(max(4 * math.sqrt(count), 1)))
+    return min(nlist, count // 39)
+
+
+def _ivf_pq_factory(count: int, dimension: int) -> Optional[str]:
+    """IVF-PQ factory string sized for ``count`` vectors, if one fits."""
+    nlist = _ivf_nlist(count)
+    if dimension % 16 or nlist < 1:
+        return None
+
+    return f"IVF{nlist},PQ{dimension // 16}"
+
+
+def _shared_index_type(index_type: str, count: int) -> str:
+    """Memory-mappable equivalent of an index type for shared serving.
+
+    HNSW graphs are replaced by IVF with tuned ``nprobe``, keeping the
+    storage (flat or 8-bit scalar quantized); IVF types are kept.
+    """
+    if index_type.startswith("IVF"):
+        return index_type
+
+    nlist = _ivf_nlist(count)
+    if index_type == INDEX_FLAT or nlist < 2:
+        return INDEX_SHARED_FLAT
+
+    if index_type == INDEX_HNSW_SQ8:
+        return f"IVF{nlist},SQ8"
+
+    return f"IVF{nlist},Flat"
+
+
+def _single_list_ivf(dimension: int) -> faiss.Index:
+    """IVF index with a single list: exact, needs no training, and mmaps."""
+    quantizer = faiss.IndexFlatL2(dimension)
+    quantizer.add(np.zeros((1, dimension), dtype=np.float32))
+
+    index = faiss.IndexIVFFlat(quantizer, dimension, 1)
+    index.own_fields = True
+    quantizer.this.disown()
+    index.is_trained = True
+    return index
+
+
+def select_index_type(
+    count: int,
+    dimension: int,
+    plan: Optional[str] = None,
+) -> str:
+    """Choose the FAISS factory string for a tenant's base segment.
+
+    - Flat below ``FAISS_FLAT_MAX_VECTORS``: exact and cheapest to build.
+    - HNSW32 up to ``FAISS_HNSW_MAX_VECTORS``, and beyond on the starter
+      plan.
+    - HNSW32 with 8-bit scalar quantization beyond that, about 4x smaller.
+    - IVF-PQ for scale tenants above ``FAISS_IVFPQ_MIN_VECTORS``, storing
+      one byte per 16 dimensions.
+
+    Under shared serving the choice is mapped to an IVF equivalent by
+    ``_shared_index_type``.
+    """
+    if count < settings.FAISS_FLAT_MAX_VECTORS:
+        index_type = INDEX_FLAT
+    elif count < settings.FAISS_HNSW_MAX_VECTORS or plan == "starter":
+        index_type = INDEX_HNSW
+    else:
+        index_type = INDEX_HNSW_SQ8
+        if plan == "scale" and count >= settings.FAISS_IVFPQ_MIN_VECTORS:
+            index_type = _ivf_pq_factory(count, dimension) or INDEX_HNSW_SQ8
+
+    if _shared_serving():
+        return _shared_index_type(index_type, count)
+
+    return index_type
+
+
+def _target_index_type(tenant: TenantIndex) -> str:
+    """Index type the tenant's live vectors currently call for."""
+    return select_index_type(
+        tenant.ntotal - tenant.deleted_count,
+        tenant.d,
+        tenant.manifest.get("plan"),
+    )
+
+
+def _needs_migration(tenant: TenantIndex) -> bool:
+    """Whether the base segment's recorded type is no longer the right one.
+
+    Tenants whose base predates type selection migrate on their next
+    regular compaction rather than immediately.
+    """
+    current = tenant.manifest.get("index_type")
+    return current is not None and current != _target_index_type(tenant)
+
+
+def create_delta_index(dimension: int) -> faiss.Index:
+    """Create an index for a small delta segment.
+
+    Deltas are small and short-lived, so an exact flat index is cheaper to
+    build than HNSW and is merged into the base on compaction. Under shared
+    serving it is a single-list IVF so that it can be memory-mapped.
+    """
+    if _shared_serving():
+        return _single_list_ivf(dimension)
+
+    return faiss.IndexFlatL2(dimension)
+
+
+def _document_ids(tenant: TenantIndex, document_id: str) -> np.ndarray:
+    """Live (not yet tombstoned) vector ids of a document."""
+    ranges = tenant.manifest.get("tombstones", [])
+    found = [
+        np.asarray(segment.ids)[segment.metadata.rows_for_document(document_id)]
+        for segment in tenant.segments
+    ]
+    ids = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    return ids[~_tombstone_mask(ids, ranges)]
+
+
+def _publish(client_id: str, tenant: TenantIndex, paths: List[str]) -> None:
+    """Publish a new version of a tenant's index.
+
+    Writes the manifest, ships the changed files, updates the cache and
+    notifies other workers. Aborts before uploading anything if this
+    writer no longer holds the tenant lock (see ``check_write_lock``).
+    """
+    check_write_lock(client_id, tenant.manifest["version"])
+
+    paths = paths + [_write_manifest(client_id, tenant.manifest)]
+    _upload_files(client_id, paths)
+    with _cache_guard:
+        _index_cache.put(client_id, tenant)
+    publish_version(client_id, tenant.manifest["version"])
+
+
+def _maybe_schedule_compaction(client_id: str, tenant: TenantIndex) -> None:
+    """Compact when there are too many deltas or too many tombstones."""
+    too_many_deltas = len(tenant.segments) > settings.FAISS_MAX_DELTA_SEGMENTS
+    max_deleted = settings.FAISS_TOMBSTONE_COMPACT_RATIO * max(tenant.ntotal, 1)
+    too_many_deleted = tenant.deleted_count > max_deleted
+    if too_many_deltas or too_many_deleted or _needs_migration(tenant):
+        schedule_compaction(client_id)
+
+
+def _add_segment(
     client_id: str,
     embeddings: List[List[float]],
     metadata_list: List[Dict],
-) -> None:
-    """Add vectors and metadata to index."""
-    try:
-        index, existing_meta = load_index(client_id)
-    except Exception:
-        index = create_index(len(embeddings[0]))
-        existing_meta = []
+    replace_document_id: Optional[str] = None,
+    plan: Optional[str] = None,
+    document_attributes: Optional[Dict[str, Dict]] = None,
+) -> TenantIndex:
+    """Append a delta segment to a tenant's index.
 
+    With ``replace_document_id``, that document's existing vectors are
+    tombstoned in the same manifest version.
+    ``document_attributes`` maps document ids to the attributes searches
+    filter on, e.g. ``{"source_type": "pdf", "created_at": 1718000000.0}``.
+    """
     vectors = np.array(embeddings, dtype="float32")
 
     if vectors.ndim != 2:
         raise ValueError("Embeddings must be a 2D array")
 
-    if index.d != vectors.shape[1]:
-        shape = vectors.shape[1]
-        raise ValueError(f"Index dim mismatch: index={index.d}, vector_dim={shape}")
+    _ensure_stable_ids(client_id)
+
+    with tenant_write_lock(client_id):
+        try:
+            tenant = _load_latest(client_id)
+        except FileNotFoundError:
+            # Only a tenant that was never published starts from scratch;
+            # if Redis knows a version, its files must be fetched, not
+            # replaced.
+            if get_version(client_id) is not None:
+                raise
+            tenant = TenantIndex(manifest=_new_manifest(vectors.shape[1]))
+
+        if tenant.d != vectors.shape[1]:
+            dim = vectors.shape[1]
+            raise ValueError(f"Index dim mismatch: index={tenant.d}, vector_dim={dim}")
+
+        manifest = dict(tenant.manifest)
+        name = f"seg_{manifest['next_segment']:06d}"
+
+        next_id = manifest.get("next_id", 0)
+        ids = np.arange(next_id, next_id + len(vectors), dtype=np.int64)
+
+        index = create_delta_index(vectors.shape[1])
+        index.add(vectors)
+
+        segment, paths = _write_segment(
+            client_id,
+            name,
+            index,
+            metadata_list,
+            vectors,
+            ids,
+        )
+
+        tombstones = manifest.get("tombstones", [])
+        if replace_document_id is not None:
+            stale = _document_ids(tenant, replace_document_id)
+            tombstones = _merge_ranges(tombstones + _ids_to_ranges(stale))
+
+        entry = _segment_entry(name, int(index.ntotal))
+        manifest["segments"] = manifest["segments"] + [entry]
+        manifest["tombstones"] = tombstones
+        if plan:
+            manifest["plan"] = plan
+        if document_attributes:
+            manifest["documents"] = {
+                **manifest.get("documents", {}),
+                **document_attributes,
+            }
+        manifest["next_segment"] += 1
+        manifest["next_id"] = next_id + len(vectors)
+        manifest["version"] += 1
+
+        tenant = TenantIndex(
+            manifest=manifest,
+            segments=_prepare_segments(tenant.segments + [segment], manifest),
+        )
+        _publish(client_id, tenant, paths)
+
+    return tenant
+
 
-    index.add(vectors)
-    save_index(client_id, index, existing_meta + metadata_list)
+def add_to_index(
+    client_id: str,
+    embeddings: List[List[float]],
+    metadata_list: List[Dict],
+    plan: Optional[str] = None,
+    document_attributes: Optional[Dict[str, Dict]] = None,
+) -> None:
+    """Append vectors and metadata to the tenant index as a delta segment.
 
-    save_index(client_id, index, all_metadata)
+    ``plan`` is the tenant's plan type, recorded for index type selection.
+    ``document_attributes`` maps document ids to their filter attributes.
+    """
+    tenant = _add_segment(
+        client_id,
+        embeddings,
+        metadata_list,
+        plan=plan,
+        document_attributes=document_attributes,
+    )
 
     logger.info(
         "Added %d vectors to FAISS index for client %s",
@@ -72,89 +825,975 @@ def add_to_index(
         client_id,
     )
 
+    _maybe_schedule_compaction(client_id, tenant)
+
+
+def replace_document(
+    client_id: str,
+    document_id: str,
+    embeddings: List[List[float]],
+    metadata_list: List[Dict],
+    plan: Optional[str] = None,
+    attributes: Optional[Dict] = None,
+) -> None:
+    """Swap a document's vectors for new ones in a single index version.
+
+    The old vectors are tombstoned, so readers never see both versions or
+    neither. ``attributes`` replace the document's filter attributes.
+    """
+    tenant = _add_segment(
+        client_id,
+        embeddings,
+        metadata_list,
+        replace_document_id=document_id,
+        plan=plan,
+        document_attributes={document_id: attributes} if attributes else None,
+    )
+
+    logger.info(
+        "Replaced document %s with %d vectors for client %s",
+        document_id,
+        len(embeddings),
+        client_id,
+    )
+
+    _maybe_schedule_compaction(client_id, tenant)
+
+
+def delete_document(client_id: str, document_id: str) -> int:
+    """Tombstone every vector of a document.
+
+    The vectors stop matching searches immediately and are removed from
+    disk by the next compaction. Returns the number of vectors deleted,
+    0 if the tenant has no index. Storage errors propagate, so callers do
+    not drop the document while its vectors are still searchable.
+    """
+    _ensure_stable_ids(client_id)
+
+    with tenant_write_lock(client_id):
+        try:
+            tenant = _load_latest(client_id)
+        except FileNotFoundError:
+            return 0
+
+        stale = _document_ids(tenant, document_id)
+        if not len(stale):
+            return 0
+
+        manifest = dict(tenant.manifest)
+        manifest["tombstones"] = _merge_ranges(
+            manifest.get("tombstones", []) + _ids_to_ranges(stale)
+        )
+        if document_id in manifest.get("documents", {}):
+            documents = dict(manifest["documents"])
+            documents.pop(document_id)
+            manifest["documents"] = documents
+        manifest["version"] += 1
+
+        tenant = TenantIndex(
+            manifest=manifest,
+            segments=_prepare_segments(tenant.segments, manifest),
+        )
+        _publish(client_id, tenant, [])
+
+    logger.info(
+        "Deleted %d vectors of document %s for client %s",
+        len(stale),
+        document_id,
+        client_id,
+    )
+
+    _maybe_schedule_compaction(client_id, tenant)
+    return int(len(stale))
+
+
+def set_document_attributes(client_id: str, attributes: Dict[str, Dict]) -> None:
+    """Record filter attributes for documents already in the index.
+
+    For documents indexed before attributes were stored.
+    """
+    with tenant_write_lock(client_id):
+        tenant = _load_latest(client_id)
+
+        manifest = dict(tenant.manifest)
+        manifest["documents"] = {**manifest.get("documents", {}), **attributes}
+        manifest["version"] += 1
+
+        tenant = TenantIndex(manifest=manifest, segments=tenant.segments)
+        _publish(client_id, tenant, [])
 
-def save_index(
+
+def _write_base_segment(
     client_id: str,
+    manifest: Dict,
     index: faiss.Index,
     metadata: List[Dict],
-) -> None:
-    """Save index locally and upload to S3."""
-    index_path = _get_index_path(client_id)
-    meta_path = _get_metadata_path(client_id)
+    vectors: np.ndarray,
+    ids: Optional[np.ndarray] = None,
+    postings: Optional[Postings] = None,
+) -> TenantIndex:
+    """Replace every segment with a single base segment and publish it.
 
-    Path(index_path).parent.mkdir(parents=True, exist_ok=True)
+    Rows without ``ids`` get fresh ones. The base holds no deleted rows, so
+    the manifest's tombstones are cleared.
+    """
+    manifest = dict(manifest)
+    name = f"seg_{manifest['next_segment']:06d}"
 
-    faiss.write_index(index, index_path)
+    if ids is None:
+        next_id = manifest.get("next_id", 0)
+        ids = np.arange(next_id, next_id + index.ntotal, dtype=np.int64)
+        manifest["next_id"] = next_id + index.ntotal
 
-    with open(meta_path, "wb") as f:
-        pickle.dump(metadata, f)
+    segment, paths = _write_segment(
+        client_id,
+        name,
+        index,
+        metadata,
+        vectors,
+        ids,
+        postings,
+    )
+
+    manifest["dimension"] = index.d
+    manifest["segments"] = [_segment_entry(name, int(index.ntotal))]
+    manifest["tombstones"] = []
+    manifest["next_segment"] += 1
+    manifest["version"] += 1
+
+    tenant = TenantIndex(
+        manifest=manifest,
+        segments=_prepare_segments([segment], manifest),
+    )
+    _publish(client_id, tenant, paths)
+    return tenant
+
+
+def _load_manifest(client_id: str, min_version: Optional[int] = None) -> Dict:
+    """Read the tenant manifest from local disk or S3.
+
+    A local copy older than ``min_version`` is replaced from S3 first.
+    """
+    path = _get_manifest_path(client_id)
+    _ensure_local(client_id, path)
+
+    if min_version is not None:
+        with open(path, "rb") as f:
+            local_version = json.loads(f.read())["version"]
+        if local_version < min_version:
+            _atomic_write(path, download_file(_s3_key(client_id, MANIFEST_FILENAME)))
+
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+def _read_tenant(
+    client_id: str,
+    min_version: Optional[int] = None,
+    previous: Optional[TenantIndex] = None,
+) -> TenantIndex:
+    """Read a tenant's manifest and segments and cache the result.
+
+    Segments already loaded in ``previous`` are reused, so catching up with
+    another worker's change only reads the segments it added. A result
+    older than what is already cached is returned but not cached.
+    """
+    manifest = _load_manifest(client_id, min_version)
+
+    loaded = {}
+    if previous is not None:
+        loaded = {segment.name: segment for segment in previous.segments}
+    segments = _prepare_segments(
+        [
+            loaded.get(entry["name"]) or _read_segment(client_id, entry)
+            for entry in manifest["segments"]
+        ],
+        manifest,
+    )
+    tenant = TenantIndex(manifest=manifest, segments=segments)
+
+    with _cache_guard:
+        cached = _index_cache.peek(client_id)
+        if cached is None or cached.manifest["version"] <= manifest["version"]:
+            _index_cache.put(client_id, tenant)
+
+    return tenant
+
+
+def load_index(client_id: str) -> TenantIndex:
+    """Load the tenant's segments from cache, local disk, or S3.
+
+    Raises ``FileNotFoundError`` if the tenant has no index at all; any
+    other storage error is re-raised as is.
+    """
+    cached = _index_cache.get(client_id)
+    if cached is not None:
+        return cached
 
     try:
-        with open(index_path, "rb") as f:
-            upload_file(f.read(), f"indexes/{client_id}.index")
+        _load_manifest(client_id, min_version=get_version(client_id))
+    except Exception as exc:
+        if not _is_missing(exc):
+            logger.error("Failed to load index manifest: %s", exc)
+            raise
+        try:
+            return _load_legacy_index(client_id)
+        except Exception as legacy_exc:
+            if _is_missing(legacy_exc):
+                raise FileNotFoundError(f"No index for client {client_id}") from exc
+            logger.error("Failed to load index from S3: %s", legacy_exc)
+            raise
+
+    return _read_tenant(client_id)
+
+
+def _load_latest(client_id: str) -> TenantIndex:
+    """Load a tenant for writing, catching up with other workers' changes.
+
+    Call with the tenant's write lock held.
+    """
+    tenant = load_index(client_id)
+
+    remote = get_version(client_id)
+    if remote is not None and tenant.manifest["version"] < remote:
+        tenant = _read_tenant(client_id, min_version=remote, previous=tenant)
+
+    return tenant
+
+
+def _on_remote_version(client_id: str, version: int) -> None:
+    """Refresh a cached tenant after another worker published a change."""
+    cached = _index_cache.peek(client_id)
+    if cached is None or cached.manifest["version"] >= version:
+        return
 
-        with open(meta_path, "rb") as f:
-            upload_file(f.read(), f"indexes/{client_id}_meta.pkl")
+    try:
+        _read_tenant(client_id, min_version=version, previous=cached)
     except Exception as exc:
-        logger.warning(
-            "S3 upload failed, continuing with local cache: %s",
-            exc,
-        )
+        logger.warning("Failed to refresh index for client %s: %s", client_id, exc)
+        _index_cache.pop(client_id)
 
-    _index_cache[client_id] = (index, metadata)
 
+def start_index_sync() -> None:
+    """Keep this process's cached indexes in step with other workers."""
+    # A reconnect may have missed notifications, so drop every cached
+    # tenant; the hit/miss counters are kept for the stats endpoint.
+    start_listener(_on_remote_version, _index_cache.drop_all)
 
-def load_index(client_id: str) -> Tuple[faiss.Index, List[Dict]]:
-    """Load index from cache, local disk, or S3."""
-    if client_id in _index_cache:
-        return _index_cache[client_id]
 
-    index_path = _get_index_path(client_id)
-    meta_path = _get_metadata_path(client_id)
+def stop_index_sync() -> None:
+    """Stop following other workers' index changes."""
+    stop_listener()
 
-    if not os.path.exists(index_path) or not os.path.exists(meta_path):
+
+def _build_index(
+    dimension: int,
+    vectors: np.ndarray,
+    index_factory: str,
+) -> faiss.Index:
+    """Build an index over raw vectors, training it first if required.
+
+    ``index_factory`` is a FAISS factory string such as ``"HNSW32"`` or
+    ``"IVF256,PQ32"``.
+    """
+    if index_factory == INDEX_SHARED_FLAT:
+        index = _single_list_ivf(dimension)
+    else:
+        index = faiss.index_factory(dimension, index_factory)
+
+    if not index.is_trained:
+        if not len(vectors):
+            return faiss.index_factory(dimension, INDEX_FLAT)
+
+        sample = vectors
+        if len(vectors) > _MAX_TRAIN_VECTORS:
+            rng = np.random.default_rng(0)
+            picks = rng.choice(len(vectors), _MAX_TRAIN_VECTORS, replace=False)
+            sample = vectors[picks]
+        index.train(sample)
+
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(settings.FAISS_IVF_NPROBE, index.nlist)
+
+    if len(vectors):
+        index.add(vectors)
+
+    return index
+
+
+def _merge_segments(
+    client_id: str,
+    force: bool = False,
+    index_factory: Optional[str] = None,
+) -> Optional[int]:
+    """Rebuild a tenant's segments into one base segment from raw vectors.
+
+    Tombstoned rows are dropped, and the index type is ``index_factory`` or
+    else ``select_index_type``'s choice. Unless ``force`` is set, does
+    nothing (and returns None) when the tenant already has a single base
+    segment of the right type without tombstones; otherwise returns the
+    vector count.
+    """
+    with tenant_write_lock(client_id):
+        tenant = _load_latest(client_id)
+
+        if not tenant.segments:
+            return None
+
+        if not force and not (
+            len(tenant.segments) > 1 or tenant.deleted_count or _needs_migration(tenant)
+        ):
+            return None
+
+        manifest = dict(tenant.manifest)
+        ranges = manifest.get("tombstones", [])
+        next_id = manifest.get("next_id", 0)
+
+        vectors_parts: List[np.ndarray] = []
+        ids_parts: List[np.ndarray] = []
+        lexical_parts: List[Tuple[Postings, np.ndarray]] = []
+        metadata: List[Dict] = []
+        for segment in tenant.segments:
+            count = segment.index.ntotal
+            if segment.ids is not None:
+                ids = np.asarray(segment.ids, dtype=np.int64)
+            else:
+                ids = np.arange(next_id, next_id + count, dtype=np.int64)
+                next_id += count
+
+            keep = ~_tombstone_mask(ids, ranges)
+            vectors_parts.append(_segment_vectors(segment)[keep])
+            ids_parts.append(ids[keep])
+            if segment.lexical is not None:
+                lexical_parts.append((segment.lexical.postings(), keep))
+            metadata.extend(segment.metadata[int(i)] for i in np.flatnonzero(keep))
+
+        manifest["next_id"] = next_id
+        vectors = np.concatenate(vectors_parts)
+        ids = np.concatenate(ids_parts)
+
+        # Older segments without postings are re-tokenized with the rest.
+        postings = None
+        if len(lexical_parts) == len(tenant.segments):
+            postings = merge_postings(lexical_parts)
+
+        index_factory = index_factory or select_index_type(
+            len(vectors),
+            tenant.d,
+            manifest.get("plan"),
+        )
+        index = _build_index(tenant.d, vectors, index_factory)
+        manifest["index_type"] = index_factory
+        manifest["search_params"] = tune_search_params(
+            index,
+            vectors,
+            _target_recall(manifest.get("plan")),
+        )
+
+        obsolete = [
+            path
+            for entry in tenant.manifest["segments"]
+            for path in _segment_files(client_id, entry)
+        ]
+        _write_base_segment(
+            client_id,
+            manifest,
+            index,
+            metadata,
+            vectors,
+            ids,
+            postings,
+        )
+
+    for path in obsolete:
         try:
-            index_bytes = download_file(f"indexes/{client_id}.index")
-            meta_bytes = download_file(f"indexes/{client_id}_meta.pkl")
+            os.remove(path)
+        except OSError:
+            pass
+        delete_file(_s3_key(client_id, Path(path).name))
+
+    return int(index.ntotal)
+
+
+def _ensure_stable_ids(client_id: str) -> None:
+    """Give segments written before stable ids existed their ids."""
+    try:
+        tenant = load_index(client_id)
+    except FileNotFoundError:
+        return
+
+    if any(segment.ids is None for segment in tenant.segments):
+        _merge_segments(client_id, force=True)
+
+
+def compact_index(client_id: str) -> None:
+    """Merge all of a tenant's segments into a single new base segment.
+
+    Also drops tombstoned vectors and migrates the base to the index type
+    the tenant's size and plan now call for.
+    """
+    count = _merge_segments(client_id)
+
+    if count is not None:
+        logger.info("Compacted segments for client %s (%d vectors)", client_id, count)
+
+
+def rebuild_index(client_id: str, index_factory: Optional[str] = None) -> int:
+    """Rebuild a tenant's index from its stored raw vectors.
+
+    Used after changing index parameters; no embeddings are recomputed.
+    Without ``index_factory`` the type comes from ``select_index_type``;
+    an explicit type may be migrated away from by a later compaction.
+    Returns the number of vectors indexed.
+    """
+    count = _merge_segments(client_id, force=True, index_factory=index_factory)
+    logger.info("Rebuilt index for client %s (%d vectors)", client_id, count or 0)
+    return count or 0
+
+
+def get_index_version(client_id: str) -> Optional[int]:
+    """Current manifest version of a tenant index, or None if it has none."""
+    try:
+        return load_index(client_id).manifest["version"]
+    except FileNotFoundError:
+        return None
+
+
+def get_cache_stats() -> Dict:
+    """Hit, miss and eviction counters for the loaded-index cache."""
+    return _index_cache.stats()
+
+
+def backup_index(client_id: str) -> None:
+    """Re-upload the tenant manifest and every segment to S3."""
+    tenant = load_index(client_id)
+
+    paths = [_get_manifest_path(client_id)]
+    for entry in tenant.manifest["segments"]:
+        paths.extend(_segment_files(client_id, entry))
+
+    _upload_files(client_id, paths)
+
 
-            with open(index_path, "wb") as f:
-                f.write(index_bytes)
+def schedule_compaction(client_id: str) -> None:
+    """Queue a background compaction unless one is already pending."""
+    with _compaction_guard:
+        if client_id in _compaction_pending:
+            return
+        _compaction_pending.add(client_id)
 
-            with open(meta_path, "wb") as f:
-                f.write(meta_bytes)
+    def _run() -> None:
+        try:
+            compact_index(client_id)
         except Exception as exc:
-            logger.error("Failed to load index from S3: %s", exc)
-            raise
+            logger.error("Compaction failed for client %s: %s", client_id, exc)
+        finally:
+            with _compaction_guard:
+                _compaction_pending.discard(client_id)
 
-    index = faiss.read_index(index_path)
+    _compaction_executor.submit(_run)
 
-    with open(meta_path, "rb") as f:
-        metadata = pickle.load(f)
 
-    _index_cache[client_id] = (index, metadata)
-    return index, metadata
+def _is_lossy(index: faiss.Index) -> bool:
+    """Whether an index stores compressed rather than exact vectors."""
+    return not isinstance(
+        index,
+        (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat),
+    )
+
+
+def _rerank_exact(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Re-score candidate rows by exact L2 distance on the raw vectors.
+
+    Returns ``(distances, indices)`` shaped like a FAISS search result.
+    """
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    indices = np.full((len(queries), k), -1, dtype=np.int64)
+
+    for row, (query, rows) in enumerate(zip(queries, candidates)):
+        rows = rows[rows >= 0]
+        if not len(rows):
+            continue
+
+        exact = np.asarray(vectors[rows], dtype=np.float32) - query
+        scores = np.einsum("ij,ij->i", exact, exact)
+        order = np.argsort(scores)[:k]
+
+        distances[row, : len(order)] = scores[order]
+        indices[row, : len(order)] = rows[order]
+
+    return distances, indices
+
+
+def _first_live(
+    distances: np.ndarray,
+    indices: np.ndarray,
+    deleted: np.ndarray,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the first ``k`` results per row that are not deleted."""
+    out_d = np.full((len(indices), k), np.inf, dtype=np.float32)
+    out_i = np.full((len(indices), k), -1, dtype=np.int64)
+
+    live = (indices >= 0) & ~deleted[np.maximum(indices, 0)]
+    for row in range(len(indices)):
+        keep = np.flatnonzero(live[row])[:k]
+        out_d[row, : len(keep)] = distances[row, keep]
+        out_i[row, : len(keep)] = indices[row, keep]
+
+    return out_d, out_i
+
+
+def _search_with(
+    index: faiss.Index,
+    vectors: Optional[np.ndarray],
+    queries: np.ndarray,
+    k: int,
+    params: Optional[faiss.SearchParameters] = None,
+    deleted: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Search one index.
+
+    Compressed indexes over-fetch, then re-rank on the raw vectors. Rows
+    flagged in ``deleted`` are filtered out of the results, over-fetching
+    until every query has enough live results.
+    """
+    refine = vectors is not None and _is_lossy(index)
+    want = k * settings.FAISS_REFINE_FACTOR if refine else k
+    want = min(want, index.ntotal)
+
+    if deleted is None:
+        distances, indices = index.search(queries, want, params=params)
+    else:
+        enough = min(want, index.ntotal - int(deleted.sum()))
+        fetch = min(2 * want, index.ntotal)
+        while True:
+            distances, indices = index.search(queries, fetch, params=params)
+            distances, indices = _first_live(distances, indices, deleted, want)
+            if fetch >= index.ntotal or (indices >= 0).sum(axis=1).min() >= enough:
+                break
+            fetch = min(4 * fetch, index.ntotal)
+
+    if refine:
+        distances, indices = _rerank_exact(vectors, queries, indices, k)
+
+    return distances, indices
+
+
+def _exact_knn(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    block_rows: int = 65536,
+) -> np.ndarray:
+    """Row ids of the exact ``k`` nearest vectors, scanning in blocks."""
+    return _exact_search(vectors, queries, k, block_rows)[1]
+
+
+def _exact_search(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    block_rows: int = 65536,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact ``k`` nearest rows as ``(distances, indices)``, in blocks."""
+    best_d = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_i = np.empty((len(queries), 0), dtype=np.int64)
+    q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start : start + block_rows], dtype=np.float32)
+        d = q_norms - 2 * queries @ block.T + np.einsum("ij,ij->i", block, block)
+        ids = np.broadcast_to(
+            np.arange(start, start + len(block), dtype=np.int64),
+            d.shape,
+        )
+
+        best_d = np.concatenate([best_d, d], axis=1)
+        best_i = np.concatenate([best_i, ids], axis=1)
+        order = np.argsort(best_d, axis=1)[:, :k]
+        best_d = np.take_along_axis(best_d, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+
+    return best_d, best_i
+
+
+def _target_recall(plan: Optional[str]) -> float:
+    """Recall@k the tuner aims for; premium plans get a stricter target."""
+    if plan and plan in settings.FAISS_PREMIUM_PLANS.split(","):
+        return settings.FAISS_PREMIUM_TARGET_RECALL
+    return settings.FAISS_TARGET_RECALL
+
+
+def tune_search_params(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    target_recall: float,
+    k: Optional[int] = None,
+    sample_size: Optional[int] = None,
+) -> Dict:
+    """Find the smallest ``efSearch``/``nprobe`` reaching ``target_recall``.
+
+    A sample of the index's own vectors is used as queries, leave-one-out:
+    each query's own row is dropped from both the exact and approximate
+    neighbours. Returns e.g. ``{"efSearch": 48, "recall": 0.96}``, the
+    largest candidate if none reaches the target, or ``{}`` for indexes
+    without a search-time knob. The chosen value is left set on ``index``.
+    """
+    k = k or settings.FAISS_TUNE_K
+    sample_size = sample_size or settings.FAISS_TUNE_QUERIES
+
+    if isinstance(index, faiss.IndexHNSW):
+        name, candidates = "efSearch", _EF_SEARCH_CANDIDATES
+    elif isinstance(index, faiss.IndexIVF):
+        name = "nprobe"
+        candidates = [n for n in _NPROBE_CANDIDATES if n < index.nlist]
+        candidates.append(index.nlist)
+    else:
+        return {}
+
+    n = index.ntotal
+    if n <= k + 1:
+        return {}
+
+    rng = np.random.default_rng(0)
+    picks = np.sort(rng.choice(n, min(sample_size, n), replace=False))
+    queries = np.asarray(vectors[picks], dtype=np.float32)
+
+    def without_self(found: np.ndarray) -> List[set]:
+        return [set(row[row != own][:k]) for row, own in zip(found, picks)]
+
+    truth = without_self(_exact_knn(vectors, queries, k + 1))
+
+    result: Dict = {}
+    for value in candidates:
+        _apply_tuned(index, {name: value})
+        _, found = _search_with(index, vectors, queries, k + 1)
+        hits = sum(len(a & b) for a, b in zip(without_self(found), truth))
+        recall = hits / max(sum(len(t) for t in truth), 1)
+        result = {name: int(value), "recall": round(recall, 4)}
+        if recall >= target_recall:
+            break
+
+    return result
+
+
+def tune_index(client_id: str) -> Dict:
+    """Re-tune a tenant's search parameters and publish them.
+
+    Compaction already tunes every new base segment; this is for changed
+    targets without a rebuild. Returns the stored parameters.
+    """
+    with tenant_write_lock(client_id):
+        tenant = _load_latest(client_id)
+        base = tenant.segments[0] if tenant.segments else None
+        if base is None:
+            return {}
+
+        tuned = tune_search_params(
+            base.index,
+            _segment_vectors(base),
+            _target_recall(tenant.manifest.get("plan")),
+        )
+
+        manifest = dict(tenant.manifest)
+        manifest["search_params"] = tuned
+        manifest["version"] += 1
+
+        tenant = TenantIndex(
+            manifest=manifest,
+            segments=_prepare_segments(tenant.segments, manifest),
+        )
+        _publish(client_id, tenant, [])
+
+    logger.info("Tuned search for client %s: %s", client_id, tuned)
+    return tuned
+
+
+def _matching_documents(manifest: Dict, filters: Dict) -> Optional[Set[str]]:
+    """Documents allowed by the document-level filters; None if unrestricted.
+
+    Documents without recorded attributes never match attribute filters.
+    """
+    allowed = None
+    if filters.get("document_ids") is not None:
+        allowed = set(filters["document_ids"])
+
+    source_type = filters.get("source_type")
+    after = filters.get("created_after")
+    before = filters.get("created_before")
+    if source_type is None and after is None and before is None:
+        return allowed
+
+    matched = set()
+    for document_id, attrs in manifest.get("documents", {}).items():
+        created = attrs.get("created_at")
+        if source_type is not None and attrs.get("source_type") != source_type:
+            continue
+        if after is not None and (created is None or created < after):
+            continue
+        if before is not None and (created is None or created >= before):
+            continue
+        matched.add(document_id)
+
+    return matched if allowed is None else allowed & matched
+
+
+def _filter_masks(tenant: TenantIndex, filters: Dict) -> List[np.ndarray]:
+    """Per-segment masks of the live rows a filter allows.
+
+    Compiled once per tenant version and filter, so widgets that always
+    search the same subset pay for it once.
+    """
+    key = json.dumps(filters, sort_keys=True, default=str)
+    cached = tenant.filter_masks.get(key)
+    if cached is not None:
+        return cached
+
+    documents = _matching_documents(tenant.manifest, filters)
+    ranges = tenant.manifest.get("tombstones", [])
+
+    masks = []
+    for segment in tenant.segments:
+        mask = np.ones(len(segment.metadata), dtype=bool)
+        if documents is not None:
+            mask &= segment.metadata.document_mask(documents)
+        if filters.get("filename") is not None:
+            mask &= segment.metadata.filename_mask(filters["filename"])
+        if segment.ids is not None:
+            mask &= ~_tombstone_mask(np.asarray(segment.ids), ranges)
+        masks.append(mask)
+
+    if len(tenant.filter_masks) >= _FILTER_CACHE_SIZE:
+        tenant.filter_masks.pop(next(iter(tenant.filter_masks)), None)
+    tenant.filter_masks[key] = masks
+    return masks
+
+
+def _filtered_search(
+    segment: Segment,
+    queries: np.ndarray,
+    k: int,
+    allowed: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Search only the rows of a segment flagged in ``allowed``.
+
+    Small subsets are scanned exactly on the raw vectors. Otherwise FAISS
+    skips disallowed rows via an ``IDSelectorBitmap``; HNSW results are
+    post-filtered instead, as for tombstones.
+    """
+    rows = np.flatnonzero(allowed)
+
+    small = len(rows) <= settings.FAISS_FILTER_EXACT_MAX_ROWS
+    if segment.vectors is not None and small:
+        distances, found = _exact_search(segment.vectors[rows], queries, k)
+        return distances, rows[found]
+
+    if isinstance(segment.index, faiss.IndexHNSW):
+        return _search_with(
+            segment.index,
+            segment.vectors,
+            queries,
+            k,
+            deleted=~allowed,
+        )
+
+    bitmap = np.packbits(allowed, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(bitmap))
+    return _search_with(
+        segment.index,
+        segment.vectors,
+        queries,
+        k,
+        _selector_params(segment.index, selector),
+    )
+
+
+def search_index_batch(
+    client_id: str,
+    query_matrix: List[List[float]],
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+) -> List[List[Dict]]:
+    """Search the FAISS index for many queries with one call per segment.
+
+    ``filters`` restricts every query to the matching rows.
+    """
+    tenant = load_index(client_id)
+
+    q = np.asarray(query_matrix, dtype="float32")
+
+    if q.ndim != 2:
+        raise ValueError("Query matrix must be a 2D array")
+
+    if q.shape[1] != tenant.d:
+        raise ValueError(f"Query dim mismatch: query={q.shape[1]}, index={tenant.d}")
+
+    masks: List[Optional[np.ndarray]] = [None] * len(tenant.segments)
+    if filters:
+        masks = _filter_masks(tenant, filters)
+
+    hits: List[List[Tuple[float, Segment, int]]] = [[] for _ in range(len(q))]
+    for segment, allowed in zip(tenant.segments, masks):
+        if allowed is None:
+            k = min(top_k, segment.index.ntotal - segment.deleted_count)
+        else:
+            k = min(top_k, int(allowed.sum()))
+        if k == 0:
+            continue
+
+        if allowed is None:
+            distances, indices = _search_with(
+                segment.index,
+                segment.vectors,
+                q,
+                k,
+                segment.params,
+                segment.deleted_mask,
+            )
+        else:
+            distances, indices = _filtered_search(segment, q, k, allowed)
+
+        for row_hits, row_distances, row_indices in zip(hits, distances, indices):
+            for distance, idx in zip(row_distances, row_indices):
+                if 0 <= idx < len(segment.metadata):
+                    row_hits.append((float(distance), segment, int(idx)))
+
+    batch_results: List[List[Dict]] = []
+    for row_hits in hits:
+        row_hits.sort(key=lambda hit: hit[0])
+
+        results: List[Dict] = []
+        for distance, segment, idx in row_hits[:top_k]:
+            row = segment.metadata[idx]
+            row["score"] = float(1 / (1 + distance))
+            results.append(row)
+
+        batch_results.append(results)
+
+    return batch_results
 
 
 def search_index(
     client_id: str,
     query_embedding: List[float],
     top_k: int = 5,
+    filters: Optional[Dict] = None,
 ) -> List[Dict]:
-    """Search FAISS index for similar vectors."""
-    index, metadata = load_index(client_id)
+    """Search every segment of the FAISS index for similar vectors."""
+    return search_index_batch(client_id, [query_embedding], top_k, filters)[0]
 
-    q = np.array([query_embedding], dtype="float32")
 
-    if q.shape[1] != index.d:
-        raise ValueError(f"Query dim mismatch: query={q.shape[1]}, index={index.d}")
+def search_lexical(
+    client_id: str,
+    query: str,
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
+    """Rank a tenant's chunks by BM25 against the query's terms.
 
-    distances, indices = index.search(q, top_k)
+    Document frequencies and lengths are summed over every segment, so
+    scores are comparable across segments. Each row's ``score`` is the
+    idf-weighted share of query terms it contains (1.0 when all match)
+    and ``bm25_score`` the raw BM25 score used for ranking. Segments
+    written before lexical indexing are skipped until compacted.
+    ``filters`` restricts results as in ``search_index_batch``.
+    """
+    tenant = load_index(client_id)
+    masks: List[Optional[np.ndarray]] = [None] * len(tenant.segments)
+    if filters:
+        masks = _filter_masks(tenant, filters)
+    allowed = {segment.name: mask for segment, mask in zip(tenant.segments, masks)}
+    segments = [s for s in tenant.segments if s.lexical is not None]
+    terms = term_hashes(dict.fromkeys(tokenize(query)))
+    if not segments or not len(terms):
+        return []
+
+    n_docs = sum(segment.lexical.n_docs for segment in segments)
+    total_len = sum(segment.lexical.total_len for segment in segments)
+    df = sum(segment.lexical.doc_freqs(terms) for segment in segments)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+    avgdl = max(total_len / max(n_docs, 1), 1.0)
+    ranges = tenant.manifest.get("tombstones", [])
+
+    hits: List[Tuple[float, float, Segment, int]] = []
+    for segment in segments:
+        rows, scores, matched = segment.lexical.score(
+            terms,
+            idf,
+            avgdl,
+            settings.BM25_K1,
+            settings.BM25_B,
+        )
+        mask = allowed[segment.name]
+        if mask is not None:
+            live = mask[rows]
+        elif ranges and segment.ids is not None:
+            live = ~_tombstone_mask(np.asarray(segment.ids)[rows], ranges)
+        else:
+            live = slice(None)
+        rows, scores, matched = rows[live], scores[live], matched[live]
+
+        best = np.argsort(-scores, kind="stable")[:top_k]
+        for i in best:
+            hits.append((float(scores[i]), float(matched[i]), segment, int(rows[i])))
+
+    hits.sort(key=lambda hit: -hit[0])
+    total_idf = float(idf.sum()) or 1.0
 
     results: List[Dict] = []
-    for i, idx in enumerate(indices[0]):
-        if 0 <= idx < len(metadata):
-            m = metadata[idx].copy()
-            m["score"] = float(1 / (1 + distances[0][i]))
-            results.append(m)
+    for score, matched, segment, idx in hits[:top_k]:
+        row = segment.metadata[idx]
+        row["score"] = min(matched / total_idf, 1.0)
+        row["bm25_score"] = score
+        results.append(row)
 
     return results
+
+
+def get_chunk_vectors(client_id: str, chunks: List[Dict]) -> Optional[np.ndarray]:
+    """Raw float32 vectors of search results, row-aligned with ``chunks``.
+
+    Rows are located by ``document_id`` and ``chunk_index``, newest segment
+    first and skipping tombstoned rows, so a replaced document resolves to
+    its live copy. Returns None if any chunk cannot be located.
+    """
+    tenant = load_index(client_id)
+    ranges = tenant.manifest.get("tombstones", [])
+
+    wanted: Dict[str, List[Tuple[int, int]]] = {}
+    for pos, chunk in enumerate(chunks):
+        if chunk.get("document_id") is None or chunk.get("chunk_index") is None:
+            return None
+        position = (pos, int(chunk["chunk_index"]))
+        wanted.setdefault(chunk["document_id"], []).append(position)
+
+    vectors = np.zeros((len(chunks), tenant.d or 0), dtype=np.float32)
+    found = np.zeros(len(chunks), dtype=bool)
+
+    for segment in reversed(tenant.segments):
+        for document_id, items in wanted.items():
+            rows = segment.metadata.rows_for_document(document_id)
+            if ranges and segment.ids is not None and len(rows):
+                rows = rows[~_tombstone_mask(np.asarray(segment.ids)[rows], ranges)]
+            if not len(rows):
+                continue
+
+            indices = segment.metadata.chunk_indices(rows)
+            for pos, chunk_index in items:
+                match = rows[indices == chunk_index]
+                if found[pos] or not len(match):
+                    continue
+                row = int(match[0])
+                if segment.vectors is not None:
+                    vectors[pos] = segment.vectors[row]
+                else:
+                    vectors[pos] = segment.index.reconstruct(row)
+                found[pos] = True
+
+    return vectors if found.all() else None
@@ -0,0 +1,83 @@
+"""Content-addressed store of chunk embeddings.
+
+Each chunk is keyed by the SHA-256 of its normalized text, per tenant and
+embedding model, and its embedding is kept in Redis as float16 bytes. When
+a tenant re-uploads an edited document only the changed chunks are sent to
+the embedding API. Redis failures are logged and treated as misses.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+
+from backend.app.core.config import settings
+from backend.app.utils.logger import logger
+from backend.app.utils.redis_client import redis_binary_client
+
+
+def normalize_chunk(text: str) -> str:
+    """Normalize chunk text so whitespace-only edits hash the same."""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk's normalized text."""
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+
+def _key(client_id: str, model: str, digest: str) -> str:
+    """Redis key for one chunk embedding."""
+    return f"chunkemb:{client_id}:{model}:{digest}"
+
+
+def _decode(value: bytes) -> List[float]:
+    """Embedding stored as float16 bytes, widened back to float32."""
+    return np.frombuffer(value, dtype=np.float16).astype(np.float32).tolist()
+
+
+def get_chunk_embeddings(
+    client_id: str,
+    model: str,
+    hashes: List[str],
+) -> List[Optional[List[float]]]:
+    """Look up stored embeddings; None for each hash not found."""
+    if not hashes or redis_binary_client is None:
+        return [None] * len(hashes)
+
+    try:
+        keys = [_key(client_id, model, digest) for digest in hashes]
+        values = redis_binary_client.mget(keys)
+    except Exception as exc:
+        logger.warning(f"Chunk embedding lookup failed: {exc}")
+        return [None] * len(hashes)
+
+    return [_decode(value) if value else None for value in values]
+
+
+def set_chunk_embeddings(
+    client_id: str,
+    model: str,
+    hashes: List[str],
+    embeddings: List[List[float]],
+) -> None:
+    """Store embeddings for their content hashes."""
+    if not hashes or redis_binary_client is None:
+        return
+
+    ttl = settings.CHUNK_EMBEDDING_TTL_SECONDS
+
+    try:
+        pipe = redis_binary_client.pipeline(transaction=False)
+        for digest, embedding in zip(hashes, embeddings):
+            pipe.setex(
+                _key(client_id, model, digest),
+                ttl,
+                np.asarray(embedding, dtype=np.float16).tobytes(),
+            )
+        pipe.execute()
+    except Exception as exc:
+        logger.warning(f"Chunk embedding store failed: {exc}")
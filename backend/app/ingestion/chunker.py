@@ -1,15 +1,115 @@
-"""Text chunking utilities for token-based and sentence-based chunking."""
+"""Text chunking utilities for token-based and sentence-based chunking.
+
+Both chunkers tokenize each piece of text exactly once and report true
+character offsets (``start_char``/``end_char``) into the source text.
+"""
 
 import re
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 import tiktoken
 
+# Sentence ends followed by whitespace, or paragraph breaks.
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+# Every byte that starts a UTF-8 character (i.e. is not 0b10xxxxxx).
+_LEAD_BYTES = bytes(b for b in range(256) if b & 0xC0 != 0x80)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Return a cached tiktoken encoding."""
+    return tiktoken.get_encoding(encoding_name)
+
 
 def count_tokens(text: str, encoding_name: str = "cl100k_base") -> int:
     """Count tokens in text."""
-    encoding = tiktoken.get_encoding(encoding_name)
-    return len(encoding.encode(text))
+    return len(get_encoding(encoding_name).encode_ordinary(text))
+
+
+def count_tokens_batch(
+    texts: List[str],
+    encoding_name: str = "cl100k_base",
+) -> List[int]:
+    """Count tokens for many texts at once, encoding them in parallel."""
+    encoding = get_encoding(encoding_name)
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def _char_len(data: bytes) -> int:
+    """Number of characters that start within a UTF-8 byte string."""
+    return len(data) - len(data.translate(None, _LEAD_BYTES))
+
+
+def _make_chunk(
+    text: str,
+    filename: str,
+    chunk_index: int,
+    token_count: int,
+    start_char: int,
+    end_char: int,
+) -> Dict:
+    """Build a chunk dict in the shape the ingestion pipeline expects."""
+    return {
+        "text": text,
+        "metadata": {
+            "filename": filename,
+            "chunk_index": chunk_index,
+            "token_count": token_count,
+            "start_char": start_char,
+            "end_char": end_char,
+        },
+    }
+
+
+def iter_chunks(
+    blocks: Iterable[str],
+    filename: str,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    encoding_name: str = "cl100k_base",
+) -> Iterator[Dict]:
+    """Chunk a stream of text blocks into overlapping token windows.
+
+    Only the tokens of the current block plus one window are held, so
+    memory does not grow with the document. Character offsets refer to the
+    concatenated blocks.
+    """
+    encoding = get_encoding(encoding_name)
+    step = chunk_size - chunk_overlap
+
+    buffer: List[int] = []
+    buffer_char = 0  # character offset of buffer[0] in the whole stream
+    chunk_index = 0
+
+    def window(tokens: List[int]) -> Dict:
+        data = encoding.decode_bytes(tokens)
+        return _make_chunk(
+            data.decode("utf-8", errors="replace"),
+            filename,
+            chunk_index,
+            len(tokens),
+            buffer_char,
+            buffer_char + _char_len(data),
+        )
+
+    for block in blocks:
+        buffer.extend(encoding.encode_ordinary(block))
+
+        # Advance a cursor and compact once per block; deleting from the
+        # front per window would make a large block quadratic.
+        pos = 0
+        while len(buffer) - pos > chunk_size:
+            yield window(buffer[pos : pos + chunk_size])
+            chunk_index += 1
+            buffer_char += _char_len(encoding.decode_bytes(buffer[pos : pos + step]))
+            pos += step
+        del buffer[:pos]
+
+    # Emit the tail unless the previous window already covered it.
+    if buffer and (chunk_index == 0 or len(buffer) > chunk_overlap):
+        yield window(buffer)
 
 
 def chunk_text(
@@ -33,78 +133,117 @@ def chunk_text(
             }
         }
     """
-    encoding = tiktoken.get_encoding(encoding_name)
-    tokens = encoding.encode(text)
-
-    chunks = []
-    start = 0
-    chunk_index = 0
-
-    while start < len(tokens):
-        end = start + chunk_size
-        chunk_tokens = tokens[start:end]
-
-        chunk_text_value = encoding.decode(chunk_tokens)
-
-        chunks.append(
-            {
-                "text": chunk_text_value,
-                "metadata": {
-                    "filename": filename,
-                    "chunk_index": chunk_index,
-                    "token_count": len(chunk_tokens),
-                    "start_char": start,
-                    "end_char": end,
-                },
-            }
+    return list(
+        iter_chunks(
+            [text],
+            filename,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            encoding_name=encoding_name,
         )
+    )
 
-        chunk_index += 1
-        start = end - chunk_overlap  # overlapping window
 
-    return chunks
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Split text into ``(start, end)`` character spans of sentences.
+
+    Sentence ends and paragraph breaks are boundaries; the whitespace
+    between sentences belongs to neither span.
+    """
+    spans = []
+    start = len(text) - len(text.lstrip())
 
+    for match in _SENTENCE_BREAK.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = match.end()
 
-def chunk_by_sentences(text: str, filename: str, max_tokens: int = 512) -> List[Dict]:
-    """Chunk text by sentence boundaries for semantic coherence."""
-    # Split text into sentences
-    sentences = re.split(r"(?<=[.!?])\s+", text)
+    if start < len(text) and text[start:].strip():
+        spans.append((start, len(text.rstrip())))
 
-    chunks = []
-    current_chunk = ""
-    chunk_index = 0
+    return spans
 
-    for sentence in sentences:
-        test_chunk = (current_chunk + " " + sentence).strip()
-
-        # Check if adding this sentence exceeds max token limit
-        if current_chunk and count_tokens(test_chunk) > max_tokens:
-            chunks.append(
-                {
-                    "text": current_chunk,
-                    "metadata": {
-                        "filename": filename,
-                        "chunk_index": chunk_index,
-                        "token_count": count_tokens(current_chunk),
-                    },
-                }
-            )
-            chunk_index += 1
-            current_chunk = sentence  # start new chunk
-        else:
-            current_chunk = test_chunk
 
-    # Add last chunk
-    if current_chunk:
+def chunk_by_sentences(
+    text: str,
+    filename: str,
+    max_tokens: int = 512,
+    overlap_sentences: int = 0,
+    encoding_name: str = "cl100k_base",
+) -> List[Dict]:
+    """Chunk text by sentence and paragraph boundaries for semantic coherence.
+
+    Each sentence is tokenized once and sentences are packed greedily up to
+    ``max_tokens`` using running totals. Each chunk after the first repeats
+    the last ``overlap_sentences`` sentences of the previous one (as long
+    as they fit in half the budget). A sentence longer than ``max_tokens``
+    is split into token windows of its own. ``token_count`` is the running
+    sum of sentence token counts.
+    """
+    encoding = get_encoding(encoding_name)
+    spans = split_sentences(text)
+    # A plain loop: for sentence-sized pieces, encode_batch's per-item
+    # thread dispatch costs more than it saves.
+    encode = encoding.encode_ordinary
+    token_counts = [len(encode(text[start:end])) for start, end in spans]
+
+    chunks: List[Dict] = []
+    current: List[int] = []  # indices into spans
+    current_tokens = 0
+
+    def flush() -> None:
+        start, end = spans[current[0]][0], spans[current[-1]][1]
         chunks.append(
-            {
-                "text": current_chunk,
-                "metadata": {
-                    "filename": filename,
-                    "chunk_index": chunk_index,
-                    "token_count": count_tokens(current_chunk),
-                },
-            }
+            _make_chunk(
+                text[start:end],
+                filename,
+                len(chunks),
+                current_tokens,
+                start,
+                end,
+            )
         )
 
+    for idx, tokens in enumerate(token_counts):
+        if tokens > max_tokens:
+            if current:
+                flush()
+                current, current_tokens = [], 0
+            start, end = spans[idx]
+            for piece in iter_chunks(
+                [text[start:end]],
+                filename,
+                chunk_size=max_tokens,
+                chunk_overlap=0,
+                encoding_name=encoding_name,
+            ):
+                meta = piece["metadata"]
+                chunks.append(
+                    _make_chunk(
+                        piece["text"],
+                        filename,
+                        len(chunks),
+                        meta["token_count"],
+                        start + meta["start_char"],
+                        start + meta["end_char"],
+                    )
+                )
+            continue
+
+        if current and current_tokens + tokens > max_tokens:
+            flush()
+            carried = current[-overlap_sentences:] if overlap_sentences else []
+            carried_tokens = sum(token_counts[i] for i in carried)
+            while carried and (
+                carried_tokens > max_tokens // 2 or carried_tokens + tokens > max_tokens
+            ):
+                carried_tokens -= token_counts[carried.pop(0)]
+            current, current_tokens = carried, carried_tokens
+
+        current.append(idx)
+        current_tokens += tokens
+
+    if current:
+        flush()
+
     return chunks
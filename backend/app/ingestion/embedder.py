@@ -1,45 +1,186 @@
 """Embedding service for generating vector embeddings for text chunks."""
 
-from typing import Dict, List, Tuple
+import asyncio
+import random
+from typing import Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
 
 from backend.app.core.config import settings
+from backend.app.ingestion.chunk_store import (
+    chunk_hash,
+    get_chunk_embeddings,
+    set_chunk_embeddings,
+)
+from backend.app.ingestion.chunker import count_tokens_batch
 from backend.app.ingestion.embedder_hf import get_embeddings as ge
 from backend.app.utils.logger import logger
 
-# Initialize OpenAI client once
-openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Initialize OpenAI client once; retries are handled per batch below.
+openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+
+_embedding_semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+
+_RETRYABLE_ERRORS = (
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+)
+
+
+def split_batches(
+    token_counts: List[int],
+    max_tokens: int,
+    max_inputs: int,
+) -> List[Tuple[int, int]]:
+    """Split inputs into contiguous [start, end) ranges within both budgets.
+
+    An input larger than ``max_tokens`` gets a batch of its own.
+    """
+    batches = []
+    start = 0
+    batch_tokens = 0
+
+    for i, tokens in enumerate(token_counts):
+        full = i - start >= max_inputs or batch_tokens + tokens > max_tokens
+        if i > start and full:
+            batches.append((start, i))
+            start = i
+            batch_tokens = 0
+        batch_tokens += tokens
+
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+
+    return batches
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Backoff delay, honouring Retry-After on rate-limit responses."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return min(2**attempt, 30) + random.uniform(0, 1)
+
+
+async def _embed_batch(
+    texts: List[str],
+    max_retries: int,
+) -> Tuple[List[List[float]], int]:
+    """Embed one batch with OpenAI, retrying rate limits and transient errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            async with _embedding_semaphore:
+                response = await openai_client.embeddings.create(
+                    model=settings.OPENAI_EBD_MODEL,
+                    input=texts
+                )
+
+            data = sorted(response.data, key=lambda item: item.index)
+            return [item.embedding for item in data], response.usage.total_tokens
+
+        except _RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+
+            delay = _retry_delay(e, attempt)
+            logger.warning(
+                f"Embedding batch failed ({type(e).__name__}), "
+                f"retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+
+async def _embed_batches(
+    texts: List[str],
+    batches: List[Tuple[int, int]],
+    max_retries: int,
+) -> List[Tuple[List[List[float]], int]]:
+    """Embed all batches concurrently, in batch order.
+
+    The first failure cancels the batches still running, so no more API
+    calls are paid for once the result is going to be discarded.
+    """
+    tasks = [
+        asyncio.create_task(_embed_batch(texts[start:end], max_retries))
+        for start, end in batches
+    ]
+    if not tasks:
+        return []
+
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def get_embeddings(
     texts: List[str],
+    token_counts: Optional[List[int]] = None,
+    max_retries: Optional[int] = None,
 ) -> Tuple[List[List[float]], Dict]:
     """
     Generate embeddings.
-    Falls back to HF embeddings.
+
+    Inputs are split into token-budgeted batches that are embedded
+    concurrently and reassembled in order. ``token_counts`` (as computed by
+    the chunker) avoids re-tokenizing; missing counts are computed here.
+    ``max_retries`` defaults to ``EMBEDDING_MAX_RETRIES``; latency-sensitive
+    callers can lower it.
+    Falls back to HF embeddings for all inputs if any batch fails, so the
+    result never mixes embedding models; the remaining batches are
+    cancelled at that point.
     """
 
+    if token_counts is None:
+        token_counts = count_tokens_batch(texts)
+
+    if max_retries is None:
+        max_retries = settings.EMBEDDING_MAX_RETRIES
+
+    batches = split_batches(
+        token_counts,
+        settings.EMBEDDING_BATCH_MAX_TOKENS,
+        settings.EMBEDDING_BATCH_MAX_INPUTS,
+    )
+
     try:
-        response = openai_client.embeddings.create(
-            model=settings.OPENAI_EBD_MODEL,
-            input=texts
-        )
+        results = await _embed_batches(texts, batches, max_retries)
 
-        embeddings = [item.embedding for item in response.data]
+        embeddings = [
+            embedding for batch_embeddings, _ in results
+            for embedding in batch_embeddings
+        ]
 
-        total_tokens = response.usage.total_tokens
+        total_tokens = sum(tokens for _, tokens in results)
         cost = (total_tokens / 1_000_000) * 0.02
 
         logger.info(
             f"OpenAI embeddings generated: {len(embeddings)} | "
+            f"Batches: {len(batches)} | "
             f"Tokens: {total_tokens} | Cost: ${cost:.6f}"
         )
 
         return embeddings, {
             "tokens": total_tokens,
             "cost_usd": cost,
-            "model": "text-embedding-3-small"
+            "model": settings.OPENAI_EBD_MODEL
         }
 
     except Exception as e:
@@ -49,7 +190,7 @@ async def get_embeddings(
         )
         logger.error(str(e))
 
-        embeddings, _, tokens = ge(texts)
+        embeddings, _, tokens = await ge(texts)
 
         return embeddings, {
             "tokens": tokens,
@@ -77,25 +218,97 @@ async def embed_chunks(chunks: List[Dict]) -> Tuple[List[Dict], Dict]:
     return chunks, usage_stats
 
 
+async def get_embeddings_deduplicated(
+    client_id: str,
+    texts: List[str],
+    token_counts: Optional[List[int]] = None,
+) -> Tuple[List[List[float]], Dict]:
+    """Embed texts, reusing stored embeddings for unchanged content.
+
+    Texts are content-hashed; only hashes with no stored embedding (and
+    each distinct one only once) are sent to the embedding API. If the
+    provider falls back to another model, everything is re-embedded with
+    the fallback so the result never mixes embedding spaces.
+    """
+    model = settings.OPENAI_EBD_MODEL
+    hashes = [chunk_hash(text) for text in texts]
+    embeddings = get_chunk_embeddings(client_id, model, hashes)
+
+    first_missing: Dict[str, int] = {}
+    for idx, embedding in enumerate(embeddings):
+        if embedding is None:
+            first_missing.setdefault(hashes[idx], idx)
+
+    reused = len(texts) - sum(embedding is None for embedding in embeddings)
+    usage_stats = {"tokens": 0, "cost_usd": 0.0, "model": model}
+
+    if first_missing:
+        indices = list(first_missing.values())
+        new_embeddings, usage_stats = await get_embeddings(
+            [texts[i] for i in indices],
+            [token_counts[i] for i in indices] if token_counts else None,
+        )
+
+        by_hash = dict(zip(first_missing, new_embeddings))
+
+        if usage_stats.get("model") == model:
+            set_chunk_embeddings(client_id, model, list(by_hash), new_embeddings)
+        elif reused:
+            # Stored embeddings are from the primary model; re-embed all.
+            embeddings, _, tokens = await ge(texts)
+            return embeddings, {**usage_stats, "tokens": tokens, "reused_chunks": 0}
+
+        embeddings = [
+            embedding if embedding is not None else by_hash[digest]
+            for embedding, digest in zip(embeddings, hashes)
+        ]
+
+    logger.info(
+        f"Embedding dedup client={client_id}: "
+        f"{reused}/{len(texts)} chunks reused"
+    )
+
+    return embeddings, {**usage_stats, "reused_chunks": reused}
+
+
 async def embed_and_index(
     client_id: str,
     chunks: List[Dict],
-    document_id: str
+    document_id: str,
+    chunk_offset: int = 0,
+    replace: bool = False,
+    plan_type: Optional[str] = None,
+    attributes: Optional[Dict] = None,
 ) -> Dict:
     """
     Full ingestion pipeline:
     chunks → embeddings → FAISS
+
+    ``chunk_offset`` is the document-wide index of the first chunk, for
+    documents indexed in several batches. With ``replace``, any vectors
+    the document already has are deleted in the same index update.
+    ``plan_type`` informs the choice of index type for the tenant, and
+    ``attributes`` (``source_type``, ``created_at``) are recorded for
+    filtered search.
     """
 
-    from backend.app.core.vectorstore import add_to_index
+    from backend.app.core.vectorstore import add_to_index, replace_document
+    from backend.app.rag.semantic_cache import invalidate
 
     if not chunks:
         logger.warning("No chunks provided for embedding")
         return {"tokens": 0, "cost_usd": 0.0}
 
     texts = [chunk["text"] for chunk in chunks]
+    token_counts = None
+    if all("token_count" in chunk.get("metadata", {}) for chunk in chunks):
+        token_counts = [chunk["metadata"]["token_count"] for chunk in chunks]
 
-    embeddings, usage_stats = await get_embeddings(texts)
+    embeddings, usage_stats = await get_embeddings_deduplicated(
+        client_id,
+        texts,
+        token_counts,
+    )
 
     metadata_list = []
     for idx, chunk in enumerate(chunks):
@@ -103,14 +316,31 @@ async def embed_and_index(
             "text": chunk["text"],
             "metadata": chunk.get("metadata", {}),
             "document_id": document_id,
-            "chunk_index": idx
+            "chunk_index": chunk_offset + idx
         })
 
-    add_to_index(
-        client_id=client_id,
-        embeddings=embeddings,
-        metadata_list=metadata_list
-    )
+    # Index writes take the tenant lock and upload to S3; keep them off
+    # the event loop.
+    if replace:
+        await asyncio.to_thread(
+            replace_document,
+            client_id=client_id,
+            document_id=document_id,
+            embeddings=embeddings,
+            metadata_list=metadata_list,
+            plan=plan_type,
+            attributes=attributes
+        )
+    else:
+        await asyncio.to_thread(
+            add_to_index,
+            client_id=client_id,
+            embeddings=embeddings,
+            metadata_list=metadata_list,
+            plan=plan_type,
+            document_attributes={document_id: attributes} if attributes else None
+        )
+    invalidate(client_id)
 
     logger.info(
         f"Indexed {len(embeddings)} chunks "
@@ -24,7 +24,7 @@ except Exception as e:
 
 async def get_embeddings(
     texts: List[str],
-) -> Tuple[List[List[float]], int]:
+) -> Tuple[List[List[float]], int, int]:
     """
     Generate embeddings locally.
 
@@ -35,7 +35,7 @@ async def get_embeddings(
     """
 
     if not texts:
-        return [], 0
+        return [], 0, 0
 
     try:
         encoded_input = _model.tokenizer(texts, padding=False, truncation=False)
@@ -48,7 +48,7 @@ async def get_embeddings(
         )
     except Exception as e:
         logger.error(f"Local embedding generation failed: {e}")
-        return [], 0
+        return [], 0, 0
 
     embeddings_list = embeddings.tolist()
     embedding_dim = len(embeddings_list[0])
@@ -0,0 +1,294 @@
+"""Background ingestion jobs.
+
+Upload endpoints create a ``Document`` with ``status=processing``, store the
+raw upload in S3 and push a job onto a Redis list. Ingestion workers
+(``python -m backend.app.ingestion.worker``) pop jobs, run extraction in a
+process pool (PDFs are sharded by page range), embed and index the chunks,
+and mark the document ``ready`` or ``failed``.
+
+Ingestion streams end to end: the upload is downloaded to disk, extracted
+page by page into a text file, chunked incrementally and indexed in
+batches of ``INGEST_INDEX_BATCH_CHUNKS``, so memory is bounded by a batch
+rather than the document size.
+
+If Redis is unavailable the API runs the job itself in the background, so
+uploads keep working in single-process deployments.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.app.core.config import settings
+from backend.app.core.database import SessionLocal
+from backend.app.core.vectorstore import delete_document
+from backend.app.ingestion.chunker import iter_chunks
+from backend.app.ingestion.embedder import embed_and_index
+from backend.app.ingestion.pdf_reader import iter_pdf_pages
+from backend.app.ingestion.text_reader import iter_text_file
+from backend.app.ingestion.url_scraper import scrape_url_sync
+from backend.app.models.documents import Document
+from backend.app.utils.logger import logger
+from backend.app.utils.redis_client import redis_client
+from backend.app.utils.s3 import download_to_path
+
+INGEST_QUEUE = "ingest:jobs"
+
+STATUS_PROCESSING = "processing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """Lazily create the process pool used for CPU-bound extraction."""
+    global _extract_pool
+    if _extract_pool is None:
+        workers = settings.INGEST_EXTRACT_PROCESSES
+        _extract_pool = ProcessPoolExecutor(max_workers=workers)
+    return _extract_pool
+
+
+def shutdown_extract_pool() -> None:
+    """Stop the extraction pool if it was started."""
+    global _extract_pool
+    if _extract_pool is not None:
+        _extract_pool.shutdown(wait=False, cancel_futures=True)
+        _extract_pool = None
+
+
+def upload_key(client_id: str, document_id: str, filename: str) -> str:
+    """S3 key of a raw uploaded file."""
+    return f"uploads/{client_id}/{document_id}/{filename}"
+
+
+def extract_pdf_to_text(
+    pdf_path: str,
+    text_path: str,
+    executor: Optional[Executor] = None,
+) -> None:
+    """Write a PDF's text to a file page by page.
+
+    Page shards are extracted in parallel on ``executor`` and written back
+    in order.
+    """
+    with open(text_path, "w", encoding="utf-8") as out:
+        for page_text in iter_pdf_pages(
+            pdf_path,
+            executor=executor,
+            max_in_flight=2 * settings.INGEST_EXTRACT_PROCESSES,
+        ):
+            out.write(page_text)
+            out.write("\n")
+
+
+def extract_url_text(url: str) -> Tuple[str, str]:
+    """Fetch and extract a URL. Runs in a worker process.
+
+    Returns the text and the document title.
+    """
+    text, metadata = scrape_url_sync(url)
+    return text, metadata.get("title", url[:50])
+
+
+def _batched(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Group an iterable into lists of at most ``size`` items."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def new_document_id() -> str:
+    """Id shared by the ``Document`` row and its vector metadata."""
+    return str(uuid.uuid4())
+
+
+def enqueue_job(job: Dict) -> bool:
+    """Push a job onto the ingestion queue.
+
+    Returns False if Redis is unavailable so the caller can run the job
+    in-process instead.
+    """
+    if redis_client is None:
+        return False
+
+    try:
+        redis_client.rpush(INGEST_QUEUE, json.dumps(job))
+    except Exception as e:
+        logger.error(f"Failed to enqueue ingestion job: {e}")
+        return False
+
+    logger.info(f"Enqueued ingestion job for document={job['document_id']}")
+    return True
+
+
+def document_attributes(document: Document) -> Dict:
+    """Attributes of a document that searches can filter on."""
+    attributes = {"source_type": document.source_type}
+    if document.created_at is not None:
+        # created_at is stored as naive UTC.
+        created = document.created_at.replace(tzinfo=timezone.utc)
+        attributes["created_at"] = created.timestamp()
+    return attributes
+
+
+async def _index_stream(
+    job: Dict,
+    chunks: Iterator[Dict],
+    attributes: Optional[Dict] = None,
+) -> int:
+    """Embed and index chunks in rolling batches. Returns the chunk count.
+
+    The first batch replaces any vectors left by an earlier attempt at the
+    same document, so re-running a job is idempotent.
+    """
+    batches = _batched(chunks, settings.INGEST_INDEX_BATCH_CHUNKS)
+    indexed = 0
+
+    # Chunking is CPU-bound, so each batch is pulled off the event loop.
+    while batch := await asyncio.to_thread(next, batches, None):
+        await embed_and_index(
+            client_id=job["client_id"],
+            chunks=batch,
+            document_id=job["document_id"],
+            chunk_offset=indexed,
+            replace=indexed == 0,
+            plan_type=job.get("plan_type"),
+            attributes=attributes,
+        )
+        indexed += len(batch)
+
+    return indexed
+
+
+def _same_content(db: Session, document: Document, content_hash: str):
+    """Another live document of the tenant with this content, if any."""
+    return (
+        db.query(Document)
+        .filter(
+            Document.client_id == document.client_id,
+            Document.content_hash == content_hash,
+            Document.id != document.id,
+            Document.status != STATUS_FAILED,
+        )
+        .first()
+    )
+
+
+async def _ingest(
+    job: Dict,
+    document: Document,
+    db: Session,
+    path: Optional[str],
+) -> int:
+    """Extract, chunk and index one job. Returns the chunk count.
+
+    URL content is hashed once fetched: an unchanged page keeps its
+    existing vectors, and a page identical to another of the tenant's
+    documents is rejected rather than indexed twice.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_extract_pool()
+    attributes = document_attributes(document)
+
+    with tempfile.TemporaryDirectory(prefix="ingest_") as workdir:
+        if job["kind"] == "url":
+            text, title = await loop.run_in_executor(pool, extract_url_text, job["url"])
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if content_hash == document.content_hash:
+                return document.chunk_count
+
+            duplicate = _same_content(db, document, content_hash)
+            if duplicate is not None:
+                raise ValueError(f"Same content as document {duplicate.id}")
+
+            document.filename = title
+            document.file_size_bytes = len(text)
+            document.content_hash = content_hash
+            chunks = iter_chunks([text], filename=job["url"])
+            return await _index_stream(job, chunks, attributes)
+
+        if path is None:
+            path = os.path.join(workdir, "upload")
+            await asyncio.to_thread(download_to_path, job["s3_key"], path)
+
+        text_path = path
+        if job["filename"].endswith(".pdf"):
+            text_path = os.path.join(workdir, "text.txt")
+            await asyncio.to_thread(extract_pdf_to_text, path, text_path, pool)
+
+        return await _index_stream(
+            job,
+            iter_chunks(iter_text_file(text_path), filename=job["filename"]),
+            attributes,
+        )
+
+
+async def _discard_partial_vectors(job: Dict) -> None:
+    """Delete vectors already indexed for a job that then failed."""
+    try:
+        await asyncio.to_thread(
+            delete_document,
+            job["client_id"],
+            job["document_id"],
+        )
+    except Exception as e:
+        document_id = job["document_id"]
+        logger.error(f"Failed to discard vectors for document={document_id}: {e}")
+
+
+async def run_job(
+    job: Dict,
+    db: Session,
+    path: Optional[str] = None,
+) -> None:
+    """Ingest one document and record the outcome on its ``Document`` row.
+
+    ``path`` is a local copy of the upload when the caller already has one;
+    otherwise file jobs stream it down from S3.
+    """
+    document_id = uuid.UUID(job["document_id"])
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if document is None:
+        logger.warning(f"Ingestion job for missing document={job['document_id']}")
+        return
+
+    try:
+        chunk_count = await _ingest(job, document, db, path)
+    except Exception as e:
+        logger.error(f"Ingestion failed for document={job['document_id']}: {e}")
+        await _discard_partial_vectors(job)
+        document.status = STATUS_FAILED
+        document.error = str(e)[:1000]
+        db.commit()
+        return
+
+    document.status = STATUS_READY
+    document.chunk_count = chunk_count
+    db.commit()
+
+    logger.info(f"Ingested document={job['document_id']} chunks={chunk_count}")
+
+
+async def run_job_in_process(job: Dict, path: Optional[str] = None) -> None:
+    """Run a job with its own DB session, for use outside a request.
+
+    ``path``, if given, is removed once the job finishes.
+    """
+    db = SessionLocal()
+    try:
+        await run_job(job, db, path=path)
+    finally:
+        db.close()
+        if path is not None and os.path.exists(path):
+            os.remove(path)
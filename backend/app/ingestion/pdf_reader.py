@@ -1,45 +1,160 @@
-"""PDF text extraction utility with PyPDF2 first and pdfminer fallback."""
+"""PDF text extraction utility with pypdf first and per-page pdfminer fallback."""
 
+from collections import deque
+from concurrent.futures import Executor, Future
 from io import BytesIO
+from typing import Deque, Iterator, List, Optional, Tuple, Union
 
+from pdfminer.high_level import extract_pages as pdfminer_pages
 from pdfminer.high_level import extract_text as pdfminer_extract
+from pdfminer.layout import LTTextContainer
 from pypdf import PdfReader
 
 from backend.app.utils.logger import logger
 
+PdfSource = Union[str, bytes]
 
-def extract_pdf_text(pdf_bytes: bytes) -> str:
-    """Extract text from PDF with fallback.
+PAGES_PER_SHARD = 8
+
+# A page is re-extracted with pdfminer when pypdf's text is empty, mostly
+# non-alphanumeric, full of replacement characters, or has implausibly
+# long "words" (missing spaces).
+_MIN_ALNUM_RATIO = 0.5
+_MAX_REPLACEMENT_RATIO = 0.01
+_MAX_AVG_WORD_LENGTH = 25
+
+
+def _open(source: PdfSource):
+    """Return something pypdf and pdfminer can both read."""
+    return BytesIO(source) if isinstance(source, bytes) else source
 
-    First attempt extraction using PyPDF2 (fast). If PyPDF2 fails or returns
-    insufficient text, fallback to pdfminer (more reliable).
-    """
-    # Try PyPDF2 first
-    try:
-        pdf_file = BytesIO(pdf_bytes)
-        reader = PdfReader(pdf_file)
 
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            text += page_text + "\n"
+def is_usable_text(text: str) -> bool:
+    """Heuristic check that extracted page text is real text."""
+    words = text.split()
+    if not words:
+        return False
 
-        # If PyPDF2 produced ANY text, return it
-        if text.strip():
-            logger.info("PDF extracted using PyPDF2.")
-            return text.strip()
+    visible = sum(len(word) for word in words)
+    alnum = sum(ch.isalnum() for word in words for ch in word)
 
-        logger.warning("PyPDF2 returned empty text, trying pdfminer.")
+    if alnum / visible < _MIN_ALNUM_RATIO:
+        return False
 
+    if text.count("\ufffd") / visible > _MAX_REPLACEMENT_RATIO:
+        return False
+
+    return visible / len(words) <= _MAX_AVG_WORD_LENGTH
+
+
+def _pdfminer_page(source: PdfSource, page_number: int) -> str:
+    """Extract a single page with pdfminer; empty on failure."""
+    try:
+        return pdfminer_extract(_open(source), page_numbers=[page_number]).strip()
     except Exception as err:  # noqa: BLE001
-        logger.warning(f"PyPDF2 failed: {err}")
+        logger.warning(f"pdfminer failed on page {page_number}: {err}")
+        return ""
+
+
+def extract_page_range(source: PdfSource, start: int, end: int) -> List[str]:
+    """Extract pages ``[start, end)``, choosing an extractor per page.
+
+    pypdf is tried first; pages whose text fails ``is_usable_text`` are
+    re-extracted with pdfminer, keeping whichever result is better. Safe to
+    run in a worker process.
+    """
+    reader = PdfReader(_open(source))
+    pages = []
+
+    for page_number in range(start, min(end, len(reader.pages))):
+        try:
+            text = (reader.pages[page_number].extract_text() or "").strip()
+        except Exception as err:  # noqa: BLE001
+            logger.warning(f"pypdf failed on page {page_number}: {err}")
+            text = ""
+
+        if not is_usable_text(text):
+            fallback = _pdfminer_page(source, page_number)
+            if is_usable_text(fallback) or len(fallback) > len(text):
+                text = fallback
+
+        pages.append(text)
+
+    return pages
+
 
-    # Fallback to pdfminer
+def _iter_pdfminer_document(source: PdfSource) -> Iterator[str]:
+    """Yield pages with pdfminer alone, for files pypdf cannot open."""
     try:
-        pdf_file = BytesIO(pdf_bytes)
-        text = pdfminer_extract(pdf_file)
-        logger.info("PDF extracted using pdfminer.")
-        return text.strip()
+        for layout in pdfminer_pages(_open(source)):
+            texts = [el.get_text() for el in layout if isinstance(el, LTTextContainer)]
+            yield "".join(texts).strip()
     except Exception as err:  # noqa: BLE001
         logger.error(f"PDF extraction failed entirely: {err}")
         raise Exception("Failed to extract text from PDF") from err
+
+
+def _ordered_results(
+    executor: Executor,
+    source: PdfSource,
+    shards: Iterator[Tuple[int, int]],
+    max_in_flight: int,
+) -> Iterator[List[str]]:
+    """Run shards on the executor with a bounded window, yielding in order."""
+    pending: Deque[Future] = deque()
+
+    for start, end in shards:
+        pending.append(executor.submit(extract_page_range, source, start, end))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_pdf_pages(
+    source: PdfSource,
+    executor: Optional[Executor] = None,
+    max_in_flight: int = 4,
+    pages_per_shard: int = PAGES_PER_SHARD,
+) -> Iterator[str]:
+    """Yield the non-empty text of each page, in page order.
+
+    With an ``executor`` (typically a process pool), pages are extracted in
+    shards of ``pages_per_shard`` with at most ``max_in_flight`` shards
+    running at once, so memory stays bounded by a few shards rather than
+    the whole document. A path ``source`` is reopened by each shard.
+    """
+    try:
+        page_count = len(PdfReader(_open(source)).pages)
+    except Exception as err:  # noqa: BLE001
+        logger.warning(f"pypdf failed: {err}")
+        for page_text in _iter_pdfminer_document(source):
+            if page_text:
+                yield page_text
+        return
+
+    starts = range(0, page_count, pages_per_shard)
+    shards = ((start, start + pages_per_shard) for start in starts)
+
+    if executor is None:
+        results = (extract_page_range(source, start, end) for start, end in shards)
+    else:
+        results = _ordered_results(executor, source, shards, max_in_flight)
+
+    for pages in results:
+        for page_text in pages:
+            if page_text:
+                yield page_text
+
+
+def extract_pdf_text(pdf_bytes: bytes, executor: Optional[Executor] = None) -> str:
+    """Extract text from PDF with per-page fallback.
+
+    Each page is extracted with pypdf (fast) and only pages whose text
+    looks unusable fall back to pdfminer (more reliable). Pass an
+    ``executor`` to extract page shards in parallel.
+    """
+    pages = list(iter_pdf_pages(pdf_bytes, executor=executor))
+    logger.info(f"PDF extracted: {len(pages)} pages with text.")
+    return "\n".join(pages)
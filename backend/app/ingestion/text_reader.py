@@ -1,7 +1,12 @@
 """Text extraction utilities for TXT/MD files."""
 
+import codecs
+from typing import Iterator
+
 from backend.app.utils.logger import logger
 
+_BLOCK_BYTES = 1024 * 1024
+
 
 def decode_utf8(data: bytes) -> str:
     """Wrapper used so tests can monkeypatch utf-8 decode."""
@@ -31,3 +36,48 @@ def extract_text(file_bytes: bytes) -> str:
     except Exception as err:  # noqa: BLE001
         logger.error(f"Failed to decode text file: {err}")
         raise ValueError("Failed to decode text file") from err
+
+
+def _is_utf8(path: str) -> bool:
+    """Check whether a file decodes as UTF-8 without loading it whole."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            while block := f.read(_BLOCK_BYTES):
+                decoder.decode(block)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def iter_text_file(path: str, block_bytes: int = _BLOCK_BYTES) -> Iterator[str]:
+    """Yield the text of a TXT/MD file in blocks of roughly ``block_bytes``.
+
+    Uses UTF-8 with latin-1 fallback like ``extract_text``. Blocks are cut
+    at whitespace so words are never split between them.
+    """
+    encoding = "utf-8"
+    if not _is_utf8(path):
+        logger.warning("UTF-8 decoding failed, falling back to latin-1")
+        encoding = "latin-1"
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    carry = ""
+
+    with open(path, "rb") as f:
+        while block := f.read(block_bytes):
+            text = carry + decoder.decode(block)
+            cut = max(text.rfind(" "), text.rfind("\n"))
+            if cut < 0:
+                carry = text
+                continue
+            # Whitespace stays with the following word, as the tokenizer
+            # would group it.
+            carry = text[cut:]
+            if text[:cut].strip():
+                yield text[:cut]
+
+    carry += decoder.decode(b"", final=True)
+    if carry.strip():
+        yield carry
@@ -0,0 +1,131 @@
+"""Ingestion worker process.
+
+Run with ``python -m backend.app.ingestion.worker``. Takes jobs from the
+Redis ingestion queue and processes up to ``INGEST_WORKER_CONCURRENCY`` of
+them at a time; CPU-bound extraction runs in a process pool.
+
+Jobs are moved atomically from the queue onto a per-consumer processing
+list and only removed from it once they have finished, so a worker that
+crashes or is redeployed mid-job does not lose it. Each worker process
+keeps a heartbeat key alive; processing lists whose owner's heartbeat has
+expired are pushed back onto the queue, at startup and periodically.
+Re-running a job is idempotent (see ``jobs._index_stream``).
+"""
+
+import asyncio
+import json
+import os
+import socket
+
+from backend.app.core.config import settings
+from backend.app.ingestion.jobs import (
+    INGEST_QUEUE,
+    run_job_in_process,
+    shutdown_extract_pool,
+)
+from backend.app.utils.logger import logger
+from backend.app.utils.redis_client import redis_client
+
+_POLL_TIMEOUT_SECONDS = 5
+_HEARTBEAT_SECONDS = 30
+
+PROCESSING_PREFIX = f"{INGEST_QUEUE}:processing:"
+HEARTBEAT_PREFIX = "ingest:worker:"
+
+WORKER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _processing_list(worker_id: int) -> str:
+    """Redis list holding the job a consumer is working on."""
+    return f"{PROCESSING_PREFIX}{WORKER_NAME}:{worker_id}"
+
+
+def beat() -> None:
+    """Mark this worker process as alive."""
+    redis_client.set(HEARTBEAT_PREFIX + WORKER_NAME, 1, ex=_HEARTBEAT_SECONDS * 3)
+
+
+def requeue_orphaned_jobs() -> int:
+    """Return jobs held by dead workers to the queue. Returns the count."""
+    requeued = 0
+    for key in redis_client.scan_iter(match=f"{PROCESSING_PREFIX}*"):
+        owner = key[len(PROCESSING_PREFIX) :].rsplit(":", 1)[0]
+        if redis_client.exists(HEARTBEAT_PREFIX + owner):
+            continue
+
+        # Back to the head of the queue: these jobs were taken first.
+        while redis_client.lmove(key, INGEST_QUEUE, "RIGHT", "LEFT") is not None:
+            requeued += 1
+
+    if requeued:
+        logger.warning(f"Requeued {requeued} ingestion jobs from stopped workers")
+    return requeued
+
+
+async def _consume(worker_id: int) -> None:
+    """Process jobs one at a time until cancelled."""
+    processing = _processing_list(worker_id)
+
+    while True:
+        try:
+            payload = await asyncio.to_thread(
+                redis_client.blmove,
+                INGEST_QUEUE,
+                processing,
+                _POLL_TIMEOUT_SECONDS,
+                "LEFT",
+                "RIGHT",
+            )
+        except Exception as e:
+            logger.error(f"Ingestion worker {worker_id} poll failed: {e}")
+            await asyncio.sleep(_POLL_TIMEOUT_SECONDS)
+            continue
+
+        if payload is None:
+            continue
+
+        try:
+            job = json.loads(payload)
+            await run_job_in_process(job)
+        except Exception as e:
+            logger.error(f"Ingestion worker {worker_id} job failed: {e}")
+
+        try:
+            await asyncio.to_thread(redis_client.lrem, processing, 1, payload)
+        except Exception as e:
+            logger.error(f"Ingestion worker {worker_id} could not ack job: {e}")
+
+
+async def _keep_alive() -> None:
+    """Refresh the heartbeat and recover jobs of dead workers until cancelled."""
+    while True:
+        await asyncio.sleep(_HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(beat)
+            await asyncio.to_thread(requeue_orphaned_jobs)
+        except Exception as e:
+            logger.error(f"Ingestion worker heartbeat failed: {e}")
+
+
+async def main() -> None:
+    """Start the consumers and run until interrupted."""
+    if redis_client is None:
+        raise RuntimeError("Redis is required to run the ingestion worker")
+
+    beat()
+    requeue_orphaned_jobs()
+
+    concurrency = settings.INGEST_WORKER_CONCURRENCY
+    logger.info(f"Ingestion worker started with {concurrency} consumers")
+
+    try:
+        await asyncio.gather(
+            _keep_alive(),
+            *(_consume(i) for i in range(concurrency)),
+        )
+    finally:
+        shutdown_extract_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -7,7 +7,10 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
 from backend.app.core.config import settings
+from backend.app.core.vectorstore import start_index_sync, stop_index_sync
+from backend.app.ingestion.jobs import shutdown_extract_pool
 from backend.app.middleware.logging import log_requests
+from backend.app.rag.generator import close_llm_clients
 from backend.app.routes import admin, auth, query, upload, whatsapp
 from backend.app.routes.webhook import router as webhook_router
 from backend.app.utils.logger import logger
@@ -69,9 +72,13 @@ async def startup():
     """Executed when application is starting."""
     logger.info("CortexLayer Support Agent starting up...")
     test_redis_connection()
+    start_index_sync()
 
 
 @app.on_event("shutdown")
 async def shutdown():
     """Executed when application is shutting down."""
     logger.info("CortexLayer Support Agent shutting down...")
+    await close_llm_clients()
+    shutdown_extract_pool()
+    stop_index_sync()
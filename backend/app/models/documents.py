@@ -3,7 +3,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -31,6 +31,11 @@ class Document(Base):
     chunk_count = Column(Integer, default=0)
 
     s3_key = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of file
+
+    # processing, ready or failed
+    status = Column(String, nullable=False, default="ready")
+    error = Column(Text, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
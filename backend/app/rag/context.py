@@ -0,0 +1,184 @@
+"""Post-retrieval context selection: MMR diversification and de-duplication.
+
+Chunks are cut as overlapping token windows, so a plain top-k often holds
+neighbouring chunks of one document that repeat the same sentences.
+``build_context`` first picks ``top_k`` of the over-fetched candidates by
+Maximal Marginal Relevance over their stored vectors, then merges chunks
+of the same document whose character spans overlap or touch, keeping the
+shared text once.
+"""
+
+import asyncio
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.app.core.config import settings
+from backend.app.core.vectorstore import get_chunk_vectors
+from backend.app.ingestion.chunker import count_tokens_batch
+from backend.app.utils.logger import logger
+
+
+def mmr_select(
+    query_vector: List[float],
+    vectors: np.ndarray,
+    top_k: int,
+    lambda_mult: float,
+    relevance: Optional[np.ndarray] = None,
+) -> List[int]:
+    """Positions of ``top_k`` vectors chosen by Maximal Marginal Relevance.
+
+    Each step picks the candidate maximising
+    ``lambda_mult * relevance - (1 - lambda_mult) * max_sim_to_selected``.
+    Similarities are cosine, computed once as a matrix; ``relevance``
+    defaults to the cosine similarity with the query.
+    """
+    unit = np.asarray(vectors, dtype=np.float32)
+    unit = unit / np.maximum(np.linalg.norm(unit, axis=1, keepdims=True), 1e-12)
+    if len(unit) <= top_k:
+        return list(range(len(unit)))
+
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        relevance = unit @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    similarity = unit @ unit.T
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(unit), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < top_k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(redundancy, similarity[pick], out=redundancy)
+
+    return selected
+
+
+def _document_key(chunk: Dict) -> Optional[Hashable]:
+    """Document a chunk belongs to, or None if unknown."""
+    if chunk.get("document_id") is not None:
+        return chunk["document_id"]
+    return chunk.get("metadata", {}).get("filename")
+
+
+def _position(chunk: Dict) -> Tuple[int, int]:
+    """Sort key placing a document's chunks in text order."""
+    meta = chunk.get("metadata", {})
+    index = chunk.get("chunk_index", meta.get("chunk_index", 0))
+    return meta.get("start_char", 0), index
+
+
+def _join(first: Dict, second: Dict) -> Optional[Dict]:
+    """``first`` extended by ``second`` with their shared text kept once.
+
+    Returns None unless ``second`` starts inside or right at the end of
+    ``first`` and the overlapping text agrees.
+    """
+    a, b = first.get("metadata", {}), second.get("metadata", {})
+    end, start, second_end = a.get("end_char"), b.get("start_char"), b.get("end_char")
+    if end is None or start is None or second_end is None or start > end:
+        return None
+
+    overlap = end - start
+    if second_end <= end:
+        if second["text"] not in first["text"]:
+            return None
+        text = first["text"]
+    else:
+        if overlap and not first["text"].endswith(second["text"][:overlap]):
+            return None
+        text = first["text"] + second["text"][overlap:]
+
+    metadata = {**a, "end_char": max(end, second_end)}
+    metadata.pop("token_count", None)
+    last = second.get("chunk_index", b.get("chunk_index"))
+    if last is not None:
+        metadata["last_chunk_index"] = max(last, a.get("last_chunk_index", last))
+
+    return {
+        **first,
+        "text": text,
+        "metadata": metadata,
+        "score": max(first.get("score", 0.0), second.get("score", 0.0)),
+    }
+
+
+def merge_adjacent(chunks: List[Dict]) -> List[Dict]:
+    """Merge overlapping or touching chunks of the same document.
+
+    A merged chunk takes the rank of its best-ranked part and the highest
+    score; ``metadata["last_chunk_index"]`` records the last chunk it
+    spans. Chunks without character offsets are left as they are.
+    """
+    groups: Dict[Hashable, List[int]] = {}
+    merged: List[Tuple[int, Dict]] = []
+
+    for rank, chunk in enumerate(chunks):
+        key = _document_key(chunk)
+        if key is None:
+            merged.append((rank, chunk))
+        else:
+            groups.setdefault(key, []).append(rank)
+
+    for ranks in groups.values():
+        ordered = sorted(ranks, key=lambda rank: _position(chunks[rank]))
+        run_rank, run = ordered[0], chunks[ordered[0]]
+        for rank in ordered[1:]:
+            joined = _join(run, chunks[rank])
+            if joined is None:
+                merged.append((run_rank, run))
+                run_rank, run = rank, chunks[rank]
+            else:
+                run_rank, run = min(run_rank, rank), joined
+        merged.append((run_rank, run))
+
+    merged.sort(key=lambda item: item[0])
+    return [chunk for _, chunk in merged]
+
+
+async def build_context(
+    client_id: str,
+    chunks: List[Dict],
+    top_k: int,
+    query_embedding: Optional[List[float]] = None,
+    relevance: Optional[List[float]] = None,
+) -> Tuple[List[Dict], int]:
+    """Select a compact, non-redundant context from retrieved chunks.
+
+    With ``MMR_ENABLED`` and a query embedding, ``top_k`` chunks are
+    picked by MMR; otherwise the first ``top_k`` are kept. ``relevance``
+    overrides the query similarity, e.g. with reranker scores. Returns the
+    merged chunks and the number of prompt tokens merging saved.
+    """
+    selected = chunks[:top_k]
+
+    if settings.MMR_ENABLED and query_embedding is not None and len(chunks) > top_k:
+        try:
+            vectors = await asyncio.to_thread(get_chunk_vectors, client_id, chunks)
+        except Exception as e:
+            logger.warning(f"Could not load chunk vectors for MMR: {e}")
+            vectors = None
+
+        if vectors is not None:
+            order = mmr_select(
+                query_embedding,
+                vectors,
+                top_k,
+                settings.MMR_LAMBDA,
+                None if relevance is None else np.asarray(relevance),
+            )
+            selected = [chunks[i] for i in order]
+
+    merged = merge_adjacent(selected)
+    if len(merged) == len(selected):
+        return merged, 0
+
+    before = count_tokens_batch([chunk["text"] for chunk in selected])
+    after = count_tokens_batch([chunk["text"] for chunk in merged])
+    return merged, sum(before) - sum(after)
@@ -0,0 +1,103 @@
+"""Two-tier cache for query embeddings.
+
+Embeddings are keyed by model name plus a hash of the normalized query
+text and stored as raw float32 bytes: first in a bounded in-process LRU,
+then in Redis with a TTL so every worker shares repeated FAQ-style queries.
+Redis failures are logged and treated as misses.
+"""
+
+import hashlib
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.app.core.config import settings
+from backend.app.core.index_cache import IndexCache
+from backend.app.utils.logger import logger
+from backend.app.utils.redis_client import redis_binary_client
+
+_memory_cache = IndexCache(
+    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+    sizeof=lambda entry: len(entry[1]),
+)
+
+_stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different phrasings share a key."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!. ")
+
+
+def _cache_key(model: str, text: str) -> str:
+    """Cache key for a model and query text."""
+    digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+    return f"embcache:{model}:{digest}"
+
+
+def _decode(data: bytes) -> List[float]:
+    """Decode float32 bytes back to an embedding list."""
+    return np.frombuffer(data, dtype=np.float32).tolist()
+
+
+def get_cached_embedding(model: str, text: str) -> Optional[List[float]]:
+    """Return the cached embedding for a query, or None on a miss."""
+    key = _cache_key(model, text)
+
+    entry = _memory_cache.get(key)
+    if entry is not None:
+        expires_at, data = entry
+        if expires_at > time.time():
+            _stats["memory_hits"] += 1
+            return _decode(data)
+        _memory_cache.pop(key)
+
+    if redis_binary_client is not None:
+        try:
+            data = redis_binary_client.get(key)
+        except Exception as exc:
+            logger.warning(f"Embedding cache read failed: {exc}")
+            data = None
+
+        if data:
+            _stats["redis_hits"] += 1
+            _memory_cache.put(
+                key,
+                (time.time() + settings.EMBEDDING_CACHE_TTL_SECONDS, data),
+            )
+            return _decode(data)
+
+    _stats["misses"] += 1
+    return None
+
+
+def set_cached_embedding(model: str, text: str, embedding: List[float]) -> None:
+    """Store a query embedding in both cache tiers."""
+    key = _cache_key(model, text)
+    data = np.asarray(embedding, dtype=np.float32).tobytes()
+    ttl = settings.EMBEDDING_CACHE_TTL_SECONDS
+
+    _memory_cache.put(key, (time.time() + ttl, data))
+
+    if redis_binary_client is not None:
+        try:
+            redis_binary_client.setex(key, ttl, data)
+        except Exception as exc:
+            logger.warning(f"Embedding cache write failed: {exc}")
+
+
+def get_embedding_cache_stats() -> Dict:
+    """Hit and miss counters for both cache tiers."""
+    lookups = sum(_stats.values())
+    hits = _stats["memory_hits"] + _stats["redis_hits"]
+    return {
+        **_stats,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "memory": _memory_cache.stats(),
+    }
@@ -1,42 +1,108 @@
 """LLM answer generation with provider fallback and usage tracking."""
 
 import asyncio
-from typing import Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from groq import Groq
-from openai import OpenAI
+import httpx
+from groq import AsyncGroq
+from openai import AsyncOpenAI
 
 from backend.app.core.config import settings
+from backend.app.ingestion.chunker import count_tokens
 from backend.app.utils.logger import logger
 
-groq_client = Groq(api_key=settings.GROQ_API_KEY)
-openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# USD per million (input, output) tokens.
+PRICING = {
+    "groq": (0.27, 0.27),
+    "openai": (0.15, 0.60),
+}
 
+# One pooled HTTP client shared by both providers, so in-flight generations
+# are bounded by sockets rather than executor threads. Created on first use
+# and again after ``close_llm_clients``, e.g. when the app restarts in the
+# same process.
+_http_client: Optional[httpx.AsyncClient] = None
+_groq_client: Optional[AsyncGroq] = None
+_openai_client: Optional[AsyncOpenAI] = None
 
-def _call_groq(prompt: str, max_tokens: int):
-    return groq_client.chat.completions.create(
-        model=settings.GROQ_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=max_tokens,
-        temperature=0.3,
-    )
 
+def get_llm_clients() -> Tuple[AsyncGroq, AsyncOpenAI]:
+    """Return the Groq and OpenAI clients, opening the pool if needed."""
+    global _http_client, _groq_client, _openai_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(
+                settings.LLM_TIMEOUT_SECONDS,
+                connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            ),
+        )
+        _groq_client = AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            http_client=_http_client,
+            max_retries=settings.LLM_MAX_RETRIES,
+        )
+        _openai_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=_http_client,
+            max_retries=settings.LLM_MAX_RETRIES,
+        )
+    return _groq_client, _openai_client
 
-def _call_openai(prompt: str, max_tokens: int):
-    return openai_client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=max_tokens,
-        temperature=0.3,
-    )
+
+_groq_semaphore = asyncio.Semaphore(settings.GROQ_MAX_CONCURRENCY)
+_openai_semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+
+async def _call_groq(prompt: str, max_tokens: int):
+    async with _groq_semaphore:
+        groq_client, _ = get_llm_clients()
+        return await groq_client.chat.completions.create(
+            model=settings.GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=0.3,
+        )
+
+
+async def _call_openai(prompt: str, max_tokens: int):
+    async with _openai_semaphore:
+        _, openai_client = get_llm_clients()
+        return await openai_client.chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=0.3,
+        )
+
+
+def _cost(provider: str, input_tokens: int, output_tokens: int) -> float:
+    """USD cost of a completion for a provider."""
+    input_price, output_price = PRICING[provider]
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+async def close_llm_clients() -> None:
+    """Close the shared HTTP connection pool."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 
 async def generate_answer(
     prompt: str,
     model_preference: str = "groq",
-    max_tokens: int = 500,
+    max_tokens: Optional[int] = None,
 ) -> Tuple[str, dict]:
-    """Generate an answer using LLMs with safe async fallback."""
+    """Generate an answer using LLMs with safe async fallback.
+
+    ``max_tokens`` caps the answer length (``ANSWER_MAX_TOKENS`` by default).
+    """
+    max_tokens = max_tokens or settings.ANSWER_MAX_TOKENS
     usage_stats = {
         "model_used": None,
         "input_tokens": 0,
@@ -46,7 +112,7 @@ async def generate_answer(
 
     if model_preference == "groq":
         try:
-            response = await asyncio.to_thread(_call_groq, prompt, max_tokens)
+            response = await _call_groq(prompt, max_tokens)
 
             answer = response.choices[0].message.content
             usage_stats["model_used"] = settings.GROQ_MODEL
@@ -56,9 +122,7 @@ async def generate_answer(
             input_tokens = usage_stats["input_tokens"]
             output_tokens = usage_stats["output_tokens"]
 
-            usage_stats["cost_usd"] = (input_tokens / 1_000_000) * 0.27 + (
-                output_tokens / 1_000_000
-            ) * 0.27
+            usage_stats["cost_usd"] = _cost("groq", input_tokens, output_tokens)
 
             return answer, usage_stats
 
@@ -66,7 +130,7 @@ async def generate_answer(
             logger.warning(f"Groq failed, falling back to OpenAI: {e}")
 
     try:
-        response = await asyncio.to_thread(_call_openai, prompt, max_tokens)
+        response = await _call_openai(prompt, max_tokens)
 
         answer = response.choices[0].message.content
         usage_stats["model_used"] = settings.OPENAI_MODEL
@@ -76,12 +140,129 @@ async def generate_answer(
         input_tokens = usage_stats["input_tokens"]
         output_tokens = usage_stats["output_tokens"]
 
-        usage_stats["cost_usd"] = (input_tokens / 1_000_000) * 0.15 + (
-            output_tokens / 1_000_000
-        ) * 0.60
+        usage_stats["cost_usd"] = _cost("openai", input_tokens, output_tokens)
 
         return answer, usage_stats
 
     except Exception as e:
         logger.error(f"Both LLM providers failed: {e}")
         raise RuntimeError("LLM generation failed") from e
+
+
+def _chunk_usage(chunk):
+    """Usage block of a streamed chunk, if the provider sent one."""
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        x_groq = getattr(chunk, "x_groq", None)
+        usage = getattr(x_groq, "usage", None)
+    return usage
+
+
+def _record_usage(
+    usage_stats: Dict,
+    provider: str,
+    model: str,
+    prompt: str,
+    output: List[str],
+    usage,
+) -> None:
+    """Fill ``usage_stats`` for a streamed completion."""
+    # Fall back to local counts when the provider omits streamed usage.
+    if usage is not None:
+        input_tokens = usage.prompt_tokens
+        output_tokens = usage.completion_tokens
+    else:
+        input_tokens = usage_stats.get("prompt_tokens") or count_tokens(prompt)
+        output_tokens = count_tokens("".join(output))
+
+    usage_stats["model_used"] = model
+    usage_stats["input_tokens"] = input_tokens
+    usage_stats["output_tokens"] = output_tokens
+    usage_stats["cost_usd"] = _cost(provider, input_tokens, output_tokens)
+
+
+async def _stream_provider(
+    provider: str,
+    prompt: str,
+    max_tokens: int,
+    usage_stats: Dict,
+) -> AsyncIterator[str]:
+    """Stream completion deltas from one provider and record its usage."""
+    groq_client, openai_client = get_llm_clients()
+    if provider == "groq":
+        client, model, semaphore = groq_client, settings.GROQ_MODEL, _groq_semaphore
+        extra = {}
+    else:
+        client, model, semaphore = (
+            openai_client,
+            settings.OPENAI_MODEL,
+            _openai_semaphore,
+        )
+        extra = {"extra_body": {"stream_options": {"include_usage": True}}}
+
+    output = []
+    usage = None
+
+    try:
+        async with semaphore:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=0.3,
+                stream=True,
+                **extra,
+            )
+
+            async for chunk in stream:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        output.append(delta)
+                        yield delta
+
+                usage = _chunk_usage(chunk) or usage
+    except (GeneratorExit, asyncio.CancelledError):
+        # The consumer went away mid-stream (e.g. a client disconnect);
+        # the tokens generated so far are still billed.
+        _record_usage(usage_stats, provider, model, prompt, output, usage)
+        raise
+
+    _record_usage(usage_stats, provider, model, prompt, output, usage)
+
+
+async def stream_answer(
+    prompt: str,
+    usage_stats: Dict,
+    model_preference: str = "groq",
+    max_tokens: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """Stream answer tokens as the provider produces them.
+
+    Falls back from Groq to OpenAI only if Groq fails before emitting any
+    token. ``usage_stats`` is filled in once the stream has finished; a
+    ``prompt_tokens`` count already in it is used if the provider sends no
+    usage.
+    """
+    max_tokens = max_tokens or settings.ANSWER_MAX_TOKENS
+    providers = ["groq", "openai"] if model_preference == "groq" else ["openai"]
+
+    for provider in providers:
+        emitted = False
+        stream = _stream_provider(provider, prompt, max_tokens, usage_stats)
+        try:
+            async for delta in stream:
+                emitted = True
+                yield delta
+            return
+
+        except Exception as e:
+            if emitted or provider == providers[-1]:
+                logger.error(f"LLM streaming failed: {e}")
+                raise RuntimeError("LLM generation failed") from e
+
+            logger.warning(f"Groq stream failed, falling back to OpenAI: {e}")
+        finally:
+            # Close the provider stream now, not at garbage collection, so
+            # an early exit records its usage before the caller logs it.
+            await stream.aclose()
@@ -1,91 +1,363 @@
 """RAG pipeline orchestrator: retrieval, prompt construction, generation."""
 
+import asyncio
 import time
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 
-from backend.app.rag.generator import generate_answer
+from backend.app.core.config import settings
+from backend.app.core.vectorstore import get_index_version
+from backend.app.ingestion.chunker import count_tokens
+from backend.app.models.client import PlanType
+from backend.app.rag.context import build_context
+from backend.app.rag.generator import generate_answer, stream_answer
 from backend.app.rag.prompt import (
     build_fallback_prompt,
     build_rag_prompt,
 )
-from backend.app.rag.retriever import retrieve_relevant_chunks
+from backend.app.rag.reranker import rerank
+from backend.app.rag.retriever import (
+    embed_query,
+    looks_like_identifier,
+    retrieve_relevant_chunks,
+    start_lexical_search,
+)
+from backend.app.rag.semantic_cache import lookup_answer, store_answer
+from backend.app.services.usage_limits import get_plan_limits
 from backend.app.utils.logger import logger
 
 
-async def run_rag_pipeline(
+def _empty_usage(model_used: str = "none") -> Dict:
+    """Usage stats for a response that did not call an LLM."""
+    return {
+        "model_used": model_used,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cost_usd": 0.0,
+        "prompt_tokens": 0,
+        "context_tokens_saved": 0,
+    }
+
+
+def _prompt_budget(plan_type: str) -> int:
+    """Input token budget of a plan's prompts."""
+    try:
+        limits = get_plan_limits(PlanType(plan_type))
+    except ValueError:
+        return settings.PROMPT_MAX_INPUT_TOKENS
+    return limits.get("max_prompt_tokens", settings.PROMPT_MAX_INPUT_TOKENS)
+
+
+def _build_citations(retrieved_chunks: List[Dict]) -> List[Dict]:
+    """Citations for the top retrieved chunks."""
+    citations = []
+    for chunk in retrieved_chunks[:3]:
+        citations.append(
+            {
+                "document": chunk.get("metadata", {}).get("filename", "unknown"),
+                "chunk_index": chunk.get("metadata", {}).get("chunk_index", 0),
+                "relevance_score": round(chunk.get("score", 0.0), 3),
+            }
+        )
+    return citations
+
+
+async def _prepare(
     client_id: str,
     query: str,
-    plan_type: str = "starter",
-    top_k: int = 5,
+    top_k: int,
+    filters: Optional[Dict] = None,
+    max_prompt_tokens: Optional[int] = None,
 ) -> Dict:
-    """Run the complete RAG pipeline."""
-    if not query or not query.strip():
-        logger.warning("Empty query received for RAG pipeline")
-        return {
-            "answer": "Please provide a valid question.",
-            "citations": [],
-            "confidence": 0.0,
-            "latency_ms": 0,
-            "usage_stats": {
-                "model_used": "none",
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost_usd": 0.0,
-            },
-        }
+    """Embed, consult the semantic cache, retrieve and build the prompt.
 
-    start_time = time.time()
+    Returns a context dict. If ``cached`` is set, the other prompt fields
+    are absent and the cached answer should be returned as-is.
+
+    Lexical search starts first and runs alongside the embedding call.
+    Identifier queries skip embedding (and so the semantic cache) and are
+    answered from lexical matches when there are any. With reranking on,
+    ``RERANK_CANDIDATES`` chunks are retrieved and the best ``top_k`` kept.
+    With MMR on and a query embedding, ``MMR_CANDIDATES`` are retrieved
+    and ``build_context`` picks a diverse ``top_k`` and merges overlapping
+    neighbours; ``tokens_saved`` counts the prompt tokens this removed.
+    The prompt is cut to ``max_prompt_tokens`` and its size returned as
+    ``prompt_tokens``; ``retrieved_chunks`` and the citations only hold
+    the chunks that fit, and if none do the fallback prompt is used.
+    Filtered queries bypass the semantic cache, whose answers are unscoped.
+    """
+    fetch_k = top_k
+    if settings.RERANK_ENABLED:
+        fetch_k = max(top_k, settings.RERANK_CANDIDATES)
+
+    lexical = start_lexical_search(client_id, query, fetch_k, filters)
+
+    query_embedding = None
+    index_version = None
+
+    if lexical is None or not looks_like_identifier(query):
+        try:
+            query_embedding = await embed_query(query)
+        except Exception as e:
+            logger.error(f"Query embedding failed: {e}")
+
+        if query_embedding is not None and not filters:
+            # A cold tenant is loaded from S3 here; keep it off the loop.
+            try:
+                index_version = await asyncio.to_thread(get_index_version, client_id)
+            except Exception as e:
+                logger.error(f"Index version lookup failed: {e}")
+
+        if index_version is not None:
+            cached = lookup_answer(client_id, index_version, query_embedding)
+            if cached is not None:
+                logger.info(f"Semantic cache hit for client={client_id}")
+                if lexical is not None:
+                    lexical.cancel()
+                return {"cached": cached}
+
+    diversify = settings.MMR_ENABLED and query_embedding is not None
+    if diversify:
+        fetch_k = max(fetch_k, settings.MMR_CANDIDATES)
 
     try:
         retrieved_chunks = await retrieve_relevant_chunks(
             client_id=client_id,
             query=query,
-            top_k=top_k,
+            top_k=fetch_k,
+            query_embedding=query_embedding,
+            lexical=lexical,
+            filters=filters,
         )
     except Exception as e:
         logger.error(f"Retrieval failed: {e}")
         retrieved_chunks = []
+    finally:
+        if lexical is not None:
+            lexical.cancel()
+
+    relevance = None
+    if settings.RERANK_ENABLED:
+        keep = len(retrieved_chunks) if diversify else top_k
+        retrieved_chunks = await rerank(query, retrieved_chunks, keep)
+        relevance = [chunk.get("score", 0.0) for chunk in retrieved_chunks]
+
+    retrieved_chunks, tokens_saved = await build_context(
+        client_id,
+        retrieved_chunks,
+        top_k,
+        query_embedding=query_embedding,
+        relevance=relevance,
+    )
+
+    if retrieved_chunks:
+        prompt, prompt_tokens, retrieved_chunks = build_rag_prompt(
+            query,
+            retrieved_chunks,
+            max_tokens=max_prompt_tokens,
+        )
 
+    # Citations and confidence only cover chunks that made it into the prompt.
     if retrieved_chunks:
-        prompt = build_rag_prompt(query, retrieved_chunks)
         confidence = min(retrieved_chunks[0].get("score", 0.0), 1.0)
     else:
         prompt = build_fallback_prompt(query)
+        prompt_tokens = count_tokens(prompt)
         confidence = 0.0
 
+    return {
+        "cached": None,
+        "query_embedding": query_embedding,
+        "index_version": index_version,
+        "retrieved_chunks": retrieved_chunks,
+        "prompt": prompt,
+        "prompt_tokens": prompt_tokens,
+        "confidence": round(confidence, 3),
+        "citations": _build_citations(retrieved_chunks),
+        "tokens_saved": tokens_saved,
+    }
+
+
+def _remember(client_id: str, context: Dict, answer: str) -> None:
+    """Store a generated answer in the semantic cache when it is reusable."""
+    if context["retrieved_chunks"] and context["index_version"] is not None:
+        store_answer(
+            client_id,
+            context["index_version"],
+            context["query_embedding"],
+            {
+                "answer": answer,
+                "citations": context["citations"],
+                "confidence": context["confidence"],
+            },
+        )
+
+
+def _cached_result(cached: Dict, start_time: float) -> Dict:
+    """Pipeline result for a semantic cache hit."""
+    return {
+        "answer": cached["answer"],
+        "citations": cached["citations"],
+        "confidence": cached["confidence"],
+        "latency_ms": int((time.time() - start_time) * 1000),
+        "cache_hit": True,
+        "usage_stats": _empty_usage("semantic-cache"),
+    }
+
+
+async def run_rag_pipeline(
+    client_id: str,
+    query: str,
+    plan_type: str = "starter",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+) -> Dict:
+    """Run the complete RAG pipeline.
+
+    Semantically equivalent repeat queries against an unchanged index are
+    answered from the semantic cache; ``cache_hit`` reports which path ran.
+    ``filters`` restrict retrieval to matching chunks (see
+    ``search_index_batch``).
+    """
+    if not query or not query.strip():
+        logger.warning("Empty query received for RAG pipeline")
+        return {
+            "answer": "Please provide a valid question.",
+            "citations": [],
+            "confidence": 0.0,
+            "latency_ms": 0,
+            "cache_hit": False,
+            "usage_stats": _empty_usage(),
+        }
+
+    start_time = time.time()
+
+    context = await _prepare(
+        client_id,
+        query,
+        top_k,
+        filters,
+        max_prompt_tokens=_prompt_budget(plan_type),
+    )
+    if context["cached"] is not None:
+        return _cached_result(context["cached"], start_time)
+
     model_pref = "groq" if plan_type == "starter" else "openai"
 
     try:
         answer, usage_stats = await generate_answer(
-            prompt,
+            context["prompt"],
             model_preference=model_pref,
         )
     except Exception as e:
         logger.error(f"Generation failed: {e}")
         answer = "I'm sorry, I'm experiencing technical issues."
-        usage_stats = {
-            "model_used": "none",
-            "input_tokens": 0,
-            "output_tokens": 0,
-            "cost_usd": 0.0,
-        }
-
-    citations = []
-    for chunk in retrieved_chunks[:3]:
-        citations.append(
-            {
-                "document": chunk.get("metadata", {}).get("filename", "unknown"),
-                "chunk_index": chunk.get("metadata", {}).get("chunk_index", 0),
-                "relevance_score": round(chunk.get("score", 0.0), 3),
-            }
-        )
+        usage_stats = _empty_usage()
+    else:
+        _remember(client_id, context, answer)
+    usage_stats["prompt_tokens"] = context["prompt_tokens"]
+    usage_stats["context_tokens_saved"] = context["tokens_saved"]
 
     latency_ms = int((time.time() - start_time) * 1000)
 
     return {
         "answer": answer,
-        "citations": citations,
-        "confidence": round(confidence, 3),
+        "citations": context["citations"],
+        "confidence": context["confidence"],
         "latency_ms": latency_ms,
+        "cache_hit": False,
         "usage_stats": usage_stats,
     }
+
+
+async def stream_rag_pipeline(
+    client_id: str,
+    query: str,
+    plan_type: str = "starter",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+    usage_stats: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """Run the RAG pipeline, yielding events as the answer is generated.
+
+    Yields ``{"event": ..., "data": ...}`` dicts in this order:
+
+    - ``citations``: citations and confidence, as soon as retrieval is done
+    - ``token``: one per streamed text delta
+    - ``done``: the full result, shaped like ``run_rag_pipeline``'s
+
+    A ``usage_stats`` dict passed in is filled with the generation's usage,
+    also when the stream is closed before ``done``.
+    """
+    if not query or not query.strip():
+        result = await run_rag_pipeline(client_id, query, plan_type, top_k)
+        yield {"event": "citations", "data": {"citations": [], "confidence": 0.0}}
+        yield {"event": "token", "data": result["answer"]}
+        yield {"event": "done", "data": result}
+        return
+
+    start_time = time.time()
+
+    context = await _prepare(
+        client_id,
+        query,
+        top_k,
+        filters,
+        max_prompt_tokens=_prompt_budget(plan_type),
+    )
+    if context["cached"] is not None:
+        result = _cached_result(context["cached"], start_time)
+        yield {
+            "event": "citations",
+            "data": {
+                "citations": result["citations"],
+                "confidence": result["confidence"],
+            },
+        }
+        yield {"event": "token", "data": result["answer"]}
+        yield {"event": "done", "data": result}
+        return
+
+    yield {
+        "event": "citations",
+        "data": {
+            "citations": context["citations"],
+            "confidence": context["confidence"],
+        },
+    }
+
+    model_pref = "groq" if plan_type == "starter" else "openai"
+    if usage_stats is None:
+        usage_stats = {}
+    usage_stats.update(_empty_usage())
+    usage_stats["prompt_tokens"] = context["prompt_tokens"]
+    usage_stats["context_tokens_saved"] = context["tokens_saved"]
+    parts: List[str] = []
+
+    stream = stream_answer(context["prompt"], usage_stats, model_preference=model_pref)
+    try:
+        async for delta in stream:
+            parts.append(delta)
+            yield {"event": "token", "data": delta}
+    except Exception as e:
+        logger.error(f"Streaming generation failed: {e}")
+        fallback = "I'm sorry, I'm experiencing technical issues."
+        if not parts:
+            yield {"event": "token", "data": fallback}
+        answer = "".join(parts) or fallback
+    else:
+        answer = "".join(parts)
+        _remember(client_id, context, answer)
+    finally:
+        await stream.aclose()
+
+    yield {
+        "event": "done",
+        "data": {
+            "answer": answer,
+            "citations": context["citations"],
+            "confidence": context["confidence"],
+            "latency_ms": int((time.time() - start_time) * 1000),
+            "cache_hit": False,
+            "usage_stats": usage_stats,
+        },
+    }
@@ -1,24 +1,20 @@
 """Prompts for controlling hallucinations and fallback behavior."""
 
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
+from backend.app.core.config import settings
+from backend.app.ingestion.chunker import (
+    count_tokens,
+    count_tokens_batch,
+    split_sentences,
+)
 
-def build_rag_prompt(query: str, context_chunks: List[Dict]) -> str:
-    """Build prompt for RAG with retrieved context."""
-    context_text = ""
-    for i, chunk in enumerate(context_chunks):
-        doc_name = chunk.get("metadata", {}).get("filename", "unknown")
-        chunk_id = chunk.get("metadata", {}).get("chunk_index", i)
-        text = chunk.get("text", "")
-
-        context_text += f"\n[Document: {doc_name}, Chunk: {chunk_id}]\n" f"{text}\n"
-
-    prompt = f"""You are a helpful customer support assistant.
+_RAG_TEMPLATE = """You are a helpful customer support assistant.
 Answer the user's question using ONLY the information provided
 in the context below.
 
 CONTEXT:
-{context_text}
+{context}
 
 RULES:
 1. Only use information from the context above
@@ -33,7 +29,78 @@ USER QUESTION:
 
 ANSWER:"""
 
-    return prompt
+
+def _chunk_header(chunk: Dict, position: int) -> str:
+    """Source line introducing a chunk in the context."""
+    doc_name = chunk.get("metadata", {}).get("filename", "unknown")
+    chunk_id = chunk.get("metadata", {}).get("chunk_index", position)
+    last_id = chunk.get("metadata", {}).get("last_chunk_index")
+    if last_id is not None and last_id != chunk_id:
+        chunk_id = f"{chunk_id}-{last_id}"
+
+    return f"\n[Document: {doc_name}, Chunk: {chunk_id}]\n"
+
+
+def _truncate_to_sentences(text: str, max_tokens: int) -> str:
+    """Longest run of whole leading sentences within ``max_tokens``."""
+    spans = split_sentences(text)
+    if not spans or max_tokens <= 0:
+        return ""
+
+    counts = count_tokens_batch([text[start:end] for start, end in spans])
+    total = 0
+    end = None
+    for (_, span_end), tokens in zip(spans, counts):
+        # +1 for the whitespace that joins sentences.
+        total += tokens + 1
+        if total > max_tokens:
+            break
+        end = span_end
+
+    return text[spans[0][0] : end] if end is not None else ""
+
+
+def build_rag_prompt(
+    query: str,
+    context_chunks: List[Dict],
+    max_tokens: Optional[int] = None,
+) -> Tuple[str, int, List[Dict]]:
+    """Build prompt for RAG with retrieved context, within a token budget.
+
+    Chunks are added in the given (relevance) order until the prompt
+    would exceed ``max_tokens`` (``PROMPT_MAX_INPUT_TOKENS`` by default);
+    the first chunk that does not fit is cut to its leading whole
+    sentences and the rest are dropped. Token counts use the cached
+    tiktoken encoding shared with the chunker.
+
+    Returns the prompt, its token count and the chunks it contains, the
+    last one with its text cut if it was truncated.
+    """
+    budget = settings.PROMPT_MAX_INPUT_TOKENS if max_tokens is None else max_tokens
+    remaining = budget - count_tokens(_RAG_TEMPLATE.format(context="", query=query))
+
+    headers = [_chunk_header(chunk, i) for i, chunk in enumerate(context_chunks)]
+    texts = [f"{chunk.get('text', '')}\n" for chunk in context_chunks]
+    counts = count_tokens_batch([h + t for h, t in zip(headers, texts)])
+
+    parts: List[str] = []
+    kept: List[Dict] = []
+    for chunk, header, text, tokens in zip(context_chunks, headers, texts, counts):
+        if tokens <= remaining:
+            parts.append(header + text)
+            kept.append(chunk)
+            remaining -= tokens
+            continue
+
+        room = remaining - count_tokens(header) - 1
+        truncated = _truncate_to_sentences(text, room)
+        if truncated:
+            parts.append(f"{header}{truncated}\n")
+            kept.append({**chunk, "text": truncated})
+        break
+
+    prompt = _RAG_TEMPLATE.format(context="".join(parts), query=query)
+    return prompt, count_tokens(prompt), kept
 
 
 def build_fallback_prompt(query: str) -> str:
@@ -0,0 +1,110 @@
+"""Optional cross-encoder reranking of retrieved chunks.
+
+Retrieval over-fetches ``RERANK_CANDIDATES`` chunks; a small local
+cross-encoder scores every (query, chunk) pair in one batched forward pass
+on CPU and only the best ``top_k`` reach the prompt. Linear layers are
+quantized to int8 when ``RERANK_QUANTIZE`` is set.
+
+The model loads on first use. If it cannot be loaded or scoring fails,
+chunks are passed through in retrieval order.
+"""
+
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from sentence_transformers import CrossEncoder
+
+from backend.app.core.config import settings
+from backend.app.utils.logger import logger
+
+_model: Optional[CrossEncoder] = None
+_model_failed = False
+_model_lock = threading.Lock()
+
+
+def load_model(
+    name: Optional[str] = None,
+    quantize: Optional[bool] = None,
+) -> CrossEncoder:
+    """Load a cross-encoder for CPU inference, int8-quantized if asked."""
+    name = name or settings.RERANK_MODEL
+    quantize = settings.RERANK_QUANTIZE if quantize is None else quantize
+
+    model = CrossEncoder(
+        name,
+        max_length=settings.RERANK_MAX_LENGTH,
+        device="cpu",
+    )
+    if quantize:
+        model.model = torch.quantization.quantize_dynamic(
+            model.model,
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+        )
+    model.model.eval()
+    return model
+
+
+def _get_model() -> Optional[CrossEncoder]:
+    """The shared cross-encoder, or None if it failed to load."""
+    global _model, _model_failed
+
+    if _model is not None or _model_failed:
+        return _model
+
+    with _model_lock:
+        if _model is None and not _model_failed:
+            try:
+                _model = load_model()
+                logger.info(f"Loaded rerank model: {settings.RERANK_MODEL}")
+            except Exception as e:
+                _model_failed = True
+                logger.error(f"Failed to load rerank model: {e}")
+
+    return _model
+
+
+def score_pairs(model: CrossEncoder, query: str, texts: List[str]) -> np.ndarray:
+    """Relevance logits of each text for the query, in one batch."""
+    return model.predict(
+        [(query, text) for text in texts],
+        batch_size=max(len(texts), 1),
+        show_progress_bar=False,
+        activation_fct=torch.nn.Identity(),
+        convert_to_numpy=True,
+    )
+
+
+async def rerank(query: str, chunks: List[Dict], top_k: int) -> List[Dict]:
+    """Reorder chunks by cross-encoder relevance and keep the best ``top_k``.
+
+    Each kept chunk's ``score`` becomes the sigmoid of its logit, i.e. a
+    0-1 relevance estimate, and is used as the answer's confidence.
+    """
+    if len(chunks) <= 1:
+        return chunks[:top_k]
+
+    # The first call downloads, loads and quantizes the model.
+    model = await asyncio.to_thread(_get_model)
+    if model is None:
+        return chunks[:top_k]
+
+    try:
+        logits = await asyncio.to_thread(
+            score_pairs,
+            model,
+            query,
+            [chunk["text"] for chunk in chunks],
+        )
+    except Exception as e:
+        logger.error(f"Reranking failed: {e}")
+        return chunks[:top_k]
+
+    logits = np.asarray(logits, dtype=np.float32).reshape(len(chunks), -1)[:, 0]
+    order = np.argsort(-logits, kind="stable")[:top_k]
+    scores = 1 / (1 + np.exp(-logits))
+
+    return [{**chunks[i], "score": float(scores[i])} for i in order]
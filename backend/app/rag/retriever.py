@@ -1,60 +1,334 @@
-"""Core retirever module for RAG Pipeline."""
+"""Core retirever module for RAG Pipeline.
 
-from typing import List, Dict
+Retrieval is hybrid: dense FAISS search and BM25 lexical search run in
+parallel and their rankings are merged by reciprocal rank fusion.
+"""
+
+import asyncio
+import json
+import re
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from backend.app.core.config import settings
 from backend.app.ingestion.embedder import get_embeddings
-from backend.app.core.vectorstore import search_index
+from backend.app.core.vectorstore import search_index_batch, search_lexical
+from backend.app.rag.embedding_cache import (
+    get_cached_embedding,
+    set_cached_embedding,
+)
 from backend.app.utils.logger import logger
 
 
-async def retrieve_relevant_chunks(
-    client_id: str,
-    query: str,
-    top_k: int = 5
-) -> List[Dict]:
-    """
-    Retrieve most relevant chunks for a query.
+class SearchCoalescer:
+    """Micro-batch concurrent searches for the same tenant.
 
-    Steps:
-    1. Convert query → embedding
-    2. Search FAISS index
-    3. Return ranked chunks
+    Queries arriving within ``window_ms`` of the first pending query for a
+    tenant (and embedding dimension and filters) are gathered and sent to
+    FAISS as one matrix search. A batch is flushed early once it reaches
+    ``max_batch``. A window of 0 disables coalescing.
     """
 
-    if not query.strip():
-        logger.warning("Empty query received for retrieval")
-        return []
+    def __init__(self, window_ms: int, max_batch: int) -> None:
+        """Create a coalescer with the given window and batch bound."""
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: Dict[Tuple[str, int, str], List[Tuple]] = {}
+        self._timers: Dict[Tuple[str, int, str], asyncio.TimerHandle] = {}
+        self._filters: Dict[Tuple[str, int, str], Optional[Dict]] = {}
+        self._tasks: Set[asyncio.Task] = set()
 
-    # Step 1: Embed the query
-    try:
-        embeddings, _ = await get_embeddings(texts=[query])
-    except Exception as e:
-        logger.error(f"Embedding failed in retriever: {e}")
-        return []
+    async def search(
+        self,
+        client_id: str,
+        query_embedding: List[float],
+        top_k: int,
+        filters: Optional[Dict] = None,
+    ) -> List[Dict]:
+        """Queue a search and wait for its share of the batched result."""
+        if self.window <= 0:
+            results = await asyncio.to_thread(
+                search_index_batch, client_id, [query_embedding], top_k, filters
+            )
+            return results[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        key = (
+            client_id,
+            len(query_embedding),
+            json.dumps(filters, sort_keys=True, default=str),
+        )
+        self._filters[key] = filters
+        batch = self._pending.setdefault(key, [])
+        batch.append((query_embedding, top_k, future))
+
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Tuple[str, int, str]) -> None:
+        """Dispatch every pending query for a key as one batch."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(key, [])
+        filters = self._filters.pop(key, None)
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(
+            self._run(key[0], batch, filters)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        client_id: str,
+        batch: List[Tuple],
+        filters: Optional[Dict] = None,
+    ) -> None:
+        """Run one FAISS call for the batch and resolve each waiter."""
+        top_k = max(k for _, k, _ in batch)
+
+        try:
+            results = await asyncio.to_thread(
+                search_index_batch,
+                client_id,
+                [embedding for embedding, _, _ in batch],
+                top_k,
+                filters,
+            )
+        except Exception as exc:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, k, future), rows in zip(batch, results):
+            if not future.done():
+                future.set_result(rows[:k])
+
+
+search_coalescer = SearchCoalescer(
+    window_ms=settings.SEARCH_BATCH_WINDOW_MS,
+    max_batch=settings.SEARCH_BATCH_MAX_SIZE,
+)
+
+
+# Characters that may appear in order numbers, SKUs and error codes.
+_IDENTIFIER_CHARS = re.compile(r"[\w#./:-]+")
+_IDENTIFIER_MAX_WORDS = 3
+
+
+def _is_identifier(word: str) -> bool:
+    """Whether a word looks like a code rather than natural language."""
+    word = word.strip("?!,;'\"()")
+    if len(word) < 3 or not _IDENTIFIER_CHARS.fullmatch(word):
+        return False
+
+    return (
+        any(char.isdigit() for char in word)
+        or "_" in word
+        or ("-" in word and word.isupper())
+    )
 
-    query_embedding = embeddings[0]
 
-    # Step 2: Search FAISS index
+def looks_like_identifier(query: str) -> bool:
+    """Whether a short query is essentially an identifier lookup.
+
+    E.g. ``"ORD-10423"``, ``"order 10423"`` or ``"ERR_CONN_RESET"``.
+    """
+    words = query.split()
+    return 0 < len(words) <= _IDENTIFIER_MAX_WORDS and any(
+        _is_identifier(word) for word in words
+    )
+
+
+async def lexical_search(
+    client_id: str,
+    query: str,
+    top_k: int,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
+    """BM25 search off the event loop; failures count as no results."""
     try:
-        results = search_index(
-            client_id=client_id,
-            query_embedding=query_embedding,
-            top_k=top_k
+        return await asyncio.to_thread(
+            search_lexical, client_id, query, top_k, filters
         )
     except Exception as e:
-        logger.error(f"FAISS search failed: {e}")
+        logger.warning(f"Lexical search failed: {e}")
         return []
 
-    # Step 3: Post-process results
+
+def start_lexical_search(
+    client_id: str,
+    query: str,
+    top_k: int,
+    filters: Optional[Dict] = None,
+) -> Optional[asyncio.Task]:
+    """Start lexical search in the background, if hybrid search is on.
+
+    The task fetches ``HYBRID_CANDIDATES`` results (at least ``top_k``)
+    for fusion and can be handed to ``retrieve_relevant_chunks``.
+    """
+    if not settings.HYBRID_SEARCH_ENABLED or not query.strip():
+        return None
+
+    candidates = max(top_k, settings.HYBRID_CANDIDATES)
+    return asyncio.create_task(
+        lexical_search(client_id, query, candidates, filters)
+    )
+
+
+def _chunk_key(item: Dict) -> Hashable:
+    """Identity of a chunk across result lists."""
+    if item.get("document_id") is not None and item.get("chunk_index") is not None:
+        return (item["document_id"], item["chunk_index"])
+    return item.get("text")
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict]],
+    top_k: int,
+    k: Optional[int] = None,
+) -> List[Dict]:
+    """Merge ranked result lists by reciprocal rank fusion.
+
+    Each chunk scores ``sum(1 / (k + rank))`` over the lists it appears
+    in, stored as ``rrf_score``. A chunk found by several lists keeps the
+    copy with the highest ``score``. Ties keep the order of ``rankings``.
+    """
+    k = settings.RRF_K if k is None else k
+    fused: Dict[Hashable, float] = {}
+    best: Dict[Hashable, Dict] = {}
+
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            key = _chunk_key(item)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+            if key not in best or item.get("score", 0.0) > best[key].get("score", 0.0):
+                best[key] = item
+
+    order = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**best[key], "rrf_score": fused[key]} for key in order]
+
+
+def _clean_results(results: List[Dict]) -> List[Dict]:
+    """Keep the fields callers use, dropping malformed rows.
+
+    ``document_id`` and ``chunk_index`` are kept when present so later
+    stages can look up the chunk's vector and its neighbours.
+    """
     cleaned_results = []
     for item in results:
         if "text" not in item or "metadata" not in item:
             continue
 
-        cleaned_results.append({
+        cleaned = {
             "text": item["text"],
             "metadata": item["metadata"],
             "score": float(item.get("score", 0.0))
-        })
+        }
+        for key in ("document_id", "chunk_index"):
+            if item.get(key) is not None:
+                cleaned[key] = item[key]
+        cleaned_results.append(cleaned)
+
+    return cleaned_results
+
+
+async def embed_query(query: str) -> List[float]:
+    """Embed a query, serving repeated queries from the embedding cache."""
+    query_embedding = get_cached_embedding(settings.OPENAI_EBD_MODEL, query)
+
+    if query_embedding is None:
+        # Fail over to the local model rather than back off on the hot path.
+        embeddings, usage = await get_embeddings(texts=[query], max_retries=0)
+        query_embedding = embeddings[0]
+        set_cached_embedding(
+            usage.get("model", settings.OPENAI_EBD_MODEL),
+            query,
+            query_embedding,
+        )
+
+    return query_embedding
+
+
+async def retrieve_relevant_chunks(
+    client_id: str,
+    query: str,
+    top_k: int = 5,
+    query_embedding: Optional[List[float]] = None,
+    lexical: Optional[asyncio.Task] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
+    """
+    Retrieve most relevant chunks for a query.
+
+    Steps:
+    1. Start BM25 search (unless the caller passes its ``lexical`` task)
+    2. Convert query → embedding (skipped if the caller already has one,
+       or if the query is an identifier that BM25 already matched)
+    3. Search FAISS index (coalesced with concurrent tenant queries)
+    4. Fuse both rankings and return ranked chunks
+
+    A chunk's ``score`` is its vector similarity or, if higher, the share
+    of query terms it contains. ``filters`` (see ``search_index_batch``)
+    restrict both searches; a caller-started ``lexical`` task must have
+    been started with the same filters.
+    """
+
+    if not query.strip():
+        logger.warning("Empty query received for retrieval")
+        return []
+
+    # Step 1: Lexical search runs while the query is embedded
+    if lexical is None:
+        lexical = start_lexical_search(client_id, query, top_k, filters)
+
+    if lexical is not None and query_embedding is None:
+        if looks_like_identifier(query):
+            lexical_results = await lexical
+            if lexical_results:
+                return _clean_results(lexical_results[:top_k])
+
+    # Step 2: Embed the query
+    dense_results: List[Dict] = []
+    if query_embedding is None:
+        try:
+            query_embedding = await embed_query(query)
+        except Exception as e:
+            logger.error(f"Embedding failed in retriever: {e}")
+
+    # Step 3: Search FAISS index
+    if query_embedding is not None:
+        candidates = top_k
+        if lexical is not None:
+            candidates = max(top_k, settings.HYBRID_CANDIDATES)
+        try:
+            dense_results = await search_coalescer.search(
+                client_id=client_id,
+                query_embedding=query_embedding,
+                top_k=candidates,
+                filters=filters
+            )
+        except Exception as e:
+            logger.error(f"FAISS search failed: {e}")
+
+    # Step 4: Fuse and post-process results
+    lexical_results = await lexical if lexical is not None else []
+    if lexical_results:
+        results = reciprocal_rank_fusion([dense_results, lexical_results], top_k)
+    else:
+        results = dense_results[:top_k]
+
+    cleaned_results = _clean_results(results)
 
     logger.info(
         f"Retrieved {len(cleaned_results)} chunks for client={client_id}"
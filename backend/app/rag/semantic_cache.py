@@ -0,0 +1,126 @@
+"""Per-tenant semantic cache of generated answers.
+
+A cached answer is reused when a new query embedding has cosine similarity
+of at least ``SEMANTIC_CACHE_THRESHOLD`` with a previously answered query
+and the tenant's index version has not changed since it was stored. Any
+version bump (new upload, compaction, deletion) drops the tenant's entries.
+"""
+
+import copy
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.app.core.config import settings
+from backend.app.core.index_cache import IndexCache
+
+
+class TenantAnswerCache:
+    """Answers for one tenant at one index version, oldest first."""
+
+    def __init__(self, version: int, dimension: int) -> None:
+        """Create an empty cache bound to an index version."""
+        self.version = version
+        self.dimension = dimension
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.entries: List[Dict] = []
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size used for cache accounting."""
+        return self.vectors.nbytes + 1024 * len(self.entries)
+
+    def lookup(self, query: np.ndarray) -> Optional[Dict]:
+        """Return the closest entry if it clears the similarity threshold."""
+        if not self.entries:
+            return None
+
+        similarities = self.vectors @ query
+        best = int(np.argmax(similarities))
+
+        if similarities[best] < settings.SEMANTIC_CACHE_THRESHOLD:
+            return None
+
+        return self.entries[best]
+
+    def add(self, query: np.ndarray, entry: Dict) -> None:
+        """Append an entry, dropping the oldest beyond the size bound."""
+        self.vectors = np.vstack([self.vectors, query[None, :]])
+        self.entries.append(entry)
+
+        overflow = len(self.entries) - settings.SEMANTIC_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            self.vectors = self.vectors[overflow:]
+            self.entries = self.entries[overflow:]
+
+
+_tenants = IndexCache(
+    max_entries=settings.SEMANTIC_CACHE_MAX_TENANTS,
+    max_bytes=settings.SEMANTIC_CACHE_MAX_MB * 1024 * 1024,
+    sizeof=lambda tenant: tenant.nbytes,
+)
+_lock = threading.Lock()
+
+
+def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+    """Unit-normalize an embedding so a dot product is cosine similarity."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+
+def lookup_answer(
+    client_id: str,
+    index_version: int,
+    query_embedding: List[float],
+) -> Optional[Dict]:
+    """Return a cached pipeline result for a semantically equivalent query."""
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+
+    query = _normalize(query_embedding)
+    if query is None:
+        return None
+
+    with _lock:
+        tenant = _tenants.get(client_id)
+        if tenant is None:
+            return None
+
+        if tenant.version != index_version or tenant.dimension != len(query):
+            _tenants.pop(client_id)
+            return None
+
+        entry = tenant.lookup(query)
+        return copy.deepcopy(entry) if entry is not None else None
+
+
+def store_answer(
+    client_id: str,
+    index_version: int,
+    query_embedding: List[float],
+    result: Dict,
+) -> None:
+    """Remember a generated answer for the tenant's current index version."""
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return
+
+    query = _normalize(query_embedding)
+    if query is None:
+        return
+
+    with _lock:
+        tenant = _tenants.get(client_id)
+        stale = tenant is None or tenant.version != index_version
+        if stale or tenant.dimension != len(query):
+            tenant = TenantAnswerCache(index_version, len(query))
+
+        tenant.add(query, copy.deepcopy(result))
+        _tenants.put(client_id, tenant)
+
+
+def invalidate(client_id: str) -> None:
+    """Drop every cached answer for a tenant."""
+    with _lock:
+        _tenants.pop(client_id)
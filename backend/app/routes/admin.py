@@ -9,9 +9,11 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 
 from backend.app.core.database import get_db
+from backend.app.core.vectorstore import get_cache_stats
 from backend.app.models.chat_logs import ChatLog
 from backend.app.models.client import Client
 from backend.app.models.handoff import HandoffStatus, HandoffTicket
+from backend.app.rag.embedding_cache import get_embedding_cache_stats
 from backend.app.schemas.client import ClientResponse
 from backend.app.services.analytics import (
     get_cost_analytics,
@@ -177,6 +179,18 @@ def whatsapp_activity_analytics(db: Session = Depends(get_db)):
     }
 
 
+@router.get("/vectorstore/cache")
+def vectorstore_cache_stats():
+    """Get this worker's FAISS index cache counters."""
+    return get_cache_stats()
+
+
+@router.get("/embeddings/cache")
+def embedding_cache_stats():
+    """Get this worker's query embedding cache counters."""
+    return get_embedding_cache_stats()
+
+
 @router.get("/handoff/list")
 def list_handoff_tickets(
     status: Optional[HandoffStatus] = None,
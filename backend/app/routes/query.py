@@ -1,14 +1,20 @@
 """Query endpoint for the support bot."""
 
+import json
+import time
+from typing import Dict, List, Optional
+from uuid import UUID
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from backend.app.core.auth import get_current_client
-from backend.app.core.database import get_db
+from backend.app.core.database import SessionLocal, get_db
 from backend.app.models.chat_logs import ChatLog
 from backend.app.models.client import Client
 from backend.app.models.usage import UsageLog
-from backend.app.rag.pipeline import run_rag_pipeline
+from backend.app.rag.pipeline import run_rag_pipeline, stream_rag_pipeline
 from backend.app.schemas.query import QueryRequest, QueryResponse
 from backend.app.utils.logger import logger
 from backend.app.utils.rate_limit import check_rate_limit, get_rate_limit_for_plan
@@ -16,6 +22,65 @@ from backend.app.utils.rate_limit import check_rate_limit, get_rate_limit_for_pl
 router = APIRouter(prefix="/query", tags=["Query"])
 
 
+def _log_query(db: Session, client_id: UUID, query: str, result: Dict) -> None:
+    """Persist the chat log and the billable usage log for a query."""
+    chat_log = ChatLog(
+        client_id=client_id,
+        query_text=query,
+        response_text=result["answer"],
+        retrieved_chunks=result.get("retrieved_chunks", []),
+        confidence_score=result["confidence"],
+        latency_ms=result["latency_ms"],
+        channel="api",
+    )
+    db.add(chat_log)
+
+    usage_log = UsageLog(
+        client_id=client_id,
+        operation_type="query",
+        input_tokens=result["usage_stats"]["input_tokens"],
+        output_tokens=result["usage_stats"]["output_tokens"],
+        cost_usd=result["usage_stats"]["cost_usd"],
+        model_used=result["usage_stats"]["model_used"],
+        latency_ms=result["latency_ms"],
+        metadata_json={
+            "semantic_cache": "hit" if result.get("cache_hit") else "miss",
+            "prompt_tokens": result["usage_stats"].get("prompt_tokens", 0),
+            "context_tokens_saved": result["usage_stats"].get(
+                "context_tokens_saved",
+                0,
+            ),
+        },
+    )
+    db.add(usage_log)
+
+    db.commit()
+
+
+def _persist_streamed_query(client_id: UUID, query: str, result: Dict) -> None:
+    """Log a streamed query with its own session.
+
+    The request-scoped session is already released once streaming starts.
+    """
+    db = SessionLocal()
+    try:
+        _log_query(db, client_id, query, result)
+    except Exception as e:
+        logger.error(f"Failed to persist streamed query logs: {e}")
+    finally:
+        db.close()
+
+
+def _search_filters(request: QueryRequest) -> Optional[Dict]:
+    """Retrieval filters of a query request, if any."""
+    return request.filters.to_search_filters() if request.filters else None
+
+
+def _sse(event: str, data) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/", response_model=QueryResponse)
 async def query_support_bot(
     request: QueryRequest,
@@ -40,41 +105,105 @@ async def query_support_bot(
             client_id=str(client.id),
             query=request.query,
             plan_type=client.plan_type.value,
+            filters=_search_filters(request),
         )
     except Exception as e:
         logger.error(f"RAG pipeline failed for client {client.id}: {e}")
         raise HTTPException(status_code=500, detail="Query processing failed") from None
 
-    # 4. Persist chat log
-    chat_log = ChatLog(
-        client_id=client.id,
-        query_text=request.query,
-        response_text=result["answer"],
-        retrieved_chunks=result.get("retrieved_chunks", []),
-        confidence_score=result["confidence"],
-        latency_ms=result["latency_ms"],
-        channel="api",
-    )
-    db.add(chat_log)
-
-    # 5. Persist usage log (for billing)
-    usage_log = UsageLog(
-        client_id=client.id,
-        operation_type="query",
-        input_tokens=result["usage_stats"]["input_tokens"],
-        output_tokens=result["usage_stats"]["output_tokens"],
-        cost_usd=result["usage_stats"]["cost_usd"],
-        model_used=result["usage_stats"]["model_used"],
-        latency_ms=result["latency_ms"],
-    )
-    db.add(usage_log)
-
-    db.commit()
+    # 4. Persist chat log and usage log (for billing)
+    _log_query(db, client.id, request.query, result)
 
-    # 6. Return clean response
+    # 5. Return clean response
     return QueryResponse(
         answer=result["answer"],
         citations=result["citations"],
         confidence=result["confidence"],
         latency_ms=result["latency_ms"],
     )
+
+
+@router.post("/stream")
+async def stream_query_support_bot(
+    request: QueryRequest,
+    client: Client = Depends(get_current_client),
+):
+    """Streaming query endpoint – emits the answer as server-sent events.
+
+    Events: ``citations`` (sent as soon as retrieval finishes), one ``token``
+    per generated text delta, then ``done`` with confidence and latency.
+    Chat and usage logs are persisted once the stream ends; if the client
+    disconnects first, the partial answer and the tokens spent on it are
+    logged.
+    """
+    if client.is_disabled:
+        raise HTTPException(
+            status_code=403,
+            detail="Account disabled due to billing or policy issues",
+        )
+
+    rate_limit = get_rate_limit_for_plan(client.plan_type.value)
+    await check_rate_limit(str(client.id), rate_limit)
+
+    client_id = client.id
+    plan_type = client.plan_type.value
+    filters = _search_filters(request)
+
+    async def event_stream():
+        start_time = time.time()
+        usage_stats: Dict = {}
+        citations: Dict = {"citations": [], "confidence": 0.0}
+        parts: List[str] = []
+        result = None
+        failed = False
+
+        events = stream_rag_pipeline(
+            client_id=str(client_id),
+            query=request.query,
+            plan_type=plan_type,
+            filters=filters,
+            usage_stats=usage_stats,
+        )
+        try:
+            async for event in events:
+                if event["event"] == "done":
+                    result = event["data"]
+                    yield _sse(
+                        "done",
+                        {
+                            "confidence": result["confidence"],
+                            "latency_ms": result["latency_ms"],
+                        },
+                    )
+                    continue
+
+                if event["event"] == "citations":
+                    citations = event["data"]
+                elif event["event"] == "token":
+                    parts.append(event["data"])
+                yield _sse(event["event"], event["data"])
+        except Exception as e:
+            failed = True
+            logger.error(f"Streaming RAG pipeline failed for client {client_id}: {e}")
+            yield _sse("error", {"detail": "Query processing failed"})
+        finally:
+            # Closing the pipeline records the usage of a generation cut
+            # short by a disconnect.
+            await events.aclose()
+            if result is None and not failed and usage_stats.get("input_tokens"):
+                result = {
+                    "answer": "".join(parts),
+                    "citations": citations["citations"],
+                    "confidence": citations["confidence"],
+                    "latency_ms": int((time.time() - start_time) * 1000),
+                    "cache_hit": False,
+                    "usage_stats": usage_stats,
+                }
+            if result is not None:
+                _persist_streamed_query(client_id, request.query, result)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
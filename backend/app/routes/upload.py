@@ -1,32 +1,94 @@
 """Document ingestion API endpoints."""
 
+import asyncio
+import hashlib
+import os
+import tempfile
 import uuid
+from typing import Tuple
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Response,
+    UploadFile,
+)
 from sqlalchemy.orm import Session
 
 from backend.app.core.auth import get_current_client
 from backend.app.core.database import get_db
-from backend.app.ingestion.chunker import chunk_text
-from backend.app.ingestion.embedder import embed_and_index
-from backend.app.ingestion.pdf_reader import extract_pdf_text
-from backend.app.ingestion.text_reader import extract_text
-from backend.app.ingestion.url_scraper import scrape_url
-from backend.app.models.client import Client
+from backend.app.core.vectorstore import delete_document
+from backend.app.ingestion.jobs import (
+    STATUS_FAILED,
+    STATUS_PROCESSING,
+    enqueue_job,
+    new_document_id,
+    run_job_in_process,
+    upload_key,
+)
+from backend.app.models.client import Client, PlanType
 from backend.app.models.documents import Document
+from backend.app.rag.semantic_cache import invalidate
 from backend.app.schemas.document import DocumentResponse
+from backend.app.services.usage_limits import check_file_size
+from backend.app.utils.file_utils import get_file_extension, sanitize_filename
 from backend.app.utils.logger import logger
+from backend.app.utils.s3 import delete_file, upload_path
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
 
+_SPOOL_CHUNK_BYTES = 1024 * 1024
 
-@router.post("/file", response_model=DocumentResponse)
+
+async def _spool_upload(
+    file: UploadFile,
+    plan_type: PlanType,
+) -> Tuple[str, int, str]:
+    """Copy an upload to a temporary file in chunks, enforcing the size limit.
+
+    Returns the file path, size and SHA-256 hex digest. The upload is
+    rejected as soon as it exceeds the plan limit, without reading the rest
+    of it.
+    """
+    spool = tempfile.NamedTemporaryFile(
+        delete=False,
+        suffix=get_file_extension(file.filename),
+    )
+    size = 0
+    digest = hashlib.sha256()
+
+    try:
+        with spool:
+            while chunk := await file.read(_SPOOL_CHUNK_BYTES):
+                size += len(chunk)
+                check_file_size(size, plan_type)
+                spool.write(chunk)
+                digest.update(chunk)
+    except Exception:
+        os.remove(spool.name)
+        raise
+
+    return spool.name, size, digest.hexdigest()
+
+
+@router.post("/file", response_model=DocumentResponse, status_code=202)
 async def upload_document(
+    background_tasks: BackgroundTasks,
+    response: Response,
     file: UploadFile = File(...),
     client: Client = Depends(get_current_client),
     db: Session = Depends(get_db),
 ):
-    """Upload and ingest a document file into the knowledge base."""
+    """Accept a document file and queue it for ingestion.
+
+    Returns immediately with ``status=processing``; poll
+    ``GET /upload/{document_id}`` for the outcome. Re-uploading a file
+    identical to an existing document returns that document instead.
+    """
     if client.is_disabled:
         raise HTTPException(status_code=403, detail="Account disabled")
 
@@ -45,110 +107,199 @@ async def upload_document(
             detail="Document limit reached for your plan",
         )
 
-    content = await file.read()
-    file_size = len(content)
+    path, file_size, content_hash = await _spool_upload(file, client.plan_type)
 
-    try:
-        if file.filename.endswith(".pdf"):
-            text = extract_pdf_text(content)
-            source_type = "pdf"
-        else:
-            text = extract_text(content)
-            source_type = "text"
-    except Exception as e:
-        logger.error(f"Text extraction failed: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Text extraction failed",
-        ) from e
-
-    chunks = chunk_text(text, filename=file.filename)
+    existing = (
+        db.query(Document)
+        .filter(
+            Document.client_id == client.id,
+            Document.content_hash == content_hash,
+            Document.status != STATUS_FAILED,
+        )
+        .first()
+    )
+    if existing is not None:
+        os.remove(path)
+        response.status_code = 200
+        return DocumentResponse.from_orm(existing)
 
-    document_id = str(uuid.uuid4())
+    source_type = "pdf" if file.filename.endswith(".pdf") else "text"
 
-    try:
-        await embed_and_index(
-            client_id=str(client.id),
-            chunks=chunks,
-            document_id=document_id,
-        )
-    except Exception as e:
-        logger.error(f"Embedding failed: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Embedding failed",
-        ) from e
+    document_id = new_document_id()
+    s3_key = upload_key(
+        str(client.id),
+        document_id,
+        sanitize_filename(file.filename),
+    )
+    stored = await asyncio.to_thread(upload_path, path, s3_key)
 
     document = Document(
+        id=uuid.UUID(document_id),
         client_id=client.id,
         filename=file.filename,
         source_type=source_type,
         file_size_bytes=file_size,
-        chunk_count=len(chunks),
+        chunk_count=0,
+        s3_key=s3_key if stored else None,
+        content_hash=content_hash,
+        status=STATUS_PROCESSING,
     )
 
     db.add(document)
     db.commit()
     db.refresh(document)
 
+    job = {
+        "kind": "file",
+        "document_id": document_id,
+        "client_id": str(client.id),
+        "plan_type": client.plan_type.value,
+        "filename": file.filename,
+        "s3_key": s3_key,
+    }
+
+    # Without the raw file in S3 or a reachable queue, ingest in-process.
+    if stored and enqueue_job(job):
+        os.remove(path)
+    else:
+        background_tasks.add_task(run_job_in_process, job, path)
+
     return DocumentResponse.from_orm(document)
 
 
-@router.post("/url", response_model=DocumentResponse)
+@router.post("/url", response_model=DocumentResponse, status_code=202)
 async def upload_url(
+    background_tasks: BackgroundTasks,
+    response: Response,
     url: str = Form(...),
     client: Client = Depends(get_current_client),
     db: Session = Depends(get_db),
 ):
-    """Ingest and index content from a URL."""
+    """Queue content from a URL for ingestion.
+
+    Re-submitting a URL the tenant already has refreshes that document
+    instead of adding another; its vectors are only rebuilt if the page
+    changed. A page identical to another document fails ingestion.
+    """
     if client.is_disabled:
         raise HTTPException(status_code=403, detail="Account disabled")
 
-    plan_limits = {"starter": 10, "growth": 50, "scale": 1000}
-    existing_docs = db.query(Document).filter(Document.client_id == client.id).count()
+    document = (
+        db.query(Document)
+        .filter(
+            Document.client_id == client.id,
+            Document.source_url == url,
+            Document.status != STATUS_FAILED,
+        )
+        .first()
+    )
+    if document is not None and document.status == STATUS_PROCESSING:
+        response.status_code = 200
+        return DocumentResponse.from_orm(document)
 
-    if existing_docs >= plan_limits.get(client.plan_type.value, 10):
-        raise HTTPException(
-            status_code=403,
-            detail="Document limit reached for your plan",
+    if document is not None:
+        document.status = STATUS_PROCESSING
+        document.error = None
+    else:
+        plan_limits = {"starter": 10, "growth": 50, "scale": 1000}
+        client_docs = db.query(Document).filter(Document.client_id == client.id)
+
+        if client_docs.count() >= plan_limits.get(client.plan_type.value, 10):
+            raise HTTPException(
+                status_code=403,
+                detail="Document limit reached for your plan",
+            )
+
+        document = Document(
+            id=uuid.UUID(new_document_id()),
+            client_id=client.id,
+            filename=url[:50],
+            source_type="url",
+            source_url=url,
+            file_size_bytes=0,
+            chunk_count=0,
+            status=STATUS_PROCESSING,
         )
+        db.add(document)
 
-    try:
-        text, metadata = scrape_url(url)
-    except Exception as e:
-        logger.error(f"URL scraping failed: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="URL scraping failed",
-        ) from e
+    db.commit()
+    db.refresh(document)
 
-    chunks = chunk_text(text, filename=url)
-    document_id = str(uuid.uuid4())
+    job = {
+        "kind": "url",
+        "document_id": str(document.id),
+        "client_id": str(client.id),
+        "plan_type": client.plan_type.value,
+        "url": url,
+    }
 
-    try:
-        await embed_and_index(
-            client_id=str(client.id),
-            chunks=chunks,
-            document_id=document_id,
+    if not enqueue_job(job):
+        background_tasks.add_task(run_job_in_process, job)
+
+    return DocumentResponse.from_orm(document)
+
+
+@router.get("/{document_id}", response_model=DocumentResponse)
+async def get_document_status(
+    document_id: uuid.UUID,
+    client: Client = Depends(get_current_client),
+    db: Session = Depends(get_db),
+):
+    """Return a document and its ingestion status."""
+    document = (
+        db.query(Document)
+        .filter(Document.id == document_id, Document.client_id == client.id)
+        .first()
+    )
+
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    return DocumentResponse.from_orm(document)
+
+
+@router.delete("/{document_id}", status_code=204)
+async def delete_uploaded_document(
+    document_id: uuid.UUID,
+    client: Client = Depends(get_current_client),
+    db: Session = Depends(get_db),
+):
+    """Delete a document, its vectors and its stored upload.
+
+    Vectors stop matching immediately; they are reclaimed from the index by
+    background compaction.
+    """
+    document = (
+        db.query(Document)
+        .filter(Document.id == document_id, Document.client_id == client.id)
+        .first()
+    )
+
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if document.status == STATUS_PROCESSING:
+        raise HTTPException(
+            status_code=409,
+            detail="Document is still being processed",
         )
+
+    # Keep the row and the upload unless the vectors are really gone, so a
+    # failed delete can be retried.
+    try:
+        await asyncio.to_thread(delete_document, str(client.id), str(document.id))
     except Exception as e:
-        logger.error(f"Embedding failed: {e}")
+        logger.error(f"Failed to delete vectors for document={document.id}: {e}")
         raise HTTPException(
-            status_code=500,
-            detail="Embedding failed",
-        ) from e
+            status_code=503,
+            detail="Could not delete document, please retry",
+        ) from None
+    invalidate(str(client.id))
 
-    document = Document(
-        client_id=client.id,
-        filename=metadata.get("title", url[:50]),
-        source_type="url",
-        source_url=url,
-        file_size_bytes=len(text),
-        chunk_count=len(chunks),
-    )
+    if document.s3_key:
+        await asyncio.to_thread(delete_file, document.s3_key)
 
-    db.add(document)
+    db.delete(document)
     db.commit()
-    db.refresh(document)
 
-    return DocumentResponse.from_orm(document)
+    return Response(status_code=204)
@@ -1,17 +1,25 @@
 """Pydantic response schemas for document ingestion APIs."""
 
 from datetime import datetime
+from typing import Optional
+from uuid import UUID
 
 from pydantic import BaseModel
 
 
 class DocumentResponse(BaseModel):
-    """Response model representing a successfully ingested document."""
+    """Response model representing an ingested or ingesting document.
 
-    id: str
+    ``status`` is ``processing`` until the background job finishes, then
+    ``ready`` or ``failed`` (with ``error`` set).
+    """
+
+    id: UUID
     filename: str
     source_type: str
     chunk_count: int
+    status: str
+    error: Optional[str] = None
     created_at: datetime
 
     class Config:
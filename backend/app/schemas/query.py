@@ -1,15 +1,41 @@
 """For Handling Reponse Validation."""
 
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
 
+class SearchFilters(BaseModel):
+    """Restricts retrieval to a subset of the tenant's documents."""
+
+    document_ids: Optional[List[str]] = None
+    source_type: Optional[str] = None  # pdf, text, url
+    filename: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def to_search_filters(self) -> Optional[Dict]:
+        """Filters as the vector store takes them, or None if empty.
+
+        Times become UTC epoch seconds; naive times are taken as UTC.
+        """
+        filters = self.model_dump(exclude_none=True)
+        for name in ("created_after", "created_before"):
+            if name in filters:
+                value = filters[name]
+                if value.tzinfo is None:
+                    value = value.replace(tzinfo=timezone.utc)
+                filters[name] = value.timestamp()
+        return filters or None
+
+
 class QueryRequest(BaseModel):
     """For Validating Query Request."""
 
     query: str
     conversation_id: Optional[str] = None
+    filters: Optional[SearchFilters] = None
 
 
 class Citation(BaseModel):
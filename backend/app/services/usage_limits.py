@@ -18,6 +18,7 @@ PLAN_LIMITS = {
         "queries_per_month": 1000,
         "rate_limit_per_min": 15,
         "whatsapp_messages": 0,
+        "max_prompt_tokens": 2500,
     },
     PlanType.GROWTH: {
         "max_docs": 50,
@@ -26,6 +27,7 @@ PLAN_LIMITS = {
         "queries_per_month": 5000,
         "rate_limit_per_min": 50,
         "whatsapp_messages": 2000,
+        "max_prompt_tokens": 4000,
     },
     PlanType.SCALE: {
         "max_docs": 1000,
@@ -34,6 +36,7 @@ PLAN_LIMITS = {
         "queries_per_month": 50000,
         "rate_limit_per_min": 100,
         "whatsapp_messages": 10000,
+        "max_prompt_tokens": 8000,
     },
 }
 
@@ -68,6 +68,14 @@ async def process_whatsapp_message(webhook_value: Dict) -> None:
         usage_log = UsageLog(
             client_id=client.id,
             operation_type="whatsapp",
+            metadata_json={
+                "semantic_cache": "hit" if result.get("cache_hit") else "miss",
+                "prompt_tokens": result["usage_stats"].get("prompt_tokens", 0),
+                "context_tokens_saved": result["usage_stats"].get(
+                    "context_tokens_saved",
+                    0,
+                ),
+            },
             timestamp=datetime.utcnow(),
         )
         db.add(usage_log)
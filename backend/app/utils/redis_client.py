@@ -10,9 +10,12 @@ try:
         settings.REDIS_URL,
         decode_responses=True,
     )
+    # Raw-bytes client for binary payloads such as cached embeddings.
+    redis_binary_client = redis.from_url(settings.REDIS_URL)
 except Exception as e:
     logger.error(f"Redis init failed: {e}")
     redis_client = None
+    redis_binary_client = None
 
 
 def test_redis_connection():
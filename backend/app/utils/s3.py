@@ -1,6 +1,7 @@
 """S3 utility functions for uploading, downloading, deleting files."""
 
 import boto3
+from boto3.exceptions import S3UploadFailedError
 from botocore.exceptions import ClientError
 
 from backend.app.core.config import settings
@@ -44,6 +45,26 @@ def download_file(key: str) -> bytes:
         raise
 
 
+def upload_path(path: str, key: str) -> bool:
+    """Upload a local file to S3, streaming it in multipart chunks."""
+    try:
+        s3_client.upload_file(path, settings.DO_SPACES_BUCKET, key)
+        logger.info(f"Uploaded to S3: {key}")
+        return True
+    except (ClientError, S3UploadFailedError) as e:
+        logger.error(f"S3 upload failed: {e}")
+        return False
+
+
+def download_to_path(key: str, path: str) -> None:
+    """Download an S3 object to a local file without buffering it in memory."""
+    try:
+        s3_client.download_file(settings.DO_SPACES_BUCKET, key, path)
+    except ClientError as e:
+        logger.error(f"S3 download failed: {e}")
+        raise
+
+
 def delete_file(key: str) -> bool:
     """Delete a file from S3."""
     try:
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Benchmark chunking throughput on a multi-MB corpus.
+
+Usage:
+    python backend/scripts/benchmark_chunker.py [--mb 5] [FILE ...]
+
+Without files, a synthetic corpus of roughly ``--mb`` megabytes of
+paragraphs and sentences is generated.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.app.ingestion.chunker import (  # noqa: E402
+    chunk_by_sentences,
+    chunk_text,
+    get_encoding,
+)
+
+WORDS = (
+    "the refund policy applies to all orders placed within thirty days of "
+    "delivery customers must contact support with their order number and "
+    "a short description of the issue before returning any item"
+).split()
+
+
+def synthetic_corpus(megabytes: float, seed: int = 0) -> str:
+    """Generate paragraphs of random sentences totalling ``megabytes``."""
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    paragraphs = []
+    size = 0
+
+    while size < target:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize()
+            + rng.choice(".!?")
+            for _ in range(rng.randint(3, 12))
+        ]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+
+    return "\n\n".join(paragraphs)
+
+
+def run(name: str, func, text: str) -> None:
+    """Time one chunker and print chunks/sec and MB/sec."""
+    start = time.perf_counter()
+    chunks = func(text)
+    elapsed = time.perf_counter() - start
+    mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+    print(
+        f"{name:<20} {len(chunks):>8} chunks  {elapsed:>7.2f}s  "
+        f"{len(chunks) / elapsed:>10.0f} chunks/s  {mb / elapsed:>6.2f} MB/s"
+    )
+
+
+def main() -> None:
+    """Build or read the corpus and time each chunker on it."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*", help="Text files to chunk")
+    parser.add_argument("--mb", type=float, default=5.0, help="Synthetic size")
+    args = parser.parse_args()
+
+    if args.files:
+        text = "\n\n".join(
+            open(path, encoding="utf-8", errors="replace").read() for path in args.files
+        )
+    else:
+        text = synthetic_corpus(args.mb)
+
+    # Load the encoding up front so it is not part of the first timing.
+    get_encoding()
+
+    print(f"Corpus: {len(text.encode('utf-8')) / (1024 * 1024):.2f} MB")
+    run("chunk_text", lambda t: chunk_text(t, filename="bench"), text)
+    run(
+        "chunk_by_sentences",
+        lambda t: chunk_by_sentences(t, filename="bench", overlap_sentences=1),
+        text,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Benchmark the cost of cross-encoder reranking per query.
+
+Usage:
+    python backend/scripts/benchmark_rerank.py [--model NAME]
+        [--candidates 20 50] [--queries 20] [--chunk-words 180]
+
+For each candidate count N, one query is scored against N chunks in a
+single batched forward pass, as ``rerank`` does at query time. Mean and
+p95 latency are reported for the float32 model and its int8-quantized
+copy. Chunks are synthetic text of roughly chunk size, so the numbers
+reflect model cost, not relevance.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.app.core.config import settings  # noqa: E402
+from backend.app.rag.reranker import load_model, score_pairs  # noqa: E402
+
+_WORDS = (
+    "account billing refund order shipping password reset invoice plan "
+    "upgrade cancel subscription delivery tracking support email login "
+    "error payment card address warehouse return policy days business"
+).split()
+
+
+def synthetic_chunks(count: int, words: int, seed: int = 0) -> list:
+    """Random support-like texts of about ``words`` words each."""
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(_WORDS, words)) for _ in range(count)]
+
+
+def run(label: str, model, candidates: list, queries: int, words: int) -> None:
+    """Time reranking of each candidate count and print the results."""
+    for count in candidates:
+        chunks = synthetic_chunks(count, words)
+        score_pairs(model, "warm up", chunks)
+
+        timings = []
+        for i in range(queries):
+            start = time.perf_counter()
+            score_pairs(model, f"how do I get a refund for order {i}", chunks)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        print(
+            f"{label:<6} N={count:<4} mean {np.mean(timings):>8.1f} ms  "
+            f"p95 {np.percentile(timings, 95):>8.1f} ms"
+        )
+
+
+def main() -> None:
+    """Time reranking with the float32 and int8 models."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=settings.RERANK_MODEL)
+    parser.add_argument("--candidates", type=int, nargs="*", default=[20, 50])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--chunk-words", type=int, default=180)
+    args = parser.parse_args()
+
+    print(f"Model: {args.model}, max_length {settings.RERANK_MAX_LENGTH}")
+    for label, quantize in (("fp32", False), ("int8", True)):
+        model = load_model(args.model, quantize=quantize)
+        run(label, model, args.candidates, args.queries, args.chunk_words)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,167 @@
-"""Auto-generated placeholder module for CortexLayer        Backend."""
+#!/usr/bin/env python3
+"""Rebuild FAISS indexes from the stored raw vectors, without re-embedding.
+
+Usage:
+    python backend/scripts/rebuild_vectorstore.py [--factory HNSW32]
+        [--tune-only] [--attributes] [--workers 4] [CLIENT_ID ...]
+
+Without client ids, every active client is rebuilt. Tenants are rebuilt in
+parallel, one process per tenant, with FAISS limited to one thread each.
+``--tune-only`` re-tunes search parameters (e.g. after changing the recall
+targets) without rebuilding. ``--attributes`` only records the documents'
+filter attributes (source type, upload time) from the database, for
+documents indexed before they were stored.
+"""
+
+import argparse
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import faiss  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from backend.app.core.config import settings  # noqa: E402
+from backend.app.core.vectorstore import (  # noqa: E402
+    rebuild_index,
+    set_document_attributes,
+    tune_index,
+)
+from backend.app.ingestion.jobs import (  # noqa: E402
+    STATUS_READY,
+    document_attributes,
+)
+from backend.app.models.client import Client  # noqa: E402
+from backend.app.models.documents import Document  # noqa: E402
+from backend.app.utils.logger import logger  # noqa: E402
+
+
+def active_client_ids() -> List[str]:
+    """Ids of all active clients."""
+    engine = create_engine(settings.DATABASE_URL)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+
+    try:
+        clients = db.query(Client).filter(Client.is_active.is_(True)).all()
+        return [str(client.id) for client in clients]
+    finally:
+        db.close()
+
+
+def backfill_attributes(client_ids: List[str]) -> int:
+    """Record every ready document's filter attributes. Returns failures."""
+    engine = create_engine(settings.DATABASE_URL)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    failures = 0
+
+    try:
+        for client_id in client_ids:
+            documents = (
+                db.query(Document)
+                .filter(Document.client_id == uuid.UUID(client_id))
+                .filter(Document.status == STATUS_READY)
+                .all()
+            )
+            attributes = {str(doc.id): document_attributes(doc) for doc in documents}
+            if not attributes:
+                continue
+
+            try:
+                set_document_attributes(client_id, attributes)
+                logger.info(f"Recorded {len(attributes)} documents for {client_id}")
+            except FileNotFoundError:
+                logger.info(f"No index for {client_id}, skipping")
+            except Exception as e:
+                failures += 1
+                logger.error(f"Attribute backfill failed for {client_id}: {e}")
+    finally:
+        db.close()
+
+    return failures
+
+
+def _init_worker() -> None:
+    """Keep FAISS single-threaded; parallelism comes from the process pool."""
+    faiss.omp_set_num_threads(1)
+
+
+def rebuild_all(
+    client_ids: List[str],
+    index_factory: Optional[str] = None,
+    workers: int = 4,
+    tune_only: bool = False,
+) -> int:
+    """Rebuild each tenant's index in parallel. Returns the failure count."""
+    failures = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {}
+        for client_id in client_ids:
+            if tune_only:
+                future = pool.submit(tune_index, client_id)
+            else:
+                future = pool.submit(rebuild_index, client_id, index_factory)
+            futures[future] = client_id
+
+        for future in as_completed(futures):
+            client_id = futures[future]
+            try:
+                result = future.result()
+                logger.info(f"Processed {client_id}: {result}")
+            except FileNotFoundError:
+                logger.info(f"No index for {client_id}, skipping")
+            except Exception as e:
+                failures += 1
+                logger.error(f"Rebuild failed for {client_id}: {e}")
+
+    return failures
+
+
+def main() -> None:
+    """Parse the command line and rebuild or backfill the requested tenants."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("client_ids", nargs="*", help="Tenants to rebuild")
+    parser.add_argument(
+        "--factory",
+        default=None,
+        help="FAISS index factory string (default: chosen by size and plan)",
+    )
+    parser.add_argument(
+        "--tune-only",
+        action="store_true",
+        help="Only re-tune search parameters",
+    )
+    parser.add_argument(
+        "--attributes",
+        action="store_true",
+        help="Only record document filter attributes from the database",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    client_ids = args.client_ids or active_client_ids()
+    if not client_ids:
+        logger.info("No active clients found — nothing to rebuild")
+        return
+
+    if args.attributes:
+        failures = backfill_attributes(client_ids)
+    else:
+        failures = rebuild_all(
+            client_ids,
+            args.factory,
+            args.workers,
+            args.tune_only,
+        )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
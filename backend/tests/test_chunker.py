@@ -4,6 +4,7 @@ from backend.app.ingestion.chunker import (
     chunk_by_sentences,
     chunk_text,
     count_tokens,
+    iter_chunks,
 )
 
 
@@ -43,3 +44,60 @@ def test_chunk_by_sentences():
         assert len(c["text"]) > 0
         assert c["metadata"]["filename"] == "sentences.txt"
         assert c["metadata"]["token_count"] > 0
+
+
+def test_iter_chunks_matches_chunk_text():
+    """Streaming chunking over blocks yields the same windows as chunk_text."""
+    text = " ".join(f"word{i}" for i in range(1000))
+    # Cut before a space, as iter_text_file does.
+    cuts = [0, text.index(" ", 1500), text.index(" ", 4000), len(text)]
+    blocks = [text[a:b] for a, b in zip(cuts, cuts[1:])]
+
+    sizes = {"chunk_size": 50, "chunk_overlap": 10}
+    expected = chunk_text(text, filename="a.txt", **sizes)
+    streamed = list(iter_chunks(blocks, filename="a.txt", **sizes))
+
+    expected_texts = [c["text"] for c in expected[: len(streamed)]]
+    assert [c["text"] for c in streamed] == expected_texts
+    assert streamed[-1]["text"].endswith("word999")
+
+
+def test_chunk_offsets_are_character_offsets():
+    """start_char/end_char slice the source text, including multi-byte text."""
+    text = " ".join(f"héllo wörld 😀 {i}." for i in range(200))
+
+    for chunk in chunk_text(text, filename="a.txt", chunk_size=40, chunk_overlap=8):
+        meta = chunk["metadata"]
+        assert text[meta["start_char"] : meta["end_char"]] == chunk["text"]
+
+    for chunk in chunk_by_sentences(text, filename="a.txt", max_tokens=40):
+        meta = chunk["metadata"]
+        assert text[meta["start_char"] : meta["end_char"]] == chunk["text"]
+
+
+def test_chunk_by_sentences_overlap_and_paragraphs():
+    """Overlap repeats trailing sentences; paragraph breaks split sentences."""
+    text = "First point\n\nSecond point. Third point. Fourth point."
+
+    chunks = chunk_by_sentences(
+        text,
+        filename="a.txt",
+        max_tokens=6,
+        overlap_sentences=1,
+    )
+
+    assert [c["text"] for c in chunks] == [
+        "First point\n\nSecond point.",
+        "Second point. Third point.",
+        "Third point. Fourth point.",
+    ]
+
+
+def test_chunk_by_sentences_splits_oversized_sentence():
+    """A sentence longer than max_tokens is split into bounded windows."""
+    text = "Short one. " + "word " * 300 + "end."
+
+    chunks = chunk_by_sentences(text, filename="a.txt", max_tokens=50)
+
+    assert chunks[0]["text"] == "Short one."
+    assert all(c["metadata"]["token_count"] <= 50 for c in chunks)
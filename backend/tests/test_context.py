@@ -0,0 +1,55 @@
+"""Tests for MMR context selection and overlap de-duplication."""
+
+import numpy as np
+import pytest
+
+from backend.app.ingestion.chunker import chunk_text
+from backend.app.rag import context
+
+
+def test_mmr_select_skips_near_duplicates() -> None:
+    """A near copy of the best hit must lose to a distinct relevant one."""
+    vectors = np.array(
+        [
+            [1.0, 0.0, 0.0],
+            [1.0, 0.05, 0.0],
+            [0.0, 1.0, 0.0],
+        ]
+    )
+
+    order = context.mmr_select([1.0, 0.5, 0.0], vectors, top_k=2, lambda_mult=0.5)
+
+    assert order == [1, 2]
+
+
+def test_merge_adjacent_removes_window_overlap() -> None:
+    """Overlapping windows of one document must merge into the source text."""
+    text = " ".join(f"sentence number {i} about refunds." for i in range(120))
+    windows = chunk_text(text, "faq.txt", chunk_size=100, chunk_overlap=20)
+    chunks = [
+        {**window, "document_id": "doc", "score": 0.5 + i / 100}
+        for i, window in enumerate(windows[1:3], start=1)
+    ]
+    other = {"text": "Unrelated.", "metadata": {"filename": "x.txt"}, "score": 0.9}
+
+    merged = context.merge_adjacent([chunks[1], other, chunks[0]])
+
+    assert [chunk["metadata"]["filename"] for chunk in merged] == ["faq.txt", "x.txt"]
+    start = windows[1]["metadata"]["start_char"]
+    end = windows[2]["metadata"]["end_char"]
+    assert merged[0]["text"] == text[start:end]
+    assert merged[0]["metadata"]["last_chunk_index"] == 2
+    assert merged[0]["score"] == pytest.approx(0.52)
+
+
+@pytest.mark.asyncio
+async def test_build_context_reports_tokens_saved(monkeypatch) -> None:
+    """Merging must report the overlap tokens it removed from the prompt."""
+    text = " ".join(f"word{i}" for i in range(400))
+    windows = chunk_text(text, "a.txt", chunk_size=100, chunk_overlap=30)[:2]
+    monkeypatch.setattr(context.settings, "MMR_ENABLED", False)
+
+    merged, saved = await context.build_context("client", windows, top_k=2)
+
+    assert len(merged) == 1
+    assert saved == pytest.approx(30, abs=2)
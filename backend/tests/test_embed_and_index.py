@@ -5,7 +5,12 @@ Tests for embed_and_index ingestion pipeline.
 from unittest.mock import patch
 import pytest
 
-from backend.app.ingestion.embedder import embed_and_index
+from backend.app.core.config import settings
+from backend.app.ingestion import chunk_store
+from backend.app.ingestion.embedder import (
+    embed_and_index,
+    get_embeddings_deduplicated,
+)
 
 
 @pytest.mark.asyncio
@@ -60,3 +65,62 @@ async def test_embed_and_index_empty_chunks():
 
     assert usage["tokens"] == 0
     assert usage["cost_usd"] == 0.0
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the binary Redis client."""
+
+    def __init__(self):
+        """Start with an empty store."""
+        self.store = {}
+
+    def mget(self, keys):
+        """Return stored bytes (or None) per key."""
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        """Pipelines write straight through."""
+        return self
+
+    def setex(self, key, ttl, value):
+        """Store bytes, ignoring the TTL."""
+        self.store[key] = value
+
+    def execute(self):
+        """Nothing is buffered."""
+        return []
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.embedder.get_embeddings")
+async def test_reupload_only_embeds_changed_chunks(mock_get_embeddings):
+    """Stored chunk embeddings are reused and duplicate texts embedded once."""
+    fake = FakeRedis()
+    model = settings.OPENAI_EBD_MODEL
+
+    async def fake_embeddings(texts, token_counts=None):
+        return [[float(len(t)), 1.0] for t in texts], {
+            "tokens": len(texts),
+            "cost_usd": 0.0,
+            "model": model,
+        }
+
+    mock_get_embeddings.side_effect = fake_embeddings
+
+    with patch.object(chunk_store, "redis_binary_client", fake):
+        first, usage = await get_embeddings_deduplicated(
+            "tenant",
+            ["alpha", "beta", "alpha"],
+        )
+        assert mock_get_embeddings.call_args.args[0] == ["alpha", "beta"]
+        assert first[0] == first[2]
+        assert usage["reused_chunks"] == 0
+
+        second, usage = await get_embeddings_deduplicated(
+            "tenant",
+            ["alpha  ", "beta", "gamma"],
+        )
+
+    assert mock_get_embeddings.call_args.args[0] == ["gamma"]
+    assert second[:2] == first[:2]
+    assert usage["reused_chunks"] == 2
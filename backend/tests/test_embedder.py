@@ -1,10 +1,16 @@
 """Tests for embedder (mocking OpenAI API)."""
 
-from unittest.mock import patch
+import asyncio
+from unittest.mock import AsyncMock, patch
 
 import pytest
 
-from backend.app.ingestion.embedder import embed_chunks
+from backend.app.core.config import settings
+from backend.app.ingestion.embedder import (
+    embed_chunks,
+    get_embeddings,
+    split_batches,
+)
 
 
 @pytest.mark.asyncio
@@ -23,3 +29,75 @@ async def test_embed_chunks(mock_get_embeddings):
     assert "embedding" in embedded_chunks[0]
     assert embedded_chunks[0]["embedding"] == fake_emb[0]
     assert stats["tokens"] == 10
+
+
+def test_split_batches_respects_token_and_input_budgets():
+    """Batches stay under both limits; oversized inputs go alone."""
+    assert split_batches([3, 3, 3, 3], max_tokens=6, max_inputs=10) == [
+        (0, 2),
+        (2, 4),
+    ]
+    assert split_batches([1, 1, 1], max_tokens=100, max_inputs=2) == [
+        (0, 2),
+        (2, 3),
+    ]
+    assert split_batches([2, 50, 2], max_tokens=10, max_inputs=10) == [
+        (0, 1),
+        (1, 2),
+        (2, 3),
+    ]
+    assert split_batches([], max_tokens=10, max_inputs=10) == []
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.embedder._embed_batch")
+async def test_get_embeddings_keeps_input_order(mock_embed_batch):
+    """Concurrent batches are reassembled in input order."""
+
+    async def fake_batch(texts, max_retries):
+        return [[float(len(text))] for text in texts], len(texts)
+
+    mock_embed_batch.side_effect = fake_batch
+
+    with patch.object(settings, "EMBEDDING_BATCH_MAX_INPUTS", 2), patch.object(
+        settings, "OPENAI_EBD_MODEL", "text-embedding-3-large"
+    ):
+        embeddings, usage = await get_embeddings(
+            ["a", "bb", "ccc", "dddd", "eeeee"],
+            token_counts=[1, 1, 1, 1, 1],
+        )
+
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert usage["tokens"] == 5
+    assert usage["model"] == "text-embedding-3-large"
+    assert mock_embed_batch.call_count == 3
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.embedder.ge", new_callable=AsyncMock)
+@patch("backend.app.ingestion.embedder._embed_batch")
+async def test_failed_batch_cancels_the_others(mock_embed_batch, mock_hf):
+    """Once one batch fails, the batches still in flight are cancelled."""
+    cancelled = []
+
+    async def fake_batch(texts, max_retries):
+        if texts == ["a"]:
+            raise RuntimeError("quota exceeded")
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(texts)
+            raise
+
+    mock_embed_batch.side_effect = fake_batch
+    mock_hf.return_value = ([[0.0], [0.0], [0.0]], None, 3)
+
+    with patch.object(settings, "EMBEDDING_BATCH_MAX_INPUTS", 1):
+        embeddings, usage = await asyncio.wait_for(
+            get_embeddings(["a", "b", "c"], token_counts=[1, 1, 1]),
+            timeout=5,
+        )
+
+    assert sorted(cancelled) == [["b"], ["c"]]
+    assert usage["model"] == settings.HF_EBD_MODEL
+    assert len(embeddings) == 3
@@ -0,0 +1,60 @@
+"""Tests for the two-tier query embedding cache."""
+
+import pytest
+
+import backend.app.rag.embedding_cache as ec
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the binary Redis client."""
+
+    def __init__(self):
+        """Start with an empty store."""
+        self.store = {}
+
+    def get(self, key):
+        """Return stored bytes or None."""
+        return self.store.get(key)
+
+    def setex(self, key, ttl, value):
+        """Store bytes, ignoring the TTL."""
+        self.store[key] = value
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    """Give every test an empty memory tier, fake Redis and zeroed stats."""
+    fake = FakeRedis()
+    monkeypatch.setattr(ec, "redis_binary_client", fake)
+    monkeypatch.setattr(ec, "_stats", {"memory_hits": 0, "redis_hits": 0, "misses": 0})
+    ec._memory_cache.clear()
+    yield fake
+    ec._memory_cache.clear()
+
+
+def test_normalized_queries_share_an_entry():
+    """Case, whitespace and trailing punctuation must not split the cache."""
+    ec.set_cached_embedding("m", "What are your opening hours?", [0.5, 0.25])
+
+    assert ec.get_cached_embedding("m", "  what are your   OPENING hours ") == [
+        0.5,
+        0.25,
+    ]
+    assert ec.get_cached_embedding("other-model", "what are your opening hours") is None
+
+    stats = ec.get_embedding_cache_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_redis_tier_refills_memory(fresh_cache):
+    """A Redis hit must be promoted into the in-process tier."""
+    ec.set_cached_embedding("m", "refund policy", [1.0, 2.0])
+    ec._memory_cache.clear()
+
+    assert ec.get_cached_embedding("m", "refund policy") == [1.0, 2.0]
+    assert ec.get_cached_embedding("m", "refund policy") == [1.0, 2.0]
+
+    stats = ec.get_embedding_cache_stats()
+    assert stats["redis_hits"] == 1
+    assert stats["memory_hits"] == 1
@@ -0,0 +1,75 @@
+"""Tests for async LLM generation with provider fallback."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import backend.app.rag.generator as generator
+
+
+def _fake_response(text: str):
+    """Build an object shaped like a chat completion response."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20),
+    )
+
+
+@pytest.mark.asyncio
+async def test_generate_answer_falls_back_to_openai(monkeypatch):
+    """A Groq failure must fall through to the async OpenAI client."""
+
+    async def failing_groq(prompt, max_tokens):
+        raise RuntimeError("groq down")
+
+    async def fake_openai(prompt, max_tokens):
+        return _fake_response("from openai")
+
+    monkeypatch.setattr(generator, "_call_groq", failing_groq)
+    monkeypatch.setattr(generator, "_call_openai", fake_openai)
+
+    answer, usage = await generator.generate_answer("prompt", "groq")
+
+    assert answer == "from openai"
+    assert usage["model_used"] == generator.settings.OPENAI_MODEL
+    assert usage["input_tokens"] == 100
+    assert usage["cost_usd"] > 0
+
+
+@pytest.mark.asyncio
+async def test_llm_clients_reopen_after_close():
+    """Closing the pool at shutdown must not break a later startup."""
+    groq_client, _ = generator.get_llm_clients()
+    await generator.close_llm_clients()
+
+    reopened, openai_client = generator.get_llm_clients()
+
+    assert reopened is not groq_client
+    assert not openai_client._client.is_closed
+    await generator.close_llm_clients()
+
+
+@pytest.mark.asyncio
+async def test_stream_closed_early_still_records_usage(monkeypatch):
+    """Stopping a stream mid-answer must bill the tokens generated so far."""
+
+    async def chunks():
+        for text in ("Hello", " there", " friend"):
+            delta = SimpleNamespace(content=text)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+    async def create(**kwargs):
+        return chunks()
+
+    completions = SimpleNamespace(create=create)
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(generator, "get_llm_clients", lambda: (fake, fake))
+
+    usage_stats = {"prompt_tokens": 50}
+    stream = generator.stream_answer("prompt", usage_stats, model_preference="openai")
+    assert await stream.__anext__() == "Hello"
+    await stream.aclose()
+
+    assert usage_stats["model_used"] == generator.settings.OPENAI_MODEL
+    assert usage_stats["input_tokens"] == 50
+    assert usage_stats["output_tokens"] == generator.count_tokens("Hello")
@@ -0,0 +1,58 @@
+"""Tests for the bounded tenant index cache."""
+
+from backend.app.core.index_cache import IndexCache
+
+
+def test_evicts_least_recently_used_by_count():
+    """Exceeding max_entries must evict the coldest tenant."""
+    cache = IndexCache(max_entries=2, max_bytes=1_000, sizeof=len)
+
+    cache.put("a", "x")
+    cache.put("b", "x")
+    cache.get("a")
+    cache.put("c", "x")
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_by_byte_size_and_counts_hits():
+    """Exceeding max_bytes must evict until the budget holds again."""
+    cache = IndexCache(max_entries=10, max_bytes=10, sizeof=len)
+
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxx")
+
+    assert cache.get("a") is None
+    assert cache.get("c") == "xxxx"
+
+    stats = cache.stats()
+    assert stats["bytes"] == 8
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_oversized_entry_is_kept():
+    """A single entry larger than the budget must still be cached."""
+    cache = IndexCache(max_entries=10, max_bytes=2, sizeof=len)
+
+    cache.put("big", "xxxxxx")
+
+    assert cache.get("big") == "xxxxxx"
+
+
+def test_drop_all_keeps_counters():
+    """Dropping the entries must not reset the hit and miss counters."""
+    cache = IndexCache(max_entries=10, max_bytes=100, sizeof=len)
+    cache.put("a", "x")
+    cache.get("a")
+    cache.get("b")
+
+    cache.drop_all()
+
+    stats = cache.stats()
+    assert "a" not in cache
+    assert stats["bytes"] == 0
+    assert (stats["hits"], stats["misses"]) == (1, 1)
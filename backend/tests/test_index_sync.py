@@ -0,0 +1,156 @@
+"""Tests for cross-process index coordination."""
+
+import json
+import time
+
+import pytest
+
+import backend.app.core.index_sync as sync
+
+
+class FakeLock:
+    """Redis lock stand-in that records its use."""
+
+    def __init__(self, owner, name, acquirable):
+        """Create a lock named ``name`` owned by ``owner``."""
+        self.owner = owner
+        self.name = name
+        self.acquirable = acquirable
+
+    def acquire(self):
+        """Take the lock if it is acquirable."""
+        if self.acquirable:
+            self.owner.held.append(self.name)
+        return self.acquirable
+
+    def release(self):
+        """Release the lock."""
+        self.owner.held.remove(self.name)
+
+    def extend(self, additional_time, replace_ttl=False):
+        """Count a TTL extension."""
+        self.owner.extended += 1
+        return True
+
+    def owned(self):
+        """Whether the lock is still held."""
+        return self.name in self.owner.held
+
+
+class FakePipeline:
+    """Buffers commands like a Redis pipeline."""
+
+    def __init__(self, owner):
+        """Start an empty pipeline for ``owner``."""
+        self.owner = owner
+        self.commands = []
+
+    def set(self, key, value):
+        """Queue setting a key."""
+        self.commands.append(lambda: self.owner.values.__setitem__(key, str(value)))
+
+    def publish(self, channel, message):
+        """Queue publishing a message."""
+        self.commands.append(lambda: self.owner.published.append((channel, message)))
+
+    def execute(self):
+        """Run the queued commands."""
+        for command in self.commands:
+            command()
+
+
+class FakeRedis:
+    """Minimal Redis client for the coordination helpers."""
+
+    def __init__(self, acquirable=True):
+        """Create an empty fake server."""
+        self.values = {}
+        self.published = []
+        self.held = []
+        self.extended = 0
+        self.acquirable = acquirable
+
+    def lock(self, name, timeout=None, blocking_timeout=None):
+        """Return a lock on ``name``."""
+        return FakeLock(self, name, self.acquirable)
+
+    def get(self, key):
+        """Return a stored value."""
+        return self.values.get(key)
+
+    def pipeline(self):
+        """Return a new pipeline."""
+        return FakePipeline(self)
+
+
+def test_publish_version_sets_key_and_notifies(monkeypatch):
+    """Publishing must store the version and announce it on the channel."""
+    fake = FakeRedis()
+    monkeypatch.setattr(sync, "redis_client", fake)
+
+    sync.publish_version("c1", 7)
+
+    assert sync.get_version("c1") == 7
+    channel, message = fake.published[0]
+    assert channel == sync.INVALIDATION_CHANNEL
+    assert json.loads(message) == {"client_id": "c1", "version": 7}
+
+
+def test_write_lock_is_held_for_the_block(monkeypatch):
+    """The distributed lock must be held inside the block and released after."""
+    fake = FakeRedis()
+    monkeypatch.setattr(sync, "redis_client", fake)
+
+    with sync.tenant_write_lock("c1"):
+        assert fake.held == ["faiss:lock:c1"]
+
+    assert fake.held == []
+
+
+def test_write_lock_times_out(monkeypatch):
+    """A lock held elsewhere for too long must raise instead of writing."""
+    monkeypatch.setattr(sync, "redis_client", FakeRedis(acquirable=False))
+
+    with pytest.raises(TimeoutError):
+        with sync.tenant_write_lock("c1"):
+            pass
+
+
+def test_without_redis_falls_back_to_local_lock(monkeypatch):
+    """With Redis unavailable, writes still proceed and versions are unknown."""
+    monkeypatch.setattr(sync, "redis_client", None)
+
+    with sync.tenant_write_lock("c1"):
+        pass
+
+    assert sync.get_version("c1") is None
+
+
+def test_write_lock_is_extended_while_held(monkeypatch):
+    """A long write must keep renewing the lock's TTL."""
+    fake = FakeRedis()
+    monkeypatch.setattr(sync, "redis_client", fake)
+    monkeypatch.setattr(sync.settings, "FAISS_WRITE_LOCK_TIMEOUT_SECONDS", 0.03)
+
+    with sync.tenant_write_lock("c1"):
+        time.sleep(0.1)
+
+    assert fake.extended >= 2
+
+
+def test_check_write_lock_rejects_lost_lock_and_stale_version(monkeypatch):
+    """Publishing must abort once the lock or the version moved on."""
+    fake = FakeRedis()
+    monkeypatch.setattr(sync, "redis_client", fake)
+
+    with sync.tenant_write_lock("c1"):
+        sync.check_write_lock("c1", 1)
+
+        fake.values["faiss:version:c1"] = "1"
+        with pytest.raises(RuntimeError):
+            sync.check_write_lock("c1", 1)
+
+        fake.held.remove("faiss:lock:c1")
+        with pytest.raises(RuntimeError):
+            sync.check_write_lock("c1", 2)
+        fake.held.append("faiss:lock:c1")
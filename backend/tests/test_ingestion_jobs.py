@@ -0,0 +1,173 @@
+"""Tests for background ingestion jobs."""
+
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from backend.app.core.config import settings
+from backend.app.ingestion.jobs import (
+    STATUS_FAILED,
+    STATUS_PROCESSING,
+    STATUS_READY,
+    run_job,
+)
+from backend.app.models.documents import Document
+
+
+def _processing_document(db):
+    """Insert a document awaiting ingestion."""
+    document = Document(
+        id=uuid.uuid4(),
+        client_id=uuid.uuid4(),
+        filename="faq.txt",
+        source_type="text",
+        file_size_bytes=32,
+        chunk_count=0,
+        status=STATUS_PROCESSING,
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+def _file_job(document):
+    return {
+        "kind": "file",
+        "document_id": str(document.id),
+        "client_id": str(document.client_id),
+        "filename": document.filename,
+        "s3_key": "uploads/x/faq.txt",
+    }
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.jobs.get_extract_pool", return_value=None)
+@patch("backend.app.ingestion.jobs.embed_and_index", new_callable=AsyncMock)
+async def test_run_job_marks_document_ready(mock_index, _pool, db, tmp_path):
+    """A successful job indexes the chunks and marks the document ready."""
+    document = _processing_document(db)
+    upload = tmp_path / "faq.txt"
+    upload.write_bytes(b"Refunds are processed within five days.")
+
+    await run_job(_file_job(document), db, path=str(upload))
+
+    db.refresh(document)
+    assert document.status == STATUS_READY
+    assert document.chunk_count == 1
+    assert mock_index.await_args.kwargs["document_id"] == str(document.id)
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.jobs.get_extract_pool", return_value=None)
+@patch("backend.app.ingestion.jobs.delete_document")
+@patch("backend.app.ingestion.jobs.embed_and_index", new_callable=AsyncMock)
+async def test_run_job_records_failure(mock_index, mock_delete, _pool, db, tmp_path):
+    """A failing job marks the document failed and drops partial vectors."""
+    mock_index.side_effect = RuntimeError("embedding down")
+    document = _processing_document(db)
+    upload = tmp_path / "faq.txt"
+    upload.write_bytes(b"Some text.")
+
+    await run_job(_file_job(document), db, path=str(upload))
+
+    db.refresh(document)
+    assert document.status == STATUS_FAILED
+    assert "embedding down" in document.error
+    mock_delete.assert_called_once_with(str(document.client_id), str(document.id))
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.jobs.get_extract_pool", return_value=None)
+@patch("backend.app.ingestion.jobs.embed_and_index", new_callable=AsyncMock)
+async def test_run_job_indexes_in_batches(mock_index, _pool, db, tmp_path):
+    """Long documents are indexed in rolling batches with global offsets."""
+    document = _processing_document(db)
+    upload = tmp_path / "faq.txt"
+    upload.write_text(" ".join(f"word{i}" for i in range(2000)))
+
+    with patch.object(settings, "INGEST_INDEX_BATCH_CHUNKS", 2):
+        await run_job(_file_job(document), db, path=str(upload))
+
+    db.refresh(document)
+    offsets = [call.kwargs["chunk_offset"] for call in mock_index.await_args_list]
+    sizes = [len(call.kwargs["chunks"]) for call in mock_index.await_args_list]
+    replaces = [call.kwargs["replace"] for call in mock_index.await_args_list]
+    assert offsets == [sum(sizes[:i]) for i in range(len(sizes))]
+    assert replaces == [True] + [False] * (len(sizes) - 1)
+    assert max(sizes) == 2
+    assert document.chunk_count == sum(sizes) > 2
+
+
+def _url_job(document):
+    return {
+        "kind": "url",
+        "document_id": str(document.id),
+        "client_id": str(document.client_id),
+        "url": "https://example.com/faq",
+    }
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.jobs.get_extract_pool", return_value=None)
+@patch("backend.app.ingestion.jobs.extract_url_text")
+@patch("backend.app.ingestion.jobs.embed_and_index", new_callable=AsyncMock)
+async def test_url_job_skips_unchanged_content(mock_index, mock_fetch, _pool, db):
+    """Re-fetching an unchanged page keeps the existing vectors."""
+    mock_fetch.return_value = ("Refunds take five days.", "FAQ")
+    document = _processing_document(db)
+
+    await run_job(_url_job(document), db)
+    db.refresh(document)
+    content_hash = document.content_hash
+
+    document.status = STATUS_PROCESSING
+    db.commit()
+    await run_job(_url_job(document), db)
+
+    db.refresh(document)
+    assert content_hash
+    assert mock_index.await_count == 1
+    assert document.status == STATUS_READY
+    assert document.content_hash == content_hash
+    assert document.chunk_count == 1
+
+
+@pytest.mark.asyncio
+@patch("backend.app.ingestion.jobs.get_extract_pool", return_value=None)
+@patch("backend.app.ingestion.jobs.delete_document")
+@patch("backend.app.ingestion.jobs.extract_url_text")
+@patch("backend.app.ingestion.jobs.embed_and_index", new_callable=AsyncMock)
+async def test_url_job_rejects_duplicate_content(
+    mock_index,
+    mock_fetch,
+    _delete,
+    _pool,
+    db,
+):
+    """A page identical to another of the tenant's documents is not indexed."""
+    mock_fetch.return_value = ("Refunds take five days.", "FAQ")
+    original = _processing_document(db)
+    await run_job(_url_job(original), db)
+
+    copy = _processing_document(db)
+    copy.client_id = original.client_id
+    db.commit()
+    await run_job(_url_job(copy), db)
+
+    db.refresh(copy)
+    assert mock_index.await_count == 1
+    assert copy.status == STATUS_FAILED
+    assert str(original.id) in copy.error
+
+
+def test_document_status_requires_auth(client):
+    """The status endpoint requires authentication."""
+    response = client.get(f"/upload/{uuid.uuid4()}")
+    assert response.status_code in (401, 403)
+
+
+def test_document_delete_requires_auth(client):
+    """The delete endpoint requires authentication."""
+    response = client.delete(f"/upload/{uuid.uuid4()}")
+    assert response.status_code in (401, 403)
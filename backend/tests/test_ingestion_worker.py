@@ -0,0 +1,94 @@
+"""Tests for the reliable ingestion worker queue."""
+
+import asyncio
+import fnmatch
+import json
+
+import pytest
+
+import backend.app.ingestion.worker as worker
+
+
+class FakeRedis:
+    """Minimal Redis client with list and key operations."""
+
+    def __init__(self):
+        """Create an empty fake server."""
+        self.lists = {}
+        self.keys = set()
+
+    def set(self, key, value, ex=None):
+        """Store a key."""
+        self.keys.add(key)
+
+    def exists(self, key):
+        """Whether a key is stored."""
+        return int(key in self.keys)
+
+    def scan_iter(self, match):
+        """Iterate over list keys matching a glob pattern."""
+        return [key for key in list(self.lists) if fnmatch.fnmatch(key, match)]
+
+    def lmove(self, source, destination, src, dest):
+        """Move one element between lists."""
+        items = self.lists.get(source)
+        if not items:
+            return None
+        value = items.pop(0 if src == "LEFT" else -1)
+        target = self.lists.setdefault(destination, [])
+        target.insert(0 if dest == "LEFT" else len(target), value)
+        return value
+
+    def blmove(self, source, destination, timeout, src, dest):
+        """Move one element between lists, without blocking."""
+        return self.lmove(source, destination, src, dest)
+
+    def lrem(self, key, count, value):
+        """Remove an element from a list."""
+        self.lists[key].remove(value)
+        return 1
+
+
+def test_requeue_returns_only_dead_workers_jobs(monkeypatch):
+    """Jobs held by a worker without a heartbeat go back to the queue head."""
+    fake = FakeRedis()
+    fake.lists = {
+        worker.INGEST_QUEUE: ["queued"],
+        f"{worker.PROCESSING_PREFIX}dead-1:0": ["lost"],
+        f"{worker.PROCESSING_PREFIX}live-2:0": ["running"],
+    }
+    fake.keys.add(f"{worker.HEARTBEAT_PREFIX}live-2")
+    monkeypatch.setattr(worker, "redis_client", fake)
+
+    assert worker.requeue_orphaned_jobs() == 1
+
+    assert fake.lists[worker.INGEST_QUEUE] == ["lost", "queued"]
+    assert fake.lists[f"{worker.PROCESSING_PREFIX}live-2:0"] == ["running"]
+
+
+@pytest.mark.asyncio
+async def test_job_stays_on_processing_list_until_done(monkeypatch):
+    """A job must be held while it runs and acknowledged once it finishes."""
+    fake = FakeRedis()
+    payload = json.dumps({"document_id": "d1"})
+    fake.lists[worker.INGEST_QUEUE] = [payload]
+    processing = worker._processing_list(0)
+    held = []
+    done = asyncio.Event()
+
+    async def fake_run(job):
+        held.append(list(fake.lists[processing]))
+        done.set()
+
+    monkeypatch.setattr(worker, "redis_client", fake)
+    monkeypatch.setattr(worker, "run_job_in_process", fake_run)
+    monkeypatch.setattr(worker, "_POLL_TIMEOUT_SECONDS", 0)
+
+    consumer = asyncio.create_task(worker._consume(0))
+    await asyncio.wait_for(done.wait(), timeout=5)
+    while fake.lists[processing]:
+        await asyncio.sleep(0.01)
+    consumer.cancel()
+
+    assert held == [[payload]]
+    assert fake.lists[worker.INGEST_QUEUE] == []
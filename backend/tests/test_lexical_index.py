@@ -0,0 +1,73 @@
+"""Tests for the BM25 inverted index of FAISS segments."""
+
+import numpy as np
+
+from backend.app.core.lexical_index import (
+    LexicalIndex,
+    build_postings,
+    merge_postings,
+    term_hashes,
+    tokenize,
+    write_lexical_index,
+)
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    """Compound identifiers must match whole and by their pieces."""
+    assert tokenize("Order ORD-1042 failed: ERR_CONN") == [
+        "order",
+        "ord-1042",
+        "ord",
+        "1042",
+        "failed",
+        "err_conn",
+        "err",
+        "conn",
+    ]
+
+
+def test_score_ranks_rare_terms_first(tmp_path):
+    """Rows matching rarer query terms must score higher."""
+    texts = [
+        "refund policy for orders",
+        "order ORD-1042 was refunded",
+        "shipping policy for orders",
+    ]
+    path = str(tmp_path / "seg.bm25")
+    write_lexical_index(path, build_postings(texts))
+    index = LexicalIndex(path)
+
+    terms = term_hashes(["ord-1042", "policy"])
+    df = index.doc_freqs(terms)
+    idf = np.log1p((index.n_docs - df + 0.5) / (df + 0.5))
+    rows, scores, matched = index.score(terms, idf, index.total_len / 3, 1.2, 0.75)
+
+    assert df.tolist() == [1, 2]
+    assert rows[np.argmax(scores)] == 1
+    assert sorted(rows.tolist()) == [0, 1, 2]
+    assert np.isclose(matched.max(), idf[0])
+
+
+def test_merge_postings_drops_and_renumbers_rows(tmp_path):
+    """Merged postings must skip removed rows and keep the rest in order."""
+    first = build_postings(["alpha beta", "gamma"])
+    second = build_postings(["beta delta"])
+    merged = merge_postings(
+        [
+            (first, np.array([False, True])),
+            (second, np.array([True])),
+        ]
+    )
+
+    path = str(tmp_path / "merged.bm25")
+    write_lexical_index(path, merged)
+    index = LexicalIndex(path)
+
+    assert index.n_docs == 2
+    assert index.doc_freqs(term_hashes(["alpha", "beta", "gamma"])).tolist() == [
+        0,
+        1,
+        1,
+    ]
+    rows, _, _ = index.score(term_hashes(["delta"]), np.ones(1), 1.5, 1.2, 0.75)
+    assert rows.tolist() == [1]
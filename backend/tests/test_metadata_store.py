@@ -0,0 +1,44 @@
+"""Tests for the columnar segment metadata store."""
+
+from backend.app.core.metadata_store import MetadataStore, write_metadata
+
+
+def test_round_trip_preserves_rows(tmp_path):
+    """Rows read back must equal the rows written, column by column."""
+    rows = [
+        {
+            "text": "Reset your password using the email link.",
+            "metadata": {"filename": "faq.pdf", "token_count": 9},
+            "document_id": "doc-1",
+            "chunk_index": 0,
+        },
+        {
+            "text": "Opening hours are 9–5 ✓",
+            "metadata": {"filename": "faq.pdf"},
+            "document_id": "doc-1",
+            "chunk_index": 1,
+        },
+        {"id": 3},
+    ]
+    path = tmp_path / "seg.meta"
+
+    write_metadata(str(path), rows)
+    store = MetadataStore(str(path))
+
+    assert len(store) == 3
+    assert list(store) == rows
+    assert store.document_id(1) == "doc-1"
+    assert store.document_id(2) is None
+
+
+def test_rows_are_independent_copies(tmp_path):
+    """Mutating a returned row must not affect later lookups."""
+    path = tmp_path / "seg.meta"
+    write_metadata(str(path), [{"text": "hello", "metadata": {"filename": "a"}}])
+    store = MetadataStore(str(path))
+
+    row = store[0]
+    row["score"] = 1.0
+    row["metadata"]["filename"] = "changed"
+
+    assert store[0] == {"text": "hello", "metadata": {"filename": "a"}}
@@ -1,14 +1,19 @@
 """Tests for PDF text extraction utility."""
 
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from backend.app.ingestion.pdf_reader import extract_pdf_text
+from backend.app.ingestion.pdf_reader import (
+    extract_pdf_text,
+    is_usable_text,
+    iter_pdf_pages,
+)
 
 
 def test_extract_pdf_text_pypdf2_success():
-    """Test extraction when PyPDF2 works correctly."""
+    """Test extraction when pypdf works correctly."""
     mock_page = MagicMock()
     mock_page.extract_text.return_value = "Hello from PDF!"
 
@@ -22,7 +27,7 @@ def test_extract_pdf_text_pypdf2_success():
 
 
 def test_extract_pdf_text_pdfminer_fallback():
-    """Test fallback to pdfminer when PyPDF2 returns insufficient text."""
+    """Test fallback to pdfminer when pypdf returns insufficient text."""
     mock_reader = MagicMock()
     mock_reader.pages = [MagicMock(extract_text=lambda: "")]
 
@@ -37,10 +42,10 @@ def test_extract_pdf_text_pdfminer_fallback():
 
 
 def test_extract_pdf_text_failure():
-    """Test extraction failure when both PyPDF2 and pdfminer fail."""
+    """Test extraction failure when both pypdf and pdfminer fail."""
     with patch(
         "backend.app.ingestion.pdf_reader.PdfReader",
-        side_effect=Exception("PyPDF2 broken"),
+        side_effect=Exception("pypdf broken"),
     ):
         with patch(
             "backend.app.ingestion.pdf_reader.pdfminer_extract",
@@ -49,3 +54,51 @@ def test_extract_pdf_text_failure():
             err = pytest.raises(Exception, extract_pdf_text, b"fake pdf")
 
     assert "Failed to extract text from PDF" in str(err.value)
+
+
+def test_iter_pdf_pages_falls_back_per_page():
+    """Only pages with unusable pypdf text are re-extracted with pdfminer."""
+    mock_reader = MagicMock()
+    mock_reader.pages = [
+        MagicMock(extract_text=lambda: "Page one"),
+        MagicMock(extract_text=lambda: "%$#@ !*&^"),
+        MagicMock(extract_text=lambda: "Page three"),
+    ]
+
+    with patch("backend.app.ingestion.pdf_reader.PdfReader", return_value=mock_reader):
+        with patch(
+            "backend.app.ingestion.pdf_reader.pdfminer_extract",
+            return_value="Page two",
+        ) as mock_pdfminer:
+            pages = list(iter_pdf_pages("manual.pdf", pages_per_shard=2))
+
+    assert pages == ["Page one", "Page two", "Page three"]
+    mock_pdfminer.assert_called_once_with("manual.pdf", page_numbers=[1])
+
+
+def test_iter_pdf_pages_executor_keeps_order():
+    """Shards run on an executor are reassembled in page order."""
+    mock_reader = MagicMock()
+    page_texts = [f"Page {i}" for i in range(7)]
+    mock_reader.pages = [MagicMock(extract_text=lambda t=t: t) for t in page_texts]
+
+    with patch("backend.app.ingestion.pdf_reader.PdfReader", return_value=mock_reader):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            pages = list(
+                iter_pdf_pages(
+                    "manual.pdf",
+                    executor=executor,
+                    max_in_flight=2,
+                    pages_per_shard=2,
+                )
+            )
+
+    assert pages == page_texts
+
+
+def test_is_usable_text():
+    """The quality heuristic rejects empty, symbol-heavy and run-together text."""
+    assert is_usable_text("Refunds are processed within five days.")
+    assert not is_usable_text("   ")
+    assert not is_usable_text("%$#@ !*&^ ~~")
+    assert not is_usable_text("Thisisaverylongrunofwordswithoutanyspacesatall")
@@ -1,8 +1,19 @@
-"""Test query endpoint authentication and validation."""
+"""Test query endpoint authentication, validation and streaming."""
 
+import json
+import uuid
+
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
 
+from backend.app.core.auth import get_current_client
 from backend.app.main import app
+from backend.app.models.chat_logs import ChatLog
+from backend.app.models.client import Client
+from backend.app.models.usage import UsageLog
+from backend.app.routes import query as query_route
+from backend.app.schemas.query import QueryRequest
 
 client = TestClient(app)
 
@@ -39,3 +50,137 @@ def test_query_invalid_token():
     assert (
         response.status_code == 401
     ), f"Expected 401 for invalid token, got {response.status_code}"
+
+
+def test_query_stream_unauthorized():
+    """Test that the streaming endpoint also rejects unauthenticated calls."""
+    response = client.post("/query/stream", json={"query": "Test question"})
+    assert response.status_code in (
+        401,
+        403,
+    ), f"Expected 401/403, got {response.status_code}"
+
+
+@pytest.fixture
+def streaming_client(db, monkeypatch):
+    """An authenticated client whose streamed queries log to the test DB."""
+
+    async def no_rate_limit(client_id, limit_per_minute=15):
+        return True
+
+    owner = Client(
+        id=uuid.uuid4(),
+        email=f"stream-{uuid.uuid4().hex[:8]}@test.com",
+        hashed_password="x",
+        company_name="Stream Test",
+    )
+    db.add(owner)
+    db.commit()
+
+    monkeypatch.setattr(query_route, "check_rate_limit", no_rate_limit)
+    monkeypatch.setattr(query_route, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    app.dependency_overrides[get_current_client] = lambda: owner
+    return owner
+
+
+def _usage(**overrides):
+    """Usage stats shaped like the pipeline's."""
+    usage = {
+        "model_used": "fake-model",
+        "input_tokens": 120,
+        "output_tokens": 2,
+        "cost_usd": 0.001,
+        "prompt_tokens": 100,
+        "context_tokens_saved": 0,
+    }
+    usage.update(overrides)
+    return usage
+
+
+def _parse_sse(body: str):
+    """Split a server-sent event stream into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def test_query_stream_sends_events_in_order_and_logs(
+    streaming_client,
+    db,
+    monkeypatch,
+):
+    """The stream must frame citations, tokens and done, then log the query."""
+    citation = {"filename": "faq.txt", "chunk_index": 0}
+
+    async def fake_pipeline(client_id, query, plan_type, filters, usage_stats):
+        usage_stats.update(_usage())
+        citations = {"citations": [citation], "confidence": 0.8}
+        yield {"event": "citations", "data": citations}
+        yield {"event": "token", "data": "Hello"}
+        yield {"event": "token", "data": " there"}
+        yield {
+            "event": "done",
+            "data": {
+                "answer": "Hello there",
+                "citations": [citation],
+                "confidence": 0.8,
+                "latency_ms": 12,
+                "cache_hit": False,
+                "usage_stats": usage_stats,
+            },
+        }
+
+    monkeypatch.setattr(query_route, "stream_rag_pipeline", fake_pipeline)
+
+    response = client.post("/query/stream", json={"query": "Hi?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _parse_sse(response.text) == [
+        ("citations", {"citations": [citation], "confidence": 0.8}),
+        ("token", "Hello"),
+        ("token", " there"),
+        ("done", {"confidence": 0.8, "latency_ms": 12}),
+    ]
+
+    chat = db.query(ChatLog).filter(ChatLog.client_id == streaming_client.id).one()
+    assert chat.response_text == "Hello there"
+    usage = db.query(UsageLog).filter(UsageLog.client_id == streaming_client.id).one()
+    assert (usage.input_tokens, usage.output_tokens) == (120, 2)
+
+
+@pytest.mark.asyncio
+async def test_query_stream_logs_partial_answer_on_disconnect(
+    streaming_client,
+    db,
+    monkeypatch,
+):
+    """A client leaving mid-stream must still be billed for the tokens spent."""
+
+    async def fake_pipeline(client_id, query, plan_type, filters, usage_stats):
+        usage_stats.update(_usage(output_tokens=0))
+        yield {"event": "citations", "data": {"citations": [], "confidence": 0.5}}
+        try:
+            yield {"event": "token", "data": "Partial"}
+            yield {"event": "token", "data": " answer"}
+        finally:
+            # What the generator records when its stream is closed early.
+            usage_stats["output_tokens"] = 1
+
+    monkeypatch.setattr(query_route, "stream_rag_pipeline", fake_pipeline)
+
+    response = await query_route.stream_query_support_bot(
+        QueryRequest(query="Hi?"),
+        client=streaming_client,
+    )
+    body = response.body_iterator
+    await body.__anext__()
+    await body.__anext__()
+    await body.aclose()
+
+    chat = db.query(ChatLog).filter(ChatLog.client_id == streaming_client.id).one()
+    assert chat.response_text == "Partial"
+    usage = db.query(UsageLog).filter(UsageLog.client_id == streaming_client.id).one()
+    assert (usage.input_tokens, usage.output_tokens) == (120, 1)
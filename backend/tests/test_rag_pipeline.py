@@ -2,7 +2,8 @@
 
 import pytest
 
-from backend.app.rag.pipeline import run_rag_pipeline
+from backend.app.ingestion.chunker import count_tokens
+from backend.app.rag.pipeline import run_rag_pipeline, stream_rag_pipeline
 
 
 @pytest.mark.asyncio
@@ -130,3 +131,228 @@ async def test_pipeline_empty_query() -> None:
 
     assert result["confidence"] == 0.0
     assert "valid question" in result["answer"].lower()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_semantic_cache_hit(monkeypatch) -> None:
+    """A repeat query on an unchanged index must skip retrieval and the LLM."""
+    calls = {"retrieve": 0, "generate": 0}
+    version = {"value": 1}
+
+    async def fake_embed(query):
+        return [1.0, 0.0, 0.0]
+
+    async def fake_retrieve(*args, **kwargs):
+        calls["retrieve"] += 1
+        return [
+            {
+                "text": "We open at 9am.",
+                "metadata": {"filename": "hours.md", "chunk_index": 0},
+                "score": 0.9,
+            }
+        ]
+
+    async def fake_generate(prompt, model_preference):
+        calls["generate"] += 1
+        return (
+            "We open at 9am.",
+            {
+                "model_used": "fake",
+                "input_tokens": 10,
+                "output_tokens": 5,
+                "cost_usd": 0.001,
+            },
+        )
+
+    monkeypatch.setattr("backend.app.rag.pipeline.embed_query", fake_embed)
+    monkeypatch.setattr(
+        "backend.app.rag.pipeline.get_index_version",
+        lambda client_id: version["value"],
+    )
+    monkeypatch.setattr(
+        "backend.app.rag.pipeline.retrieve_relevant_chunks",
+        fake_retrieve,
+    )
+    monkeypatch.setattr(
+        "backend.app.rag.pipeline.generate_answer",
+        fake_generate,
+    )
+
+    first = await run_rag_pipeline(client_id="cache-client", query="Opening hours?")
+    second = await run_rag_pipeline(client_id="cache-client", query="Hours?")
+
+    assert first["cache_hit"] is False
+    assert second["cache_hit"] is True
+    assert second["answer"] == "We open at 9am."
+    assert second["usage_stats"]["cost_usd"] == 0.0
+    assert calls == {"retrieve": 1, "generate": 1}
+
+    version["value"] = 2
+    third = await run_rag_pipeline(client_id="cache-client", query="Hours?")
+
+    assert third["cache_hit"] is False
+    assert calls == {"retrieve": 2, "generate": 2}
+
+
+@pytest.mark.asyncio
+async def test_stream_pipeline_emits_citations_then_tokens(monkeypatch) -> None:
+    """Streaming must send citations first, then tokens, then the result."""
+
+    async def fake_embed(query):
+        raise RuntimeError("embedding offline")
+
+    async def fake_retrieve(*args, **kwargs):
+        return [
+            {
+                "text": "FastAPI is a framework.",
+                "metadata": {"filename": "docs.pdf", "chunk_index": 2},
+                "score": 0.8,
+            }
+        ]
+
+    async def fake_stream(prompt, usage_stats, model_preference):
+        for delta in ["Fast", "API"]:
+            yield delta
+        usage_stats.update(model_used="fake", input_tokens=7, output_tokens=2)
+
+    monkeypatch.setattr("backend.app.rag.pipeline.embed_query", fake_embed)
+    monkeypatch.setattr(
+        "backend.app.rag.pipeline.retrieve_relevant_chunks",
+        fake_retrieve,
+    )
+    monkeypatch.setattr("backend.app.rag.pipeline.stream_answer", fake_stream)
+
+    events = [
+        event
+        async for event in stream_rag_pipeline(
+            client_id="test-client",
+            query="What is FastAPI?",
+        )
+    ]
+
+    assert [e["event"] for e in events] == ["citations", "token", "token", "done"]
+    assert events[0]["data"]["citations"][0]["chunk_index"] == 2
+    assert events[-1]["data"]["answer"] == "FastAPI"
+    assert events[-1]["data"]["usage_stats"]["input_tokens"] == 7
+
+
+@pytest.mark.asyncio
+async def test_pipeline_reranks_overfetched_chunks(monkeypatch) -> None:
+    """With reranking on, retrieval must over-fetch and keep the best top_k."""
+    requested = {}
+
+    async def fake_embed(query):
+        raise RuntimeError("embedding offline")
+
+    async def fake_retrieve(*args, **kwargs):
+        requested["top_k"] = kwargs["top_k"]
+        return [
+            {"text": f"chunk {i}", "metadata": {"chunk_index": i}, "score": 0.5}
+            for i in range(kwargs["top_k"])
+        ]
+
+    async def fake_rerank(query, chunks, top_k):
+        return list(reversed(chunks))[:top_k]
+
+    async def fake_generate(prompt, model_preference):
+        return "ok", {"model_used": "fake", "input_tokens": 1, "output_tokens": 1}
+
+    monkeypatch.setattr("backend.app.rag.pipeline.settings.RERANK_ENABLED", True)
+    monkeypatch.setattr("backend.app.rag.pipeline.settings.RERANK_CANDIDATES", 20)
+    monkeypatch.setattr("backend.app.rag.pipeline.embed_query", fake_embed)
+    monkeypatch.setattr(
+        "backend.app.rag.pipeline.retrieve_relevant_chunks",
+        fake_retrieve,
+    )
+    monkeypatch.setattr("backend.app.rag.pipeline.rerank", fake_rerank)
+    monkeypatch.setattr("backend.app.rag.pipeline.generate_answer", fake_generate)
+
+    result = await run_rag_pipeline(client_id="test-client", query="Refunds?", top_k=3)
+
+    assert requested["top_k"] == 20
+    assert [c["chunk_index"] for c in result["citations"]] == [19, 18, 17]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_diversifies_and_reports_tokens_saved(monkeypatch) -> None:
+    """MMR must over-fetch, and merged overlaps must show up in usage stats."""
+    requested = {}
+    text = " ".join(f"word{i}" for i in range(300))
+    base = {"filename": "a.txt"}
+    chunks = [
+        {"text": text[:600], "metadata": {**base, "start_char": 0, "end_char": 600}},
+        {"text": "near copy", "metadata": {"filename": "b.txt"}},
+        {
+            "text": text[400:900],
+            "metadata": {**base, "start_char": 400, "end_char": 900},
+        },
+    ]
+
+    async def fake_embed(query):
+        return [1.0, 0.3]
+
+    async def fake_retrieve(*args, **kwargs):
+        requested["top_k"] = kwargs["top_k"]
+        return [{**chunk, "score": 0.5} for chunk in chunks]
+
+    async def fake_generate(prompt, model_preference):
+        return "ok", {"model_used": "fake", "input_tokens": 1, "output_tokens": 1}
+
+    monkeypatch.setattr("backend.app.rag.pipeline.settings.MMR_CANDIDATES", 20)
+    monkeypatch.setattr("backend.app.rag.pipeline.embed_query", fake_embed)
+    monkeypatch.setattr("backend.app.rag.pipeline.get_index_version", lambda c: None)
+    monkeypatch.setattr(
+        "backend.app.rag.pipeline.retrieve_relevant_chunks",
+        fake_retrieve,
+    )
+    monkeypatch.setattr(
+        "backend.app.rag.context.get_chunk_vectors",
+        lambda client_id, chunks: [[1.0, 0.04], [1.0, 0.0], [0.6, 0.8]],
+    )
+    monkeypatch.setattr("backend.app.rag.pipeline.generate_answer", fake_generate)
+
+    result = await run_rag_pipeline(client_id="test-client", query="Words?", top_k=2)
+
+    assert requested["top_k"] == 20
+    assert [c["document"] for c in result["citations"]] == ["a.txt"]
+    assert result["usage_stats"]["context_tokens_saved"] > 0
+
+
+@pytest.mark.asyncio
+async def test_pipeline_bounds_prompt_to_plan_budget(monkeypatch) -> None:
+    """The prompt must fit the plan's budget and its size be reported."""
+    seen = {}
+    text = " ".join(f"Policy sentence {i} covers refunds." for i in range(400))
+
+    async def fake_retrieve(*args, **kwargs):
+        chunk = {"text": text, "score": 0.9}
+        return [{**chunk, "metadata": {"filename": f"{i}.txt"}} for i in range(5)]
+
+    async def fake_generate(prompt, model_preference):
+        seen["prompt"] = prompt
+        return "ok", {"model_used": "fake", "input_tokens": 0, "output_tokens": 1}
+
+    monkeypatch.setattr(
+        "backend.app.rag.pipeline.retrieve_relevant_chunks",
+        fake_retrieve,
+    )
+    monkeypatch.setattr("backend.app.rag.pipeline.generate_answer", fake_generate)
+
+    result = await run_rag_pipeline(
+        client_id="test-client",
+        query="Refunds?",
+        plan_type="starter",
+    )
+
+    tokens = result["usage_stats"]["prompt_tokens"]
+    assert 2000 < tokens <= 2500
+    assert tokens == count_tokens(seen["prompt"])
+    assert [c["document"] for c in result["citations"]] == ["0.txt"]
+
+    monkeypatch.setattr("backend.app.rag.pipeline._prompt_budget", lambda plan: 50)
+
+    result = await run_rag_pipeline(client_id="test-client", query="Refunds?")
+
+    assert "don't have specific information" in seen["prompt"]
+    assert result["citations"] == []
+    assert result["confidence"] == 0.0
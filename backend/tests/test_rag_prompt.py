@@ -1,5 +1,6 @@
 """Tests for RAG prompt construction and query schemas."""
 
+from backend.app.ingestion.chunker import count_tokens
 from backend.app.rag.prompt import (
     build_fallback_prompt,
     build_rag_prompt,
@@ -20,11 +21,39 @@ def test_build_rag_prompt_contains_context() -> None:
         }
     ]
 
-    prompt = build_rag_prompt("What is FastAPI?", chunks)
+    prompt, tokens, kept = build_rag_prompt("What is FastAPI?", chunks)
 
     assert "FastAPI is a modern web framework." in prompt
     assert "[Document: docs.pdf, Chunk: 0]" in prompt
     assert "USER QUESTION:" in prompt
+    assert tokens == count_tokens(prompt)
+    assert kept == chunks
+
+
+def test_build_rag_prompt_fits_token_budget() -> None:
+    """Context must fill in order and cut the tail chunk at a sentence."""
+    sentences = [f"Refund rule number {i} applies to orders." for i in range(40)]
+    chunks = [
+        {"text": " ".join(sentences), "metadata": {"filename": f"{name}.txt"}}
+        for name in ("first", "second", "third")
+    ]
+    _, full_tokens, _ = build_rag_prompt("Refunds?", chunks[:1], max_tokens=10_000)
+
+    budget = full_tokens + 150
+    prompt, tokens, kept = build_rag_prompt("Refunds?", chunks, max_tokens=budget)
+
+    assert tokens == count_tokens(prompt)
+    assert full_tokens < tokens <= full_tokens + 150
+    assert "[Document: second.txt" in prompt
+    assert "third.txt" not in prompt
+    tail = prompt.split("[Document: second.txt, Chunk: 1]\n")[1].split("\n")[0]
+    assert tail.endswith("orders.")
+    assert len(tail) < len(chunks[1]["text"])
+    assert [chunk["metadata"]["filename"] for chunk in kept] == [
+        "first.txt",
+        "second.txt",
+    ]
+    assert kept[1]["text"] == tail
 
 
 def test_build_fallback_prompt() -> None:
@@ -0,0 +1,33 @@
+"""Tests for cross-encoder reranking."""
+
+import numpy as np
+import pytest
+
+from backend.app.rag import reranker
+
+
+@pytest.mark.asyncio
+async def test_rerank_orders_by_cross_encoder_and_keeps_top_k(monkeypatch):
+    """Chunks must be reordered by model logits and trimmed to top_k."""
+    monkeypatch.setattr(reranker, "_get_model", lambda: object())
+    monkeypatch.setattr(
+        reranker,
+        "score_pairs",
+        lambda model, query, texts: np.array([-2.0, 3.0, 0.0]),
+    )
+    chunks = [{"text": t, "score": 0.9} for t in ("a", "b", "c")]
+
+    result = await reranker.rerank("query", chunks, top_k=2)
+
+    assert [chunk["text"] for chunk in result] == ["b", "c"]
+    assert result[0]["score"] == pytest.approx(1 / (1 + np.exp(-3.0)))
+    assert result[1]["score"] == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+async def test_rerank_passes_through_without_model(monkeypatch):
+    """Without a usable model, retrieval order must be kept."""
+    monkeypatch.setattr(reranker, "_get_model", lambda: None)
+    chunks = [{"text": t} for t in ("a", "b", "c")]
+
+    assert await reranker.rerank("query", chunks, top_k=2) == chunks[:2]
@@ -1,8 +1,13 @@
 import pytest
+import asyncio
 from unittest.mock import patch
 pytestmark = pytest.mark.integration
 
-from backend.app.rag.retriever import retrieve_relevant_chunks
+from backend.app.rag.retriever import (
+    SearchCoalescer,
+    reciprocal_rank_fusion,
+    retrieve_relevant_chunks,
+)
 
 
 @pytest.mark.asyncio
@@ -31,16 +36,16 @@ async def test_retriever_embedding_failure(mock_get_embeddings):
 
 @pytest.mark.asyncio
 @patch("backend.app.rag.retriever.get_embeddings")
-@patch("backend.app.rag.retriever.search_index")
+@patch("backend.app.rag.retriever.search_index_batch")
 async def test_retriever_success(mock_search_index, mock_get_embeddings):
     mock_get_embeddings.return_value = ([[0.1] * 1536], {})
-    mock_search_index.return_value = [
+    mock_search_index.return_value = [[
         {
             "text": "Test chunk",
             "metadata": {"filename": "test.txt"},
             "score": 0.9
         }
-    ]
+    ]]
 
     results = await retrieve_relevant_chunks(
         client_id="test-client",
@@ -50,4 +55,69 @@ async def test_retriever_success(mock_search_index, mock_get_embeddings):
 
     assert len(results) == 1
     assert results[0]["text"] == "Test chunk"
-    assert "score" in results[0]
\ No newline at end of file
+    assert "score" in results[0]
+
+
+@pytest.mark.asyncio
+@patch("backend.app.rag.retriever.search_index_batch")
+async def test_coalescer_batches_concurrent_queries(mock_search_index_batch):
+    mock_search_index_batch.side_effect = lambda client_id, queries, top_k, filters: [
+        [{"query": q[0], "rank": r} for r in range(top_k)] for q in queries
+    ]
+    coalescer = SearchCoalescer(window_ms=20, max_batch=8)
+
+    first, second = await asyncio.gather(
+        coalescer.search("tenant", [1.0, 0.0], top_k=1),
+        coalescer.search("tenant", [2.0, 0.0], top_k=3),
+    )
+
+    mock_search_index_batch.assert_called_once()
+    assert first == [{"query": 1.0, "rank": 0}]
+    assert [r["query"] for r in second] == [2.0, 2.0, 2.0]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """A chunk found by both searches must rank first."""
+    dense = [
+        {"document_id": "a", "chunk_index": 0, "score": 0.9},
+        {"document_id": "a", "chunk_index": 1, "score": 0.8},
+    ]
+    lexical = [
+        {"document_id": "a", "chunk_index": 1, "score": 1.0},
+        {"document_id": "b", "chunk_index": 0, "score": 0.5},
+    ]
+
+    fused = reciprocal_rank_fusion([dense, lexical], top_k=3, k=60)
+
+    assert [(r["document_id"], r["chunk_index"]) for r in fused] == [
+        ("a", 1),
+        ("a", 0),
+        ("b", 0),
+    ]
+    assert fused[0]["score"] == 1.0
+
+
+@pytest.mark.asyncio
+@patch("backend.app.rag.retriever.get_embeddings")
+@patch("backend.app.rag.retriever.search_lexical")
+async def test_identifier_query_skips_embedding(
+    mock_search_lexical,
+    mock_get_embeddings,
+):
+    """Identifier-like queries must use lexical search only."""
+    mock_search_lexical.return_value = [
+        {
+            "text": "Order ORD-1042 shipped",
+            "metadata": {"filename": "orders.csv"},
+            "score": 1.0,
+        }
+    ]
+
+    results = await retrieve_relevant_chunks(
+        client_id="test-client",
+        query="ORD-1042",
+        top_k=3,
+    )
+
+    mock_get_embeddings.assert_not_called()
+    assert results[0]["text"] == "Order ORD-1042 shipped"
@@ -4,7 +4,7 @@ from unittest.mock import patch
 
 import pytest
 
-from backend.app.ingestion.text_reader import extract_text
+from backend.app.ingestion.text_reader import extract_text, iter_text_file
 
 
 def test_extract_text_utf8_success():
@@ -51,3 +51,24 @@ def test_extract_text_decode_failure():
         ):
             with pytest.raises(ValueError):
                 extract_text(b"whatever")
+
+
+def test_iter_text_file_streams_blocks(tmp_path):
+    """Blocks reassemble to the file text and never split a word."""
+    path = tmp_path / "doc.txt"
+    text = " ".join(f"wörd{i}" for i in range(500))
+    path.write_text(text, encoding="utf-8")
+
+    blocks = list(iter_text_file(str(path), block_bytes=64))
+
+    assert len(blocks) > 1
+    assert "".join(blocks) == text
+    assert all(not block.endswith(" ") for block in blocks)
+
+
+def test_iter_text_file_latin1_fallback(tmp_path):
+    """Files that are not valid UTF-8 are decoded as latin-1."""
+    path = tmp_path / "doc.txt"
+    path.write_bytes("café olé".encode("latin-1"))
+
+    assert "".join(iter_text_file(str(path))) == "café olé"
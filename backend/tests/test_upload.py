@@ -1,8 +1,13 @@
 """Test upload endpoints."""
 
+import uuid
+
 from fastapi.testclient import TestClient
 
+from backend.app.core.auth import get_current_client
 from backend.app.main import app
+from backend.app.models.client import Client
+from backend.app.models.documents import Document
 
 client = TestClient(app)
 
@@ -11,3 +16,73 @@ def test_upload_requires_auth():
     """Test that upload requires authentication."""
     response = client.post("/upload/file")
     assert response.status_code in (401, 403)
+
+
+def test_delete_keeps_document_when_vectors_cannot_be_deleted(db, monkeypatch):
+    """A failed vector delete must leave the row and the upload in place."""
+    owner = Client(
+        id=uuid.uuid4(),
+        email="delete@test.com",
+        hashed_password="x",
+        company_name="Delete Test",
+    )
+    document = Document(
+        client_id=owner.id,
+        filename="faq.txt",
+        source_type="txt",
+        file_size_bytes=10,
+        s3_key="uploads/faq.txt",
+    )
+    db.add_all([owner, document])
+    db.commit()
+
+    def unavailable(client_id, document_id):
+        raise RuntimeError("storage unavailable")
+
+    deleted_files = []
+    monkeypatch.setattr("backend.app.routes.upload.delete_document", unavailable)
+    monkeypatch.setattr("backend.app.routes.upload.delete_file", deleted_files.append)
+    app.dependency_overrides[get_current_client] = lambda: owner
+
+    response = client.delete(f"/upload/{document.id}")
+
+    assert response.status_code == 503
+    assert deleted_files == []
+    assert db.query(Document).filter(Document.id == document.id).first() is not None
+
+
+def test_resubmitted_url_refreshes_existing_document(db, monkeypatch):
+    """Posting a URL the client already has must not add another document."""
+    owner = Client(
+        id=uuid.uuid4(),
+        email="url@test.com",
+        hashed_password="x",
+        company_name="URL Test",
+    )
+    document = Document(
+        client_id=owner.id,
+        filename="FAQ",
+        source_type="url",
+        source_url="https://example.com/faq",
+        file_size_bytes=10,
+        chunk_count=3,
+        status="ready",
+    )
+    db.add_all([owner, document])
+    db.commit()
+
+    jobs = []
+
+    def enqueue(job):
+        jobs.append(job)
+        return True
+
+    monkeypatch.setattr("backend.app.routes.upload.enqueue_job", enqueue)
+    app.dependency_overrides[get_current_client] = lambda: owner
+
+    response = client.post("/upload/url", data={"url": "https://example.com/faq"})
+
+    assert response.status_code == 202
+    assert response.json()["id"] == str(document.id)
+    assert [job["document_id"] for job in jobs] == [str(document.id)]
+    assert db.query(Document).filter(Document.client_id == owner.id).count() == 1
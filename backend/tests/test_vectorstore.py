@@ -1,10 +1,12 @@
 """Tests for FAISS vectorstore."""
 
+import shutil
 from pathlib import Path
 from tempfile import gettempdir
 
 import numpy as np
 import pytest
+from botocore.exceptions import ClientError
 
 import backend.app.core.vectorstore as vs
 
@@ -12,15 +14,30 @@ BASE_TMP_DIR = Path(gettempdir()) / "faiss_test"
 BASE_TMP_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _missing_on_s3(key):
+    """Simulate an S3 bucket that does not hold the requested key."""
+    raise ClientError(
+        {"Error": {"Code": "NoSuchKey", "Message": key}},
+        "GetObject",
+    )
+
+
 @pytest.fixture(autouse=True)
-def cleanup_tmp_files():
-    """Remove temporary FAISS files after each test."""
+def cleanup_tmp_files(monkeypatch):
+    """Isolate FAISS files per test and remove them afterwards."""
+    monkeypatch.setattr(vs, "_get_base_tmp_dir", lambda: BASE_TMP_DIR)
+    monkeypatch.setattr(vs, "upload_file", lambda data, key: True)
+    monkeypatch.setattr(vs, "delete_file", lambda key: True)
+    monkeypatch.setattr(vs, "download_file", _missing_on_s3)
+    monkeypatch.setattr(vs, "schedule_compaction", lambda client_id: None)
+    vs._index_cache.clear()
     yield
-    for file in BASE_TMP_DIR.glob("*"):
-        try:
-            file.unlink()
-        except Exception:
-            pass
+    vs._index_cache.clear()
+    for path in BASE_TMP_DIR.glob("*"):
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
 
 
 def test_create_index_and_add_search(monkeypatch):
@@ -36,12 +53,6 @@ def test_create_index_and_add_search(monkeypatch):
         lambda cid: str(BASE_TMP_DIR / f"fa_{cid}.meta"),
     )
 
-    monkeypatch.setattr(
-        vs,
-        "create_index",
-        lambda dimension=3: vs.faiss.IndexHNSWFlat(3, 8),
-    )
-
     emb1 = [0.1, 0.0, 0.0]
     emb2 = [0.2, 0.1, 0.0]
 
@@ -63,3 +74,391 @@ def test_dimension_mismatch_raises():
     with pytest.raises(ValueError):
         if index.d != bad_vec.shape[1]:
             raise ValueError("Dimension mismatch detected.")
+
+
+def test_add_writes_delta_segments_only(monkeypatch):
+    """Each upload must ship only its own delta segment plus the manifest."""
+    uploaded = []
+    monkeypatch.setattr(vs, "upload_file", lambda data, key: uploaded.append(key))
+
+    vs.add_to_index("c2", [[0.1, 0.0, 0.0]], [{"id": 1}])
+    uploaded.clear()
+    vs.add_to_index("c2", [[0.0, 0.1, 0.0]], [{"id": 2}])
+
+    assert uploaded == [
+        "indexes/c2/seg_000001.index",
+        "indexes/c2/seg_000001.meta",
+        "indexes/c2/seg_000001.vec.npy",
+        "indexes/c2/seg_000001.ids.npy",
+        "indexes/c2/seg_000001.bm25",
+        "indexes/c2/manifest.json",
+    ]
+
+    vs._index_cache.clear()
+    tenant = vs.load_index("c2")
+
+    assert [s.name for s in tenant.segments] == ["seg_000000", "seg_000001"]
+    assert tenant.manifest["version"] == 2
+
+
+def test_compaction_merges_segments():
+    """Compaction must merge deltas into one base without losing results."""
+    vs.add_to_index("c3", [[0.1, 0.0, 0.0]], [{"id": 1}])
+    vs.add_to_index("c3", [[0.0, 0.1, 0.0]], [{"id": 2}])
+    vs.add_to_index("c3", [[0.0, 0.0, 0.1]], [{"id": 3}])
+
+    vs.compact_index("c3")
+
+    vs._index_cache.clear()
+    tenant = vs.load_index("c3")
+
+    assert len(tenant.segments) == 1
+    assert tenant.ntotal == 3
+
+    results = vs.search_index("c3", [0.0, 0.1, 0.0], top_k=1)
+    assert results[0]["id"] == 2
+
+
+def test_rebuild_uses_stored_raw_vectors():
+    """Rebuilding to another index type must keep every stored vector."""
+    vs.add_to_index("c4", [[1.0, 0.0, 0.0]], [{"id": 1}])
+    vs.add_to_index("c4", [[0.0, 1.0, 0.0], [0.0, 0.0, 1.0]], [{"id": 2}, {"id": 3}])
+
+    count = vs.rebuild_index("c4", index_factory="IVF1,Flat")
+
+    vs._index_cache.clear()
+    tenant = vs.load_index("c4")
+
+    assert count == 3
+    assert len(tenant.segments) == 1
+    assert isinstance(tenant.segments[0].index, vs.faiss.IndexIVFFlat)
+    assert tenant.segments[0].vectors.dtype == np.float16
+    assert tenant.segments[0].vectors.shape == (3, 3)
+
+    results = vs.search_index("c4", [0.0, 0.0, 1.0], top_k=1)
+    assert results[0]["id"] == 3
+
+
+def _doc_rows(document_id, count):
+    return [
+        {"text": f"{document_id}-{i}", "document_id": document_id, "chunk_index": i}
+        for i in range(count)
+    ]
+
+
+def test_delete_document_hides_vectors_until_compaction():
+    """Deleted vectors must stop matching at once and vanish on compaction."""
+    vs.add_to_index("c5", [[1.0, 0.0, 0.0], [0.9, 0.1, 0.0]], _doc_rows("a", 2))
+    vs.add_to_index("c5", [[0.0, 1.0, 0.0]], _doc_rows("b", 1))
+
+    assert vs.delete_document("c5", "a") == 2
+    assert vs.delete_document("c5", "a") == 0
+
+    vs._index_cache.clear()
+    results = vs.search_index("c5", [1.0, 0.0, 0.0], top_k=3)
+    assert [r["document_id"] for r in results] == ["b"]
+
+    vs.compact_index("c5")
+
+    vs._index_cache.clear()
+    tenant = vs.load_index("c5")
+    assert tenant.ntotal == 1
+    assert tenant.manifest["tombstones"] == []
+    assert list(tenant.segments[0].ids) == [2]
+
+
+def test_replace_document_swaps_vectors_atomically():
+    """Replacing a document must leave only its new vectors searchable."""
+    vs.add_to_index("c6", [[1.0, 0.0, 0.0]], _doc_rows("a", 1))
+    vs.add_to_index("c6", [[0.0, 1.0, 0.0]], _doc_rows("b", 1))
+
+    vs.replace_document(
+        "c6",
+        "a",
+        [[0.0, 0.0, 1.0]],
+        [{"text": "new", "document_id": "a"}],
+    )
+
+    tenant = vs.load_index("c6")
+    assert tenant.manifest["version"] == 3
+    assert tenant.deleted_count == 1
+
+    results = vs.search_index("c6", [1.0, 0.0, 0.0], top_k=3)
+    assert sorted(r["text"] for r in results) == ["b-0", "new"]
+
+
+def test_select_index_type_by_size_and_plan(monkeypatch):
+    """Index type must follow corpus size, with quantization by plan."""
+    monkeypatch.setattr(vs.settings, "FAISS_FLAT_MAX_VECTORS", 100)
+    monkeypatch.setattr(vs.settings, "FAISS_HNSW_MAX_VECTORS", 1000)
+    monkeypatch.setattr(vs.settings, "FAISS_IVFPQ_MIN_VECTORS", 10000)
+
+    assert vs.select_index_type(50, 1536, "scale") == vs.INDEX_FLAT
+    assert vs.select_index_type(500, 1536, "growth") == vs.INDEX_HNSW
+    assert vs.select_index_type(5000, 1536, "starter") == vs.INDEX_HNSW
+    assert vs.select_index_type(5000, 1536, "growth") == vs.INDEX_HNSW_SQ8
+    assert vs.select_index_type(5000, 1536, "scale") == vs.INDEX_HNSW_SQ8
+    assert vs.select_index_type(40000, 1536, "scale") == "IVF512,PQ96"
+
+
+def test_compaction_migrates_index_type(monkeypatch):
+    """Crossing a size threshold must migrate the base index on compaction."""
+    monkeypatch.setattr(vs.settings, "FAISS_FLAT_MAX_VECTORS", 3)
+
+    vs.add_to_index("c7", [[1.0, 0.0, 0.0]], [{"id": 1}])
+    vs.add_to_index("c7", [[0.0, 1.0, 0.0]], [{"id": 2}])
+    vs.compact_index("c7")
+    assert vs.load_index("c7").manifest["index_type"] == vs.INDEX_FLAT
+
+    vs.add_to_index("c7", [[0.0, 0.0, 1.0]], [{"id": 3}])
+    assert vs._needs_migration(vs.load_index("c7"))
+
+    vs.compact_index("c7")
+
+    vs._index_cache.clear()
+    tenant = vs.load_index("c7")
+    assert tenant.manifest["index_type"] == vs.INDEX_HNSW
+    assert isinstance(tenant.segments[0].index, vs.faiss.IndexHNSWFlat)
+    assert vs.search_index("c7", [0.0, 0.0, 1.0], top_k=1)[0]["id"] == 3
+
+
+def test_shared_serving_uses_mmappable_indexes(monkeypatch):
+    """Shared serving must store every segment as a memory-mapped IVF index."""
+    monkeypatch.setattr(vs.settings, "FAISS_SHARED_DIR", str(BASE_TMP_DIR))
+    monkeypatch.setattr(vs.settings, "FAISS_FLAT_MAX_VECTORS", 100)
+
+    assert vs.select_index_type(50, 16) == vs.INDEX_SHARED_FLAT
+    assert vs.select_index_type(5000, 16) == "IVF128,Flat"
+
+    vectors = np.random.default_rng(0).standard_normal((300, 16))
+    vs.add_to_index("c8", vectors[:150].tolist(), [{"id": i} for i in range(150)])
+    vs.add_to_index("c8", vectors[150:].tolist(), [{"id": i} for i in range(150, 300)])
+    vs.compact_index("c8")
+
+    vs._index_cache.clear()
+    tenant = vs.load_index("c8")
+    assert tenant.manifest["index_type"].startswith("IVF")
+    assert isinstance(tenant.segments[0].index, vs.faiss.IndexIVFFlat)
+    assert vs.search_index("c8", vectors[200].tolist(), top_k=1)[0]["id"] == 200
+    assert not list(BASE_TMP_DIR.glob("faiss_c8/*.tmp"))
+
+
+def test_tune_search_params_reaches_target_recall():
+    """The tuner must pick the cheapest efSearch meeting the target."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3000, 32)).astype("float32")
+    index = vs._build_index(32, vectors, vs.INDEX_HNSW)
+
+    tuned = vs.tune_search_params(index, vectors, target_recall=0.9, sample_size=50)
+
+    assert tuned["efSearch"] in vs._EF_SEARCH_CANDIDATES
+    assert tuned["recall"] >= 0.9
+    assert index.hnsw.efSearch == tuned["efSearch"]
+    assert vs.tune_search_params(vs.faiss.IndexFlatL2(32), vectors, 0.9) == {}
+
+
+def test_tuned_params_and_tombstones_apply_to_hnsw_base(monkeypatch):
+    """A tuned HNSW base must keep its efSearch and still skip deleted rows."""
+    monkeypatch.setattr(vs.settings, "FAISS_TUNE_QUERIES", 20)
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((200, 8)).astype("float32")
+
+    vs.add_to_index("c8", vectors[:100].tolist(), _doc_rows("a", 100))
+    vs.add_to_index("c8", vectors[100:].tolist(), _doc_rows("b", 100))
+    vs.rebuild_index("c8", index_factory=vs.INDEX_HNSW)
+    vs.delete_document("c8", "a")
+
+    vs._index_cache.clear()
+    tenant = vs.load_index("c8")
+    tuned = tenant.manifest["search_params"]
+
+    assert tenant.segments[0].index.hnsw.efSearch == tuned["efSearch"]
+
+    results = vs.search_index("c8", vectors[0].tolist(), top_k=5)
+    assert len(results) == 5
+    assert {r["document_id"] for r in results} == {"b"}
+
+
+def test_stale_worker_catches_up_before_writing(monkeypatch):
+    """A writer with a stale cache must build on the latest manifest."""
+    published = {}
+    monkeypatch.setattr(vs, "publish_version", published.__setitem__)
+    monkeypatch.setattr(vs, "get_version", published.get)
+
+    vs.add_to_index("c9", [[1.0, 0.0, 0.0]], [{"id": 1}])
+    stale = vs._index_cache.peek("c9")
+
+    # Another worker appends a segment; this worker misses the notification.
+    vs.add_to_index("c9", [[0.0, 1.0, 0.0]], [{"id": 2}])
+    vs._index_cache.put("c9", stale)
+
+    vs.add_to_index("c9", [[0.0, 0.0, 1.0]], [{"id": 3}])
+
+    tenant = vs.load_index("c9")
+    assert tenant.manifest["version"] == published["c9"] == 3
+    assert len(tenant.segments) == 3
+
+
+def test_remote_version_refreshes_cached_tenant(monkeypatch):
+    """An invalidation must refresh the cache, reusing loaded segments."""
+    monkeypatch.setattr(vs, "get_version", lambda client_id: None)
+
+    vs.add_to_index("c10", [[1.0, 0.0, 0.0]], [{"id": 1}])
+    stale = vs._index_cache.peek("c10")
+    vs.add_to_index("c10", [[0.0, 1.0, 0.0]], [{"id": 2}])
+    vs._index_cache.put("c10", stale)
+
+    vs._on_remote_version("c10", 2)
+
+    tenant = vs._index_cache.peek("c10")
+    assert tenant.manifest["version"] == 2
+    assert tenant.segments[0].index is stale.segments[0].index
+    assert vs.search_index("c10", [0.0, 1.0, 0.0], top_k=1)[0]["id"] == 2
+
+
+def test_search_lexical_matches_identifiers_across_segments():
+    """BM25 search must find exact tokens, skip deletes and survive merges."""
+    vs.add_to_index(
+        "c11",
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+        [
+            {"text": "Order ORD-1042 shipped", "document_id": "a", "chunk_index": 0},
+            {"text": "Refunds take five days", "document_id": "a", "chunk_index": 1},
+        ],
+    )
+    vs.add_to_index(
+        "c11",
+        [[0.0, 0.0, 1.0]],
+        [{"text": "Error E-77 on login", "document_id": "b", "chunk_index": 0}],
+    )
+
+    hits = vs.search_lexical("c11", "what about ORD-1042?", top_k=2)
+    assert hits[0]["text"] == "Order ORD-1042 shipped"
+    assert vs.search_lexical("c11", "e-77", top_k=1)[0]["document_id"] == "b"
+
+    vs.delete_document("c11", "a")
+    assert vs.search_lexical("c11", "ORD-1042", top_k=3) == []
+
+    vs.compact_index("c11")
+    vs._index_cache.clear()
+    assert vs.load_index("c11").manifest["segments"][0]["lexical"]
+    assert vs.search_lexical("c11", "login error", top_k=3)[0]["score"] == 1.0
+
+
+@pytest.mark.parametrize("exact_max_rows", [0, 1000])
+def test_filtered_search_only_returns_matching_rows(monkeypatch, exact_max_rows):
+    """Filters must restrict results on flat, HNSW and exact search paths."""
+    monkeypatch.setattr(vs.settings, "FAISS_FILTER_EXACT_MAX_ROWS", exact_max_rows)
+
+    def rows(document_id, filename, count):
+        return [
+            {
+                "text": f"{document_id}{i}",
+                "document_id": document_id,
+                "chunk_index": i,
+                "metadata": {"filename": filename},
+            }
+            for i in range(count)
+        ]
+
+    vs.add_to_index(
+        "c12",
+        [[1.0, 0.0, 0.0], [0.9, 0.1, 0.0]],
+        rows("a", "manual.pdf", 2),
+        document_attributes={"a": {"source_type": "pdf", "created_at": 100.0}},
+    )
+    vs.add_to_index(
+        "c12",
+        [[0.95, 0.0, 0.0]],
+        rows("b", "faq.txt", 1),
+        document_attributes={"b": {"source_type": "text", "created_at": 200.0}},
+    )
+
+    def found(filters):
+        results = vs.search_index("c12", [1.0, 0.0, 0.0], top_k=3, filters=filters)
+        return [row["text"] for row in results]
+
+    def check():
+        assert found({"document_ids": ["b"]}) == ["b0"]
+        assert found({"source_type": "pdf"}) == ["a0", "a1"]
+        assert found({"created_after": 150.0}) == ["b0"]
+        assert found({"filename": "manual.pdf", "created_before": 150.0}) == [
+            "a0",
+            "a1",
+        ]
+        assert found({"source_type": "url"}) == []
+
+    check()
+
+    monkeypatch.setattr(vs.settings, "FAISS_FLAT_MAX_VECTORS", 1)
+    vs.compact_index("c12")
+    assert isinstance(vs.load_index("c12").segments[0].index, vs.faiss.IndexHNSW)
+    check()
+
+    vs.delete_document("c12", "a")
+    assert found({"source_type": "pdf"}) == []
+    assert "a" not in vs.load_index("c12").manifest["documents"]
+
+
+def test_get_chunk_vectors_resolves_live_rows() -> None:
+    """Vectors must come from a replaced document's live copy."""
+
+    def rows(document_id, count):
+        return [
+            {"text": f"{document_id}{i}", "document_id": document_id, "chunk_index": i}
+            for i in range(count)
+        ]
+
+    vs.add_to_index("c13", [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], rows("a", 2))
+    vs.replace_document("c13", "a", [[0.0, 0.0, 1.0]], rows("a", 1))
+
+    vectors = vs.get_chunk_vectors("c13", [{"document_id": "a", "chunk_index": 0}])
+    assert vectors.tolist() == [[0.0, 0.0, 1.0]]
+    assert vs.get_chunk_vectors("c13", [{"document_id": "a", "chunk_index": 1}]) is None
+
+
+def test_load_index_distinguishes_missing_from_failing_storage(monkeypatch):
+    """Only a tenant absent from S3 is reported as having no index."""
+    with pytest.raises(FileNotFoundError):
+        vs.load_index("c14")
+
+    def unavailable(key):
+        raise ClientError({"Error": {"Code": "SlowDown"}}, "GetObject")
+
+    monkeypatch.setattr(vs, "download_file", unavailable)
+    with pytest.raises(ClientError):
+        vs.load_index("c14")
+
+
+def test_add_does_not_replace_index_on_storage_errors(monkeypatch):
+    """A transient S3 failure must not start the tenant over."""
+    vs.add_to_index("c15", [[1.0, 0.0, 0.0]], [{"text": "a"}])
+    vs._index_cache.clear()
+    for path in vs._get_tenant_dir("c15").glob("*"):
+        path.unlink()
+
+    def unavailable(key):
+        raise ClientError({"Error": {"Code": "InternalError"}}, "GetObject")
+
+    monkeypatch.setattr(vs, "download_file", unavailable)
+    with pytest.raises(ClientError):
+        vs.add_to_index("c15", [[0.0, 1.0, 0.0]], [{"text": "b"}])
+
+    monkeypatch.setattr(vs, "get_version", lambda client_id: 1)
+    monkeypatch.setattr(vs, "download_file", _missing_on_s3)
+    with pytest.raises(FileNotFoundError):
+        vs.add_to_index("c15", [[0.0, 1.0, 0.0]], [{"text": "b"}])
+
+
+def test_delete_document_propagates_storage_errors(monkeypatch):
+    """Only a missing index counts as nothing to delete."""
+    assert vs.delete_document("c16", "doc") == 0
+
+    def unavailable(key):
+        raise ClientError({"Error": {"Code": "InternalError"}}, "GetObject")
+
+    monkeypatch.setattr(vs, "download_file", unavailable)
+    with pytest.raises(ClientError):
+        vs.delete_document("c16", "doc")
+    with pytest.raises(ClientError):
+        vs.get_index_version("c16")